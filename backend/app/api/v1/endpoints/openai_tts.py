@@ -5,17 +5,17 @@ import json
 import logging
 
 from fastapi import APIRouter, HTTPException, Request, Depends
-from fastapi.responses import Response, StreamingResponse
+from fastapi.responses import FileResponse, Response
 
 from app.schemas.tts import OPENAI_AUDIO_CONTENT_TYPES
+from app.services.batch import BatchInputError, SpeechBatchManager, parse_jsonl
 from app.services.registry import EngineRegistry, register_builtin_engines
-from app.services.pipeline import TTSPipeline
-from app.services.text_preprocessor import TextPreprocessor
-from app.services.polyphone import PolyphoneFixer
-from app.services.chunker import TextChunker
-from app.services.llm_transcriber import LLMTranscriber
+from app.core import metrics
+from app.core.streaming import PipelineStreamingResponse
 from app.core.security import verify_token
 from app.core.config import settings
+from app.core.components import components
+from app.core.router import engine_router
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -36,49 +36,42 @@ def _resolve_engine_and_voice(model: str, voice_raw) -> tuple[str, str]:
         return "volcengine", voice_id
     if model == "qwen":
         return "qwen", "default"
+    if model == "mock":
+        return "mock", "mock"
     if isinstance(voice_raw, str) and voice_raw in VOICE_TO_ENGINE:
         return VOICE_TO_ENGINE[voice_raw], voice_raw
     voice_id = voice_raw.get("id", "zh-CN-XiaoxiaoNeural") if isinstance(voice_raw, dict) else voice_raw
     return "edge", voice_id
 
 
-def _engine_kwargs(engine_name: str) -> dict:
-    if engine_name == "qwen":
-        return {
-            "server_url": settings.QWEN3_TTS_SERVER_URL,
-            "language": settings.QWEN3_TTS_LANGUAGE,
-            "max_tokens": settings.QWEN3_TTS_MAX_TOKENS,
-        }
-    elif engine_name == "volcengine":
-        return {
-            "api_key": settings.VOLCENGINE_API_KEY,
-            "app_id": settings.VOLCENGINE_APP_ID,
-            "access_token": settings.VOLCENGINE_ACCESS_TOKEN,
-        }
-    return {}
-
-
-def _build_pipeline(engine_name: str) -> TTSPipeline:
-    engine = EngineRegistry.create(engine_name, **_engine_kwargs(engine_name))
-
-    llm_transcriber = None
-    if settings.TTS_LLM_TRANSCRIBE_ENABLED:
-        llm_transcriber = LLMTranscriber(
-            api_url=settings.TTS_LLM_TRANSCRIBE_API_URL,
-            api_key=settings.TTS_LLM_TRANSCRIBE_API_KEY,
-            model=settings.TTS_LLM_TRANSCRIBE_MODEL,
-        )
+def _speech_args(body: dict) -> tuple[str, str, float]:
+    """解析 speech 请求体，返回 (engine, voice, speed)。"""
+    model = body.get("model", "tts-1")
+    voice_raw = body.get("voice", "alloy")
+    speed = body.get("speed", 1.0) or 1.0
+    engine_type, voice_id = _resolve_engine_and_voice(model, voice_raw)
+    return engine_type, voice_id, speed
 
-    return TTSPipeline(
-        engine=engine,
-        llm_transcriber=llm_transcriber,
-        preprocessor=TextPreprocessor() if settings.TTS_PREPROCESS_ENABLED else None,
-        polyphone_fixer=PolyphoneFixer() if settings.TTS_POLYPHONE_FIX_ENABLED else None,
-        chunker=TextChunker(),
-        ref_trim_seconds=settings.QWEN3_TTS_REF_TRIM_SECONDS,
-        silence_between_chunks=settings.TTS_SILENCE_BETWEEN_CHUNKS,
-        first_chunk_minimize=settings.TTS_FIRST_CHUNK_MINIMIZE,
-    )
+
+def _engine_kwargs(engine_type: str, body: dict) -> dict:
+    """该 engine 支持的额外参数（路由切换 engine 后按实际 engine 重新取）。"""
+    instructions = body.get("instructions")  # OpenAI's natural language instruction
+    temperature = body.get("temperature")    # Custom extension: control randomness
+    pitch = body.get("pitch", 0.0)           # Custom: semitones
+    volume = body.get("volume", 1.0)         # Custom: gain multiplier
+
+    # Pass engine-specific params
+    extra_kwargs = {}
+    if engine_type == "qwen":
+        if instructions:
+            extra_kwargs["instruct"] = instructions
+        if temperature is not None:
+            extra_kwargs["temperature"] = temperature
+        if pitch:
+            extra_kwargs["pitch"] = pitch
+        if volume != 1.0:
+            extra_kwargs["volume"] = volume
+    return extra_kwargs
 
 
 @router.post("/v1/audio/speech", dependencies=[Depends(verify_token)])
@@ -92,52 +85,51 @@ async def create_speech(request: Request):
     if not text:
         raise HTTPException(status_code=400, detail={"error": {"type": "invalid_request_error", "message": "input is required", "param": "input"}})
 
-    model = body.get("model", "tts-1")
-    voice_raw = body.get("voice", "alloy")
     audio_format = body.get("response_format", "mp3") or "mp3"
-    speed = body.get("speed", 1.0) or 1.0
     stream_format = body.get("stream_format", "audio") or "audio"
-    instructions = body.get("instructions")  # OpenAI's natural language instruction
-    temperature = body.get("temperature")    # Custom extension: control randomness
-    pitch = body.get("pitch", 0.0)           # Custom: semitones
-    volume = body.get("volume", 1.0)         # Custom: gain multiplier
-
-    engine_type, voice_id = _resolve_engine_and_voice(model, voice_raw)
+    session_id = body.get("session_id") or request.headers.get("X-Session-Id")  # Custom: pin ref audio
+    engine_type, voice_id, speed = _speech_args(body)
 
     logger.info(f"TTS: engine={engine_type} voice={voice_id} format={audio_format} speed={speed} text_len={len(text)}")
 
-    content_type = OPENAI_AUDIO_CONTENT_TYPES.get(audio_format, "application/octet-stream")
+    attempt: dict = {}
+
+    def open_stream(engine: str, voice: str):
+        pipeline = components.pipeline(engine)
+        # engine 能直接输出 response_format 时用它，否则为 engine 原生编码（不转码）
+        output_format = pipeline.negotiate_format(audio_format)
+        timings = metrics.new_timings()
+        attempt.update(pipeline=pipeline, output_format=output_format, timings=timings)
+        return pipeline.generate_stream(
+            text, voice=voice, speed=speed, session_id=session_id, timings=timings,
+            audio_format=output_format, **_engine_kwargs(engine, body),
+        )
 
     try:
-        pipeline = _build_pipeline(engine_type)
-
-        # Pass engine-specific params
-        extra_kwargs = {}
-        if engine_type == "qwen":
-            if instructions:
-                extra_kwargs["instruct"] = instructions
-            if temperature is not None:
-                extra_kwargs["temperature"] = temperature
-            if pitch:
-                extra_kwargs["pitch"] = pitch
-            if volume != 1.0:
-                extra_kwargs["volume"] = volume
-
-        audio_gen = pipeline.generate_stream(
-            text, voice=voice_id, speed=speed,
-            **extra_kwargs,
+        # 主 engine 熔断/超 SLO 或首包前失败时由路由切到 fallback engine
+        # 首包延迟按 engine 调用计，不含 LLM 转写等前置步骤
+        route, audio_gen = await engine_router.open(
+            engine_type, voice_id, open_stream, engine_ttfb=lambda: attempt["timings"].engine_ttfb(),
         )
+        pipeline, output_format, timings = attempt["pipeline"], attempt["output_format"], attempt["timings"]
+        content_type = OPENAI_AUDIO_CONTENT_TYPES.get(output_format or audio_format, pipeline.media_type)
 
         if stream_format == "sse":
-            async def sse_stream():
-                async for chunk in audio_gen:
+            async def sse_stream(chunks):
+                async for chunk in chunks:
                     event = {"type": "speech.audio.delta", "audio": base64.b64encode(chunk).decode()}
                     yield f"data: {json.dumps(event)}\n\n"
                 done = {"type": "speech.audio.done", "usage": {"input_tokens": len(text), "output_tokens": 0, "total_tokens": len(text)}}
                 yield f"data: {json.dumps(done)}\n\n"
-            return StreamingResponse(sse_stream(), media_type="text/event-stream")
+            stream_body, headers = await metrics.instrument_stream(
+                audio_gen, timings, route.engine, route.voice, transform=sse_stream,
+            )
+            headers["X-TTS-Engine"] = route.engine
+            return PipelineStreamingResponse(stream_body, media_type="text/event-stream", headers=headers)
 
-        return StreamingResponse(audio_gen, media_type=content_type)
+        stream_body, headers = await metrics.instrument_stream(audio_gen, timings, route.engine, route.voice)
+        headers["X-TTS-Engine"] = route.engine
+        return PipelineStreamingResponse(stream_body, media_type=content_type, headers=headers)
 
     except HTTPException:
         raise
@@ -156,6 +148,7 @@ async def list_models():
             {"id": "gpt-4o-mini-tts", "object": "model", "owned_by": "edge-tts"},
             {"id": "volcengine", "object": "model", "owned_by": "volcengine"},
             {"id": "qwen", "object": "model", "owned_by": "qwen3-tts"},
+            {"id": "mock", "object": "model", "owned_by": "mock"},
         ],
     }
 
@@ -165,7 +158,7 @@ async def list_voices():
     all_voices = []
     for engine_name in EngineRegistry.available():
         try:
-            engine = EngineRegistry.create(engine_name, **_engine_kwargs(engine_name))
+            engine = components.engine(engine_name)
             voices = await engine.get_voices()
             for v in voices:
                 v["engine"] = engine_name
@@ -173,3 +166,115 @@ async def list_voices():
         except Exception as e:
             logger.warning(f"Failed to get voices for {engine_name}: {e}")
     return {"object": "list", "data": all_voices}
+
+
+# ---------------------------------------------------------------------- #
+# 批量合成：上传 JSONL，服务端按 engine 并发上限执行，结果落盘后轮询/下载
+# ---------------------------------------------------------------------- #
+async def _render_speech(body: dict) -> tuple[bytes, str]:
+    """合成一条批量请求，返回 (完整音频, 文件扩展名)。"""
+    engine_type, voice_id, speed = _speech_args(body)
+    attempt: dict = {}
+
+    def open_stream(engine: str, voice: str):
+        pipeline = components.pipeline(engine)
+        output_format = pipeline.negotiate_format(body.get("response_format") or "mp3")
+        timings = metrics.new_timings()
+        attempt.update(output_format=output_format, timings=timings)
+        return pipeline.generate_stream(
+            body["input"], voice=voice, speed=speed, session_id=body.get("session_id"), timings=timings,
+            audio_format=output_format, **_engine_kwargs(engine, body),
+        )
+
+    # 批量按请求的 engine 分队列限并发：不切换到 fallback，避免额外占用其它 engine 的会话
+    _, audio_gen = await engine_router.open(
+        engine_type, voice_id, open_stream, fallback=False, engine_ttfb=lambda: attempt["timings"].engine_ttfb(),
+    )
+    parts = [data async for data in audio_gen]
+    return b"".join(parts), attempt["output_format"] or "bin"
+
+
+speech_batches = SpeechBatchManager(
+    root_dir=settings.TTS_BATCH_DIR,
+    render=_render_speech,
+    engine_of=lambda body: _speech_args(body)[0],
+    max_workers=settings.TTS_BATCH_MAX_WORKERS,
+    engine_concurrency=settings.TTS_BATCH_CONCURRENCY,
+)
+
+
+def _batch_not_found(batch_id: str) -> HTTPException:
+    return HTTPException(status_code=404, detail={"error": {"type": "invalid_request_error", "message": f"No batch found with id '{batch_id}'"}})
+
+
+@router.post("/v1/audio/speech/batches", dependencies=[Depends(verify_token)])
+async def create_speech_batch(request: Request):
+    """提交批量合成。请求体为 JSONL（或 multipart 的 file 字段），每行一个 speech 请求。"""
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail={"error": {"type": "invalid_request_error", "message": "file is required", "param": "file"}})
+        data = await upload.read()
+    else:
+        data = await request.body()
+
+    try:
+        items = parse_jsonl(data, settings.TTS_BATCH_MAX_REQUESTS)
+    except (BatchInputError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail={"error": {"type": "invalid_request_error", "message": str(e)}})
+
+    name = request.query_params.get("name")  # 可选：批次名称，原样记录在 metadata
+    batch = await speech_batches.submit(items, {"name": name} if name else None)
+    return batch.to_dict()
+
+
+@router.get("/v1/audio/speech/batches", dependencies=[Depends(verify_token)])
+async def list_speech_batches():
+    return {"object": "list", "data": [b.to_dict() for b in await speech_batches.list_batches()]}
+
+
+@router.get("/v1/audio/speech/batches/{batch_id}", dependencies=[Depends(verify_token)])
+async def get_speech_batch(batch_id: str):
+    batch = await speech_batches.get(batch_id)
+    if batch is None:
+        raise _batch_not_found(batch_id)
+    return batch.to_dict()
+
+
+@router.post("/v1/audio/speech/batches/{batch_id}/cancel", dependencies=[Depends(verify_token)])
+async def cancel_speech_batch(batch_id: str):
+    batch = await speech_batches.cancel(batch_id)
+    if batch is None:
+        raise _batch_not_found(batch_id)
+    return batch.to_dict()
+
+
+@router.delete("/v1/audio/speech/batches/{batch_id}", dependencies=[Depends(verify_token)])
+async def delete_speech_batch(batch_id: str):
+    if not await speech_batches.delete(batch_id):
+        raise _batch_not_found(batch_id)
+    return {"id": batch_id, "object": "speech.batch.deleted", "deleted": True}
+
+
+@router.get("/v1/audio/speech/batches/{batch_id}/results", dependencies=[Depends(verify_token)])
+async def get_speech_batch_results(batch_id: str):
+    """已完成条目的结果 JSONL（index / custom_id / status / file / error），可在执行中下载。"""
+    if await speech_batches.get(batch_id) is None:
+        raise _batch_not_found(batch_id)
+    path = speech_batches.results_path(batch_id)
+    if not path.exists():
+        return Response(b"", media_type="application/x-ndjson")
+    return FileResponse(path, media_type="application/x-ndjson", filename=f"{batch_id}.jsonl")
+
+
+@router.get("/v1/audio/speech/batches/{batch_id}/results/{index}", dependencies=[Depends(verify_token)])
+async def get_speech_batch_audio(batch_id: str, index: int):
+    """下载单条结果音频（index 为 JSONL 中的请求序号，从 0 开始）。"""
+    if await speech_batches.get(batch_id) is None:
+        raise _batch_not_found(batch_id)
+    path = await speech_batches.output_path(batch_id, index)
+    if path is None:
+        raise HTTPException(status_code=404, detail={"error": {"type": "invalid_request_error", "message": f"No audio for request {index} (pending or failed)"}})
+    ext = path.suffix.lstrip(".")
+    return FileResponse(path, media_type=OPENAI_AUDIO_CONTENT_TYPES.get(ext, "application/octet-stream"), filename=path.name)
@@ -1,19 +1,22 @@
 from __future__ import annotations
 
+import codecs
 import logging
+from typing import AsyncGenerator
 
-from fastapi import APIRouter, HTTPException, Query, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
+from fastapi.responses import FileResponse
 
-from app.schemas.tts import VoiceInfo, TTSRequest
+from app.schemas.tts import OPENAI_AUDIO_CONTENT_TYPES, RenderJobTextUpdate, VoiceInfo, TTSRequest
+from app.core import metrics
+from app.core.streaming import PipelineStreamingResponse
 from app.core.security import verify_token
+from app.core.cache import chunk_cache, ref_cache
+from app.core.components import components
 from app.core.config import settings
+from app.core.router import engine_router
 from app.services.registry import EngineRegistry, register_builtin_engines
-from app.services.pipeline import TTSPipeline
-from app.services.text_preprocessor import TextPreprocessor
-from app.services.polyphone import PolyphoneFixer
-from app.services.chunker import TextChunker
-from app.services.llm_transcriber import LLMTranscriber
+from app.services.render_jobs import RenderJobManager
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -21,57 +24,10 @@ router = APIRouter()
 register_builtin_engines()
 
 
-def _engine_kwargs(engine_name: str) -> dict:
-    """根据 engine 名称返回构造参数。"""
-    if engine_name == "qwen":
-        return {
-            "server_url": settings.QWEN3_TTS_SERVER_URL,
-            "language": settings.QWEN3_TTS_LANGUAGE,
-            "max_tokens": settings.QWEN3_TTS_MAX_TOKENS,
-        }
-    elif engine_name == "volcengine":
-        return {
-            "api_key": settings.VOLCENGINE_API_KEY,
-            "app_id": settings.VOLCENGINE_APP_ID,
-            "access_token": settings.VOLCENGINE_ACCESS_TOKEN,
-        }
-    return {}
-
-
-def _build_pipeline(engine_name: str, preprocess: bool = True) -> TTSPipeline:
-    """构建 pipeline 实例。"""
-    engine = EngineRegistry.create(engine_name, **_engine_kwargs(engine_name))
-
-    preprocessor = TextPreprocessor() if (preprocess and settings.TTS_PREPROCESS_ENABLED) else None
-    polyphone_fixer = PolyphoneFixer() if (preprocess and settings.TTS_POLYPHONE_FIX_ENABLED) else None
-    chunker = TextChunker()
-
-    llm_transcriber = None
-    if preprocess and settings.TTS_LLM_TRANSCRIBE_ENABLED:
-        llm_transcriber = LLMTranscriber(
-            api_url=settings.TTS_LLM_TRANSCRIBE_API_URL,
-            api_key=settings.TTS_LLM_TRANSCRIBE_API_KEY,
-            model=settings.TTS_LLM_TRANSCRIBE_MODEL,
-        )
-
-    ref_trim = settings.QWEN3_TTS_REF_TRIM_SECONDS if engine_name == "qwen" else 8
-
-    return TTSPipeline(
-        engine=engine,
-        llm_transcriber=llm_transcriber,
-        preprocessor=preprocessor,
-        polyphone_fixer=polyphone_fixer,
-        chunker=chunker,
-        ref_trim_seconds=ref_trim,
-        silence_between_chunks=settings.TTS_SILENCE_BETWEEN_CHUNKS,
-        first_chunk_minimize=settings.TTS_FIRST_CHUNK_MINIMIZE,
-    )
-
-
 @router.get("/voices", response_model=list[VoiceInfo], dependencies=[Depends(verify_token)])
-async def get_voices(engine: str = Query("edge", pattern="^(edge|qwen|volcengine)$")):
+async def get_voices(engine: str = Query("edge", pattern="^(edge|qwen|volcengine|mock)$")):
     try:
-        engine_instance = EngineRegistry.create(engine, **_engine_kwargs(engine))
+        engine_instance = components.engine(engine)
         voices = await engine_instance.get_voices()
 
         result = []
@@ -90,29 +46,232 @@ async def get_voices(engine: str = Query("edge", pattern="^(edge|qwen|volcengine
 
 @router.post("/stream", dependencies=[Depends(verify_token)])
 async def tts_stream(request: TTSRequest):
-    """统一 TTS 流式端点。支持 edge / volcengine / qwen。"""
+    """统一 TTS 流式端点。支持 edge / volcengine / qwen（mock 用于压测）。"""
     if request.engine not in EngineRegistry.available():
         raise HTTPException(
             status_code=400,
             detail=f"Unsupported engine: {request.engine}. Available: {EngineRegistry.available()}",
         )
 
-    try:
-        pipeline = _build_pipeline(request.engine, request.preprocess)
-        audio_gen = pipeline.generate_stream(
+    attempt: dict = {}
+
+    def open_stream(engine: str, voice: str):
+        pipeline = components.pipeline(engine, request.preprocess)
+        timings = metrics.new_timings()
+        attempt.update(pipeline=pipeline, timings=timings)
+        return pipeline.generate_stream(
             request.text,
-            voice=request.voice,
+            voice=voice,
             speed=request.speed,
             use_preprocess=request.preprocess,
+            session_id=request.session_id,
+            timings=timings,
+        )
+
+    try:
+        # 主 engine 熔断/超 SLO 或首包前失败时由路由切到 fallback engine
+        # 首包延迟按 engine 调用计，不含 LLM 转写等前置步骤
+        route, audio_gen = await engine_router.open(
+            request.engine, request.voice, open_stream, engine_ttfb=lambda: attempt["timings"].engine_ttfb(),
         )
-        return StreamingResponse(audio_gen, media_type="audio/wav")
+        pipeline, timings = attempt["pipeline"], attempt["timings"]
+        body, headers = await metrics.instrument_stream(
+            audio_gen, timings, route.engine, route.voice,
+        )
+        headers["X-TTS-Engine"] = route.engine
+        return PipelineStreamingResponse(body, media_type=pipeline.media_type, headers=headers)
     except Exception as e:
         logger.error(f"TTS stream error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class _DuplexStreamingResponse(PipelineStreamingResponse):
+    """请求体与响应体同时流动的 StreamingResponse。
+
+    并发监听断连会读取 receive()，吞掉尚未读取的请求体消息；
+    这里只推送响应，断连由请求体读取（ClientDisconnect）和发送失败体现。
+    """
+
+    watch_disconnect = False
+
+
+@router.post("/stream_text", dependencies=[Depends(verify_token)])
+async def tts_stream_text(
+    request: Request,
+    engine: str = Query("edge"),
+    voice: str = Query("zh-CN-XiaoxiaoNeural"),
+    speed: float = Query(1.0),
+    preprocess: bool = Query(True),
+    session_id: str | None = Query(None),
+):
+    """增量文本输入流式端点。
+
+    请求体为 UTF-8 纯文本，可用分块传输边生成边发送（如 LLM 逐 token 输出）；
+    每收到一个完整句子就开始合成，响应与请求体同时流动。
+    """
+    if engine not in EngineRegistry.available():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported engine: {engine}. Available: {EngineRegistry.available()}",
+        )
+
+    async def fragments() -> AsyncGenerator[str, None]:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        async for data in request.stream():
+            text = decoder.decode(data)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    try:
+        # 请求体只能读一次，不能首包前失败重试：只按健康度选路由
+        route = engine_router.route(engine, voice)
+        pipeline = components.pipeline(route.engine, preprocess)
+        timings = metrics.new_timings()
+        audio_gen = engine_router.track(route, pipeline.generate_stream_incremental(
+            fragments(),
+            voice=route.voice,
+            speed=speed,
+            use_preprocess=preprocess,
+            session_id=session_id,
+            timings=timings,
+        ), engine_ttfb=timings.engine_ttfb)
+        # 响应头须在读完首句前发出，不预取（无 Server-Timing 头，仅记录指标）
+        body, _ = await metrics.instrument_stream(audio_gen, timings, route.engine, route.voice, prime=False)
+        return _DuplexStreamingResponse(body, media_type=pipeline.media_type, headers={"X-TTS-Engine": route.engine})
+    except Exception as e:
+        logger.error(f"TTS stream_text error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/cache/stats", dependencies=[Depends(verify_token)])
+async def cache_stats():
+    """chunk 音频缓存与参考音频缓存统计。"""
+    if chunk_cache is None:
+        stats = {"enabled": False}
+    else:
+        stats = {"enabled": True, **chunk_cache.stats()}
+    stats["ref_cache"] = ref_cache.stats() if ref_cache is not None else {"enabled": False}
+    return stats
+
+
 @router.post("/edge/stream", dependencies=[Depends(verify_token)])
 async def edge_tts_stream(request: TTSRequest):
     """向后兼容端点。"""
     request.engine = "edge"
     return await tts_stream(request)
+
+
+# ---------------------------------------------------------------------- #
+# 长文档渲染任务：逐 chunk 落盘，可断点续跑、边渲染边下载、改稿后只重做变化的 chunk
+# ---------------------------------------------------------------------- #
+render_jobs = RenderJobManager(
+    root_dir=settings.TTS_RENDER_DIR,
+    pipeline_for=components.pipeline,
+    max_running=settings.TTS_RENDER_MAX_RUNNING,
+    chunk_retries=settings.TTS_RENDER_CHUNK_RETRIES,
+)
+
+
+def _job_not_found(job_id: str) -> HTTPException:
+    return HTTPException(status_code=404, detail=f"Render job not found: {job_id}")
+
+
+@router.post("/jobs", dependencies=[Depends(verify_token)])
+async def create_render_job(request: TTSRequest):
+    """创建长文档渲染任务，立即返回任务信息，后台逐 chunk 合成。"""
+    if request.engine not in EngineRegistry.available():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported engine: {request.engine}. Available: {EngineRegistry.available()}",
+        )
+    try:
+        job = await render_jobs.create(
+            request.text, request.engine, request.voice, request.speed, request.preprocess,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.to_dict()
+
+
+@router.get("/jobs", dependencies=[Depends(verify_token)])
+async def list_render_jobs():
+    return [job.to_dict() for job in await render_jobs.list_jobs()]
+
+
+@router.get("/jobs/{job_id}", dependencies=[Depends(verify_token)])
+async def get_render_job(job_id: str):
+    job = await render_jobs.get(job_id)
+    if job is None:
+        raise _job_not_found(job_id)
+    return job.to_dict()
+
+
+@router.get("/jobs/{job_id}/manifest", dependencies=[Depends(verify_token)])
+async def get_render_job_manifest(job_id: str):
+    """chunk 列表：文本、原文偏移 [source_start, source_end)、是否已完成。"""
+    manifest = await render_jobs.manifest(job_id)
+    if manifest is None:
+        raise _job_not_found(job_id)
+    return manifest
+
+
+@router.put("/jobs/{job_id}/text", dependencies=[Depends(verify_token)])
+async def update_render_job_text(job_id: str, request: RenderJobTextUpdate):
+    """修改原文：内容未变的 chunk 复用已合成音频，只重新合成变化的部分。"""
+    try:
+        result = await render_jobs.update_text(job_id, request.text)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise _job_not_found(job_id)
+    job, reused, pending = result
+    return {**job.to_dict(), "reused_chunks": reused, "pending_chunks": pending}
+
+
+@router.post("/jobs/{job_id}/cancel", dependencies=[Depends(verify_token)])
+async def cancel_render_job(job_id: str):
+    job = await render_jobs.cancel(job_id)
+    if job is None:
+        raise _job_not_found(job_id)
+    return job.to_dict()
+
+
+@router.post("/jobs/{job_id}/resume", dependencies=[Depends(verify_token)])
+async def resume_render_job(job_id: str):
+    """失败或已取消的任务从未完成的 chunk 继续。"""
+    job = await render_jobs.restart(job_id)
+    if job is None:
+        raise _job_not_found(job_id)
+    return job.to_dict()
+
+
+@router.delete("/jobs/{job_id}", dependencies=[Depends(verify_token)])
+async def delete_render_job(job_id: str):
+    if not await render_jobs.delete(job_id):
+        raise _job_not_found(job_id)
+    return {"id": job_id, "deleted": True}
+
+
+@router.get("/jobs/{job_id}/audio", dependencies=[Depends(verify_token)])
+async def get_render_job_audio(job_id: str, follow: bool = Query(False)):
+    """已完成前缀拼成的连续音频；follow=true 时边渲染边输出直到任务结束。"""
+    job = await render_jobs.get(job_id)
+    if job is None:
+        raise _job_not_found(job_id)
+    media_type = components.pipeline(job.engine, job.preprocess).media_type
+    return PipelineStreamingResponse(render_jobs.audio(job, follow), media_type=media_type)
+
+
+@router.get("/jobs/{job_id}/chunks/{index}", dependencies=[Depends(verify_token)])
+async def get_render_job_chunk(job_id: str, index: int):
+    """单个 chunk 的音频（engine 原生格式）。"""
+    job = await render_jobs.get(job_id)
+    if job is None:
+        raise _job_not_found(job_id)
+    path = render_jobs.chunk_path(job, index)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Chunk {index} is not rendered yet")
+    return FileResponse(path, media_type=OPENAI_AUDIO_CONTENT_TYPES.get(job.ext, "application/octet-stream"))
@@ -0,0 +1,56 @@
+import hashlib
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.admission import AdmissionController
+
+ADMISSION_WAIT_SECONDS = metrics.registry.register(metrics.Histogram(
+    "tts_admission_wait_seconds", "Time a request queued for upstream quota before being sent",
+    ("upstream",),
+))
+
+# engine:凭证 → 准入控制器（同一凭证的配额被所有请求共享）
+admission_controllers: dict[str, AdmissionController] = {}
+
+
+def _credential(engine_name: str) -> str:
+    """配额按凭证计：Volcengine 以 app_id 区分（没有时取 api_key 的短 hash），Edge 无凭证。"""
+    if engine_name == "volcengine":
+        if settings.VOLCENGINE_APP_ID:
+            return settings.VOLCENGINE_APP_ID
+        if settings.VOLCENGINE_API_KEY:
+            return hashlib.sha256(settings.VOLCENGINE_API_KEY.encode()).hexdigest()[:8]
+    return "default"
+
+
+def admission_for(engine_name: str) -> AdmissionController | None:
+    """返回该 engine 当前凭证的准入控制器；未配置 QPS / 并发上限的 engine 返回 None。"""
+    qps = settings.TTS_ADMISSION_QPS.get(engine_name, 0.0)
+    concurrency = settings.TTS_ADMISSION_CONCURRENCY.get(engine_name, 0)
+    if qps <= 0 and concurrency <= 0:
+        return None
+    upstream = f"{engine_name}:{_credential(engine_name)}"
+    controller = admission_controllers.get(upstream)
+    if controller is None:
+        controller = admission_controllers[upstream] = AdmissionController(
+            name=upstream,
+            qps=qps,
+            max_concurrency=concurrency,
+            max_wait=settings.TTS_ADMISSION_MAX_WAIT,
+            on_wait=lambda waited: ADMISSION_WAIT_SECONDS.observe(waited, upstream),
+        )
+    return controller
+
+
+def _admission_metrics():
+    """抓取时导出各上游的排队数、在途数、累计放行数与排队超时数。"""
+    stats = {upstream: c.stats() for upstream, c in admission_controllers.items()}
+    return metrics.stats_series("upstream", stats, [
+        ("tts_admission_waiting", "gauge", "waiting", "Requests queued for an upstream quota"),
+        ("tts_admission_active", "gauge", "active", "Requests holding an upstream quota slot"),
+        ("tts_admission_admitted_total", "counter", "admitted", "Requests admitted"),
+        ("tts_admission_timeouts_total", "counter", "timeouts", "Requests that timed out while queued"),
+    ])
+
+
+metrics.registry.add_collector(_admission_metrics)
@@ -0,0 +1,45 @@
+from app.core import metrics
+from app.core.config import settings
+from app.services.audio_cache import ChunkAudioCache, RefAudioCache
+
+# 进程内共享的 chunk 音频缓存（所有请求、所有 pipeline 共用）
+chunk_cache = ChunkAudioCache(
+    memory_max_bytes=settings.TTS_CACHE_MEMORY_MAX_MB * 1024 * 1024,
+    disk_dir=settings.TTS_CACHE_DIR or None,
+    disk_max_bytes=settings.TTS_CACHE_DISK_MAX_MB * 1024 * 1024,
+    bypass_kwargs=settings.TTS_CACHE_BYPASS_KWARGS,
+) if settings.TTS_CACHE_ENABLED else None
+
+# 进程内共享的参考音频缓存（按声音 / 会话）
+ref_cache = RefAudioCache(
+    max_entries=settings.TTS_REF_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.TTS_REF_CACHE_TTL_SECONDS,
+) if settings.TTS_REF_CACHE_ENABLED else None
+
+
+def cache_for_engine(engine_name: str) -> ChunkAudioCache | None:
+    """返回该 engine 可用的缓存；被配置为跳过缓存的 engine 返回 None。"""
+    if engine_name in settings.TTS_CACHE_BYPASS_ENGINES:
+        return None
+    return chunk_cache
+
+
+def _cache_metrics():
+    """抓取时导出缓存统计（计数类为 counter，容量类为 gauge）。"""
+    sources = [("tts_chunk_cache", chunk_cache), ("tts_ref_cache", ref_cache)]
+    for prefix, cache in sources:
+        if cache is None:
+            continue
+        stats = cache.stats()
+        for key, value in stats.items():
+            if not isinstance(value, (int, float)) or key.endswith(("max_bytes", "max_entries", "ttl_seconds")):
+                continue
+            kind = "gauge" if key in ("hit_ratio", "entries", "memory_entries", "memory_bytes",
+                                      "disk_entries", "disk_bytes") else "counter"
+            name = f"{prefix}_{key}" + ("_total" if kind == "counter" else "")
+            gauge = metrics.Gauge(name, f"{prefix[4:].replace('_', ' ')} {key.replace('_', ' ')}", kind=kind)
+            gauge.set(value)
+            yield from gauge.render()
+
+
+metrics.registry.add_collector(_cache_metrics)
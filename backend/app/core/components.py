@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from app.core import metrics
+from app.core.admission import admission_for
+from app.core.cache import cache_for_engine, ref_cache
+from app.core.config import settings
+from app.core.hedging import hedge_for_engine
+from app.core.http import http_clients
+from app.services.base import TTSEngine, capabilities_of
+from app.services.chunker import TextChunker
+from app.services.llm_transcriber import LLMTranscriber
+from app.services.pipeline import TTSPipeline
+from app.services.polyphone import PolyphoneFixer
+from app.services.registry import EngineRegistry
+from app.services.text_preprocessor import TextPreprocessor
+
+logger = logging.getLogger(__name__)
+
+
+def engine_kwargs(engine_name: str) -> dict[str, Any]:
+    """根据 engine 名称返回构造参数。"""
+    if engine_name == "qwen":
+        return {
+            "server_url": settings.QWEN3_TTS_SERVER_URL,
+            "server_urls": settings.QWEN3_TTS_SERVER_URLS or None,
+            "health_interval": settings.QWEN3_TTS_HEALTH_INTERVAL,
+            "language": settings.QWEN3_TTS_LANGUAGE,
+            "max_tokens": settings.QWEN3_TTS_MAX_TOKENS,
+            "http": http_clients,
+        }
+    elif engine_name == "volcengine":
+        return {
+            "api_key": settings.VOLCENGINE_API_KEY,
+            "app_id": settings.VOLCENGINE_APP_ID,
+            "access_token": settings.VOLCENGINE_ACCESS_TOKEN,
+            "transport": settings.VOLCENGINE_TRANSPORT,
+            "ws_pool_size": settings.VOLCENGINE_WS_POOL_SIZE,
+            "ws_idle_timeout": settings.VOLCENGINE_WS_IDLE_TIMEOUT,
+            "http": http_clients,
+            "admission": admission_for(engine_name),
+        }
+    elif engine_name == "edge":
+        return {"admission": admission_for(engine_name)}
+    elif engine_name == "mock":
+        return {
+            "ttfb": settings.MOCK_TTS_TTFB,
+            "seconds_per_char": settings.MOCK_TTS_SECONDS_PER_CHAR,
+            "jitter": settings.MOCK_TTS_JITTER,
+            "failure_rate": settings.MOCK_TTS_FAILURE_RATE,
+            "seed": settings.MOCK_TTS_SEED,
+            "native_format": settings.MOCK_TTS_FORMAT,
+        }
+    return {}
+
+
+class ComponentFactory:
+    """进程级组件工厂：engine / 预处理器 / LLM 转写器 / pipeline 按配置只构建一次。
+
+    这些组件在请求间无状态（pipeline 的合成状态都在单次 generate_stream 调用内），
+    可被并发请求安全共享。engine 与 LLM 转写器的 HTTP 请求走共享的 http_clients
+    （按 upstream 复用连接），app 关闭时由 aclose() 统一释放。
+    构建是同步的（中间没有 await），事件循环内不会出现重复构建。
+    """
+
+    def __init__(self) -> None:
+        self._engines: dict[str, TTSEngine] = {}
+        self._pipelines: dict[tuple[str, bool], TTSPipeline] = {}
+        self._preprocessor: TextPreprocessor | None = None
+        self._polyphone_fixer: PolyphoneFixer | None = None
+        self._chunker: TextChunker | None = None
+        self._llm_transcriber: LLMTranscriber | None = None
+
+    def engine(self, engine_name: str) -> TTSEngine:
+        """共享 engine 实例。
+
+        Raises:
+            ValueError: 未知 engine name
+        """
+        engine = self._engines.get(engine_name)
+        if engine is None:
+            engine = EngineRegistry.create(engine_name, **engine_kwargs(engine_name))
+            self._engines[engine_name] = engine
+            logger.info(f"ComponentFactory: engine '{engine_name}' created")
+        return engine
+
+    def loaded_engine(self, engine_name: str) -> TTSEngine | None:
+        """已创建的 engine 实例；尚未创建时返回 None（不触发创建，供指标抓取用）。"""
+        return self._engines.get(engine_name)
+
+    def pipeline(self, engine_name: str, preprocess: bool = True) -> TTSPipeline:
+        """共享 pipeline 实例，按 (engine, 是否预处理) 缓存。"""
+        key = (engine_name, preprocess)
+        pipeline = self._pipelines.get(key)
+        if pipeline is None:
+            pipeline = self._build_pipeline(engine_name, preprocess)
+            self._pipelines[key] = pipeline
+        return pipeline
+
+    def _build_pipeline(self, engine_name: str, preprocess: bool) -> TTSPipeline:
+        engine = self.engine(engine_name)
+        ref_trim = settings.QWEN3_TTS_REF_TRIM_SECONDS if engine_name == "qwen" else 8
+        return TTSPipeline(
+            engine=engine,
+            llm_transcriber=self.llm_transcriber() if preprocess else None,
+            preprocessor=self.preprocessor() if preprocess else None,
+            polyphone_fixer=self.polyphone_fixer() if preprocess else None,
+            chunker=self.chunker(),
+            ref_trim_seconds=ref_trim,
+            silence_between_chunks=settings.TTS_SILENCE_BETWEEN_CHUNKS,
+            first_chunk_minimize=settings.TTS_FIRST_CHUNK_MINIMIZE,
+            lookahead=settings.TTS_LOOKAHEAD_WINDOW.get(
+                engine_name, capabilities_of(engine).recommended_concurrency,
+            ),
+            llm_stream=settings.TTS_LLM_TRANSCRIBE_STREAM,
+            chunker_max_chars=settings.TTS_CHUNK_MAX_CHARS,
+            cache=cache_for_engine(engine_name),
+            engine_name=engine_name,
+            ref_cache=ref_cache,
+            session_stream=engine_name in settings.TTS_SESSION_STREAM_ENGINES,
+            hedge=hedge_for_engine(engine_name),
+        )
+
+    def preprocessor(self) -> TextPreprocessor | None:
+        if not settings.TTS_PREPROCESS_ENABLED:
+            return None
+        if self._preprocessor is None:
+            self._preprocessor = TextPreprocessor()
+        return self._preprocessor
+
+    def polyphone_fixer(self) -> PolyphoneFixer | None:
+        if not settings.TTS_POLYPHONE_FIX_ENABLED:
+            return None
+        if self._polyphone_fixer is None:
+            self._polyphone_fixer = PolyphoneFixer()
+        return self._polyphone_fixer
+
+    def chunker(self) -> TextChunker:
+        if self._chunker is None:
+            self._chunker = TextChunker()
+        return self._chunker
+
+    def llm_transcriber(self) -> LLMTranscriber | None:
+        if not settings.TTS_LLM_TRANSCRIBE_ENABLED:
+            return None
+        if self._llm_transcriber is None:
+            self._llm_transcriber = LLMTranscriber(
+                api_url=settings.TTS_LLM_TRANSCRIBE_API_URL,
+                api_key=settings.TTS_LLM_TRANSCRIBE_API_KEY,
+                model=settings.TTS_LLM_TRANSCRIBE_MODEL,
+                http=http_clients,
+            )
+        return self._llm_transcriber
+
+    async def aclose(self) -> None:
+        """关闭所有组件持有的连接池；之后再次取用会重新构建。"""
+        owners: list[Any] = [*self._engines.values(), self._llm_transcriber]
+        for owner in owners:
+            aclose = getattr(owner, "aclose", None)
+            if aclose is None:
+                continue
+            try:
+                await aclose()
+            except Exception as e:
+                logger.warning(f"ComponentFactory: closing {type(owner).__name__} failed: {e}")
+        await http_clients.aclose()
+        self._engines.clear()
+        self._pipelines.clear()
+        self._llm_transcriber = None
+
+
+# 进程内共享的组件工厂（app 关闭时 aclose）
+components = ComponentFactory()
+
+
+def _qwen_replica_metrics():
+    """抓取时导出 Qwen 各副本的队列深度（在途请求数）、请求/失败计数与健康状态。"""
+    engine = components.loaded_engine("qwen")
+    replica_stats = getattr(engine, "replica_stats", None)
+    stats = replica_stats() if replica_stats is not None else {}
+    return metrics.stats_series("replica", stats, [
+        ("tts_qwen_replica_in_flight", "gauge", "in_flight", "In-flight requests (queue depth) per replica"),
+        ("tts_qwen_replica_healthy", "gauge", "healthy", "Whether the replica receives requests"),
+        ("tts_qwen_replica_requests_total", "counter", "requests", "Requests sent to the replica"),
+        ("tts_qwen_replica_failures_total", "counter", "failures", "Failed requests per replica"),
+    ])
+
+
+metrics.registry.add_collector(_qwen_replica_metrics)
@@ -63,12 +63,34 @@ class Settings(BaseSettings):
 
     BACKEND_CORS_ORIGINS: list[str] = ["*"]
 
+    # 上游 HTTP 客户端（Volcengine / Qwen / LLM 转写）：按 upstream 共享连接池
+    HTTP_POOL_MAX_CONNECTIONS: int = 64         # 每个 upstream 的连接上限
+    HTTP_POOL_MAX_KEEPALIVE: int = 16           # 每个 upstream 保持的空闲连接上限
+    HTTP_POOL_KEEPALIVE_EXPIRY: float = 60.0    # 空闲连接保持秒数
+    HTTP_POOL_HTTP2: bool = False               # 需要安装 h2（pip install httpx[http2]）
+    HTTP_DNS_CACHE_TTL: float = 300.0           # DNS 解析缓存秒数，0 关闭
+
     VOLCENGINE_API_KEY: str = ""
     VOLCENGINE_APP_ID: str = ""
     VOLCENGINE_ACCESS_TOKEN: str = ""
+    VOLCENGINE_TRANSPORT: str = "auto"          # auto（按实测延迟选 HTTP/WS）| http | ws
+    VOLCENGINE_WS_POOL_SIZE: int = 4            # WS 长连接池上限（每条连接同时只跑一个 session）
+    VOLCENGINE_WS_IDLE_TIMEOUT: float = 60.0    # 空闲超过该秒数的 WS 连接被关闭
+
+    # mock engine：离线模拟合成，用于测量 pipeline / API 层开销与调度行为
+    MOCK_TTS_TTFB: float = 0.05                 # 首包延迟（秒）
+    MOCK_TTS_SECONDS_PER_CHAR: float = 0.005    # 首包后每字合成耗时（秒）
+    MOCK_TTS_JITTER: float = 0.0                # 时延随机浮动比例（0~1）
+    MOCK_TTS_FAILURE_RATE: float = 0.0          # 首包前注入失败的概率
+    MOCK_TTS_SEED: int = 0                      # 随机数种子（同样的调用序列得到同样的结果）
+    MOCK_TTS_FORMAT: str = "wav"                # 原生输出编码：wav | pcm | mp3
 
     # Qwen3-TTS Server
     QWEN3_TTS_SERVER_URL: str = "http://localhost:9880"
+    # 多副本：非空时取代 QWEN3_TTS_SERVER_URL，每个 chunk 发往在途请求最少的健康副本
+    # （前瞻窗口默认随之取副本数，单个请求的 chunk 可跨副本并发）
+    QWEN3_TTS_SERVER_URLS: list[str] = []
+    QWEN3_TTS_HEALTH_INTERVAL: float = 10.0     # 多副本健康检查间隔（秒），0 关闭
     QWEN3_TTS_LANGUAGE: str = "zh"
     QWEN3_TTS_MAX_TOKENS: int = 8192
     QWEN3_TTS_REF_TRIM_SECONDS: int = 8
@@ -80,12 +102,69 @@ class Settings(BaseSettings):
     TTS_CHUNK_MAX_CHARS: int = 500
     TTS_SILENCE_BETWEEN_CHUNKS: float = 0.3
     TTS_FIRST_CHUNK_MINIMIZE: bool = True  # 首段最小化（单句）降低首字延迟
+    # 前瞻并发：每个 engine 同时在途的 chunk 合成数（1 = 串行）
+    # 未列出的 engine 取其声明的建议并发（edge / volcengine 4，qwen 为副本数）
+    TTS_LOOKAHEAD_WINDOW: dict[str, int] = {}
+    # 会话级流式：这些 engine 整个请求共用一个 session，逐 chunk 推送文本（仅 volcengine 支持）
+    TTS_SESSION_STREAM_ENGINES: list[str] = []
+
+    # chunk 音频缓存（内存 LRU + 磁盘）
+    TTS_CACHE_ENABLED: bool = True
+    TTS_CACHE_MEMORY_MAX_MB: int = 64
+    TTS_CACHE_DIR: str = ""                     # 空 = 仅内存
+    TTS_CACHE_DISK_MAX_MB: int = 1024
+    TTS_CACHE_BYPASS_KWARGS: list[str] = ["temperature"]  # 非确定性参数，出现即不缓存
+    TTS_CACHE_BYPASS_ENGINES: list[str] = []
+
+    # 参考音频缓存：预热后的声音/会话无需等待首段即可全部并发
+    TTS_REF_CACHE_ENABLED: bool = True
+    TTS_REF_CACHE_MAX_ENTRIES: int = 256
+    TTS_REF_CACHE_TTL_SECONDS: int = 3600
+
+    # engine 路由：熔断 + 延迟 SLO，主 engine 不健康或首包前出现上游故障时切到 fallback
+    # 跨 engine 切换会换音色，需显式开启，如 {"volcengine": "edge", "qwen": "edge"}
+    TTS_ROUTER_FALLBACKS: dict[str, str] = {}
+    # fallback engine 的声音映射（按原请求 voice，"*" 为默认），如 {"edge": {"*": "zh-CN-XiaoxiaoNeural"}}；
+    # 无映射则不切换
+    TTS_ROUTER_FALLBACK_VOICES: dict[str, dict[str, str]] = {}
+    TTS_ROUTER_LATENCY_SLO: dict[str, float] = {}   # engine → 首包延迟 SLO（秒，滚动中位数）
+    TTS_ROUTER_FAILURE_THRESHOLD: int = 3           # 连续失败次数达到后熔断
+    TTS_ROUTER_COOLDOWN: float = 30.0               # 熔断后多久放行探测请求（秒）
+    TTS_ROUTER_WINDOW: int = 20                     # 滚动统计的请求数
+    TTS_ROUTER_PROBE_EVERY: int = 10                # 超 SLO 时每 N 个请求放行一个到主 engine
+
+    # chunk 请求对冲：首包超过近期 TTFB 分位数仍未到时再发一个相同请求，先到者胜
+    TTS_HEDGE_BUDGET: dict[str, float] = {}     # engine → 对冲请求占原请求比例上限（≤1），未列出的不对冲
+    TTS_HEDGE_PERCENTILE: float = 0.95          # 对冲延迟取首包延迟的该分位数
+    TTS_HEDGE_INITIAL_DELAY: float = 1.0        # 样本不足时的对冲延迟（秒）
+    TTS_HEDGE_MIN_DELAY: float = 0.05           # 对冲延迟下限（秒）
+
+    # 上游配额准入（volcengine / edge）：按凭证限 QPS 与并发 session，超出时排队而不是失败
+    TTS_ADMISSION_QPS: dict[str, float] = {}        # engine → 每秒请求数上限（令牌桶），未列出的不限
+    TTS_ADMISSION_CONCURRENCY: dict[str, int] = {}  # engine → 同时在途的上游请求/session 上限
+    TTS_ADMISSION_MAX_WAIT: float = 30.0            # 排队等待配额的最长时间（秒），超时报错
+
+    # 批量合成（/v1/audio/speech/batches）：结果落盘，重启后续跑
+    TTS_BATCH_DIR: str = "data/batches"
+    TTS_BATCH_MAX_WORKERS: int = 8              # 所有 engine 同时在途的条目上限
+    TTS_BATCH_CONCURRENCY: dict[str, int] = {"edge": 4, "volcengine": 4, "qwen": 1}
+    TTS_BATCH_MAX_REQUESTS: int = 50000         # 单个批次的条目上限
+
+    # 长文档渲染任务（/api/v1/tts/jobs）：逐 chunk 落盘，重启后从未完成的 chunk 续跑
+    TTS_RENDER_DIR: str = "data/render_jobs"
+    TTS_RENDER_MAX_RUNNING: int = 2             # 同时渲染的任务数（任务内并发取 TTS_LOOKAHEAD_WINDOW）
+    TTS_RENDER_CHUNK_RETRIES: int = 2           # 单个 chunk 失败后的重试次数，用尽则任务失败
+
+    # 指标：分阶段耗时直方图（/metrics，需 token）+ Server-Timing 响应头；关闭时 pipeline 不打点
+    TTS_METRICS_ENABLED: bool = True
+    TTS_METRICS_MAX_VOICES: int = 32            # 每个 engine 单独出 voice 标签的音色数，之后的归入 "other"
 
     # LLM 转写（可选前置步骤）
     TTS_LLM_TRANSCRIBE_ENABLED: bool = False
     TTS_LLM_TRANSCRIBE_API_URL: str = ""        # OpenAI-compatible endpoint
     TTS_LLM_TRANSCRIBE_API_KEY: str = ""
     TTS_LLM_TRANSCRIBE_MODEL: str = "gpt-4o-mini"
+    TTS_LLM_TRANSCRIBE_STREAM: bool = True      # SSE 流式转写，边转写边合成
 
     class Config:
         case_sensitive = True
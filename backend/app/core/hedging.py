@@ -0,0 +1,37 @@
+from app.core import metrics
+from app.core.config import settings
+from app.services.hedging import HedgePolicy
+
+# 每个 engine 一个对冲策略（首包延迟样本与预算跨请求、跨 pipeline 共享）
+hedge_policies: dict[str, HedgePolicy] = {
+    engine: HedgePolicy(
+        budget=budget,
+        percentile=settings.TTS_HEDGE_PERCENTILE,
+        initial_delay=settings.TTS_HEDGE_INITIAL_DELAY,
+        min_delay=settings.TTS_HEDGE_MIN_DELAY,
+    )
+    for engine, budget in settings.TTS_HEDGE_BUDGET.items()
+    if budget > 0
+}
+
+
+def hedge_for_engine(engine_name: str) -> HedgePolicy | None:
+    """返回该 engine 的对冲策略；未配置对冲的 engine 返回 None。"""
+    return hedge_policies.get(engine_name)
+
+
+def _hedge_metrics():
+    """抓取时导出各 engine 的对冲次数、对冲率、对冲胜出率与当前对冲延迟。"""
+    stats = {engine: policy.stats() for engine, policy in hedge_policies.items()}
+    return metrics.stats_series("engine", stats, [
+        ("tts_hedge_requests_total", "counter", "requests", "Chunk requests under a hedge policy"),
+        ("tts_hedge_hedges_total", "counter", "hedges", "Hedge requests sent"),
+        ("tts_hedge_wins_total", "counter", "hedge_wins", "Hedge requests that answered first"),
+        ("tts_hedge_budget_denied_total", "counter", "denied", "Hedges skipped because the budget was spent"),
+        ("tts_hedge_rate", "gauge", "hedge_rate", "Fraction of requests hedged"),
+        ("tts_hedge_win_rate", "gauge", "win_rate", "Fraction of hedges that won"),
+        ("tts_hedge_delay_seconds", "gauge", "delay", "Current hedge delay"),
+    ])
+
+
+metrics.registry.add_collector(_hedge_metrics)
@@ -0,0 +1,36 @@
+from app.core import metrics
+from app.core.config import settings
+from app.services.http_clients import HTTPClientPool
+
+# 进程内共享的 HTTP 客户端（按 upstream 一个连接池；app 关闭时由组件工厂 aclose）
+http_clients = HTTPClientPool(
+    max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+    keepalive_expiry=settings.HTTP_POOL_KEEPALIVE_EXPIRY,
+    http2=settings.HTTP_POOL_HTTP2,
+    dns_cache_ttl=settings.HTTP_DNS_CACHE_TTL,
+)
+
+
+def _http_pool_metrics():
+    """抓取时导出各 upstream 连接池占用与连接复用情况。"""
+    stats = http_clients.stats()
+    yield from metrics.stats_series("upstream", stats, [
+        ("tts_http_requests_total", "counter", "requests", "Requests sent per upstream"),
+        ("tts_http_connects_total", "counter", "connects", "New connections opened per upstream"),
+        ("tts_http_pool_max_connections", "gauge", "max_connections", "Connection pool size per upstream"),
+    ])
+    connections = metrics.Gauge(
+        "tts_http_pool_connections", "Pooled connections per upstream by state", ("upstream", "state"),
+    )
+    for upstream, st in stats.items():
+        for state in ("active", "idle"):
+            connections.set(st[state], upstream, state)
+    yield from connections.render()
+    for key, value in http_clients.dns_stats().items():
+        dns = metrics.Gauge(f"tts_http_dns_cache_{key}_total", f"DNS cache {key}", kind="counter")
+        dns.set(value)
+        yield from dns.render()
+
+
+metrics.registry.add_collector(_http_pool_metrics)
@@ -0,0 +1,372 @@
+"""进程内指标：轻量 Prometheus 文本格式导出（无第三方依赖）。
+
+TTS_METRICS_ENABLED=False 时不记录请求指标，/metrics 返回 404；PipelineTimings 仍照常创建，
+engine 路由要用其中的 engine 首包延迟。
+
+voice 来自客户端请求，标签值按 engine 限定在先出现的 TTS_METRICS_MAX_VOICES 个音色内，
+其余归入 "other"，避免任意 voice 字符串造成时间序列无限增长。
+"""
+from __future__ import annotations
+
+import bisect
+import logging
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Iterable
+
+from app.core.config import settings
+from app.services.timing import PipelineTimings
+
+logger = logging.getLogger(__name__)
+
+enabled = settings.TTS_METRICS_ENABLED
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 延迟类直方图桶（秒）：覆盖本地预处理的亚毫秒级到长文本合成的分钟级
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+# 尚无已输出 chunk 时估算剩余音频时长的语速（中文约 4 字/秒）
+FALLBACK_SECONDS_PER_CHAR = 0.25
+# 超出 voice 标签上限的音色统一使用的标签值
+OTHER_VOICE = "other"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _samples(
+    name: str,
+    doc: str,
+    kind: str,
+    labelnames: tuple[str, ...],
+    values: Iterable[tuple[tuple[str, ...], float]],
+) -> Iterable[str]:
+    yield f"# HELP {name} {doc}"
+    yield f"# TYPE {name} {kind}"
+    for labels, value in values:
+        yield f"{name}{_labels(labelnames, labels)} {_fmt(value)}"
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        return _samples(self.name, self.doc, "counter", self.labelnames, self._values.items())
+
+
+class Gauge:
+    """当前值指标，set() 覆盖写入；没有任何样本时不输出。
+
+    collector 在抓取时新建并填入各组件 stats() 的值；kind="counter" 用于导出组件自己维护的累计计数。
+    """
+
+    def __init__(self, name: str, doc: str, labelnames: tuple[str, ...] = (), kind: str = "gauge") -> None:
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self.kind = kind
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float | None, *labels: str) -> None:
+        """value 为 None（尚无数据）时不记录该样本。"""
+        if value is not None:
+            self._values[labels] = float(value)
+
+    def render(self) -> Iterable[str]:
+        if not self._values:
+            return ()
+        return _samples(self.name, self.doc, self.kind, self.labelnames, self._values.items())
+
+
+def stats_series(
+    label: str,
+    stats: dict[str, dict[str, Any]],
+    series: Iterable[tuple[str, str, str, str]],
+) -> Iterable[str]:
+    """把 {标签值: stats 字典} 按一个标签展开成多个指标。
+
+    series 为 (指标名, 类型, stats 键, 说明)；值为 None 的样本跳过。
+    """
+    for name, kind, key, doc in series:
+        gauge = Gauge(name, doc, (label,), kind=kind)
+        for value, st in stats.items():
+            gauge.set(st[key], value)
+        yield from gauge.render()
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels → [各桶计数（非累计）..., +Inf 桶计数, sum]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} histogram"
+        bounds = self.buckets + (float("inf"),)
+        for labels, series in self._values.items():
+            cumulative = 0.0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{_fmt(bound)}"')
+                yield f"{self.name}_bucket{le} {_fmt(cumulative)}"
+            label_str = _labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_str} {_fmt(series[-1])}"
+            yield f"{self.name}_count{label_str} {_fmt(cumulative)}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: list[Counter | Histogram] = []
+        self._collectors: list[Callable[[], Iterable[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]) -> None:
+        """注册抓取时才计算的指标（如缓存统计），collector 产出文本行（用 Gauge / stats_series 生成）。"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                logger.warning(f"metrics collector failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "tts_stage_seconds", "Pipeline text stage time per request (llm/preprocess/polyphone/chunk)",
+    ("engine", "voice", "stage"),
+))
+CHUNK_TTFB_SECONDS = registry.register(Histogram(
+    "tts_chunk_ttfb_seconds", "Engine time to first audio byte per synthesized chunk",
+    ("engine", "voice"),
+))
+CHUNK_SECONDS = registry.register(Histogram(
+    "tts_chunk_duration_seconds", "Engine synthesis time per chunk (cache hits excluded)",
+    ("engine", "voice"),
+))
+TTFB_SECONDS = registry.register(Histogram(
+    "tts_ttfb_seconds", "Request start to first audio byte handed to the client",
+    ("engine", "voice"),
+))
+REQUEST_SECONDS = registry.register(Histogram(
+    "tts_request_duration_seconds", "Total wall time of a streamed TTS response",
+    ("engine", "voice"),
+))
+RTF = registry.register(Histogram(
+    "tts_rtf", "Real-time factor: wall time / audio duration",
+    ("engine", "voice"), buckets=RTF_BUCKETS,
+))
+AUDIO_SECONDS = registry.register(Counter(
+    "tts_audio_seconds_total", "Audio seconds streamed to clients", ("engine", "voice"),
+))
+REQUESTS = registry.register(Counter(
+    "tts_requests_total", "Streamed TTS responses by outcome", ("engine", "status"),
+))
+AUDIO_SECONDS_SAVED = registry.register(Counter(
+    "tts_audio_seconds_saved_total",
+    "Estimated audio seconds not synthesized because the client disconnected",
+    ("engine", "voice"),
+))
+
+
+def new_timings() -> PipelineTimings:
+    """为请求创建 PipelineTimings（指标关闭时也需要：路由按其中的 engine 首包延迟统计健康度）。"""
+    return PipelineTimings()
+
+
+# engine → 已分配独立标签的 voice
+_voice_labels: dict[str, set[str]] = {}
+
+
+def voice_label(engine: str, voice: str) -> str:
+    """voice 的标签值：每个 engine 最多 TTS_METRICS_MAX_VOICES 个，之后出现的新音色记为 "other"。"""
+    seen = _voice_labels.setdefault(engine, set())
+    if voice in seen:
+        return voice
+    if len(seen) >= settings.TTS_METRICS_MAX_VOICES:
+        return OTHER_VOICE
+    seen.add(voice)
+    return voice
+
+
+def observe_request(timings: PipelineTimings, engine: str, voice: str, status: str) -> None:
+    """请求结束时把 timings 写入各直方图。"""
+    voice = voice_label(engine, voice)
+    if timings.total is None:
+        timings.total = timings.elapsed()
+    for stage, seconds in timings.stages.items():
+        STAGE_SECONDS.observe(seconds, engine, voice, stage)
+    for seconds in timings.chunk_ttfb.values():
+        CHUNK_TTFB_SECONDS.observe(seconds, engine, voice)
+    for seconds in timings.chunk_duration.values():
+        CHUNK_SECONDS.observe(seconds, engine, voice)
+    if timings.client_first_byte is not None:
+        TTFB_SECONDS.observe(timings.client_first_byte, engine, voice)
+    REQUEST_SECONDS.observe(timings.total, engine, voice)
+    if timings.rtf is not None:
+        RTF.observe(timings.rtf, engine, voice)
+    if timings.audio_seconds:
+        AUDIO_SECONDS.inc(engine, voice, amount=timings.audio_seconds)
+    REQUESTS.inc(engine, status)
+    if status == "cancelled":
+        saved = estimate_saved_seconds(timings)
+        if saved > 0:
+            AUDIO_SECONDS_SAVED.inc(engine, voice, amount=saved)
+
+
+def estimate_saved_seconds(timings: PipelineTimings) -> float:
+    """断连后未合成部分的音频时长估算：剩余 chunk 字数 × 本请求实测的秒/字。
+
+    只统计已分段的文本（LLM 流式转写时尚未产出的部分不计），结果偏保守。
+    """
+    remaining = timings.chars_total - timings.chars_done
+    if remaining <= 0:
+        return 0.0
+    if timings.chars_done and timings.audio_seconds > 0:
+        per_char = timings.audio_seconds / timings.chars_done
+    else:
+        per_char = FALLBACK_SECONDS_PER_CHAR
+    return remaining * per_char
+
+
+async def instrument_stream(
+    audio_gen: AsyncIterator,
+    timings: PipelineTimings | None,
+    engine: str,
+    voice: str,
+    prime: bool = True,
+    transform: Callable[[AsyncIterator], AsyncIterator] | None = None,
+) -> tuple[AsyncIterator, dict[str, str]]:
+    """给流式响应体加上计时，返回 (响应体, 响应头)。
+
+    prime=True 时先等到首个音频数据再返回，使 Server-Timing 头能带上首字节前的各阶段耗时，
+    首段合成失败也能作为普通错误响应返回；请求体与响应体同时流动的端点应传 False。
+    transform 用于在计时层内包装数据（如 SSE 编码）。指标关闭时原样返回。
+    """
+    if timings is None or not enabled:
+        return (_transformed(transform, audio_gen) if transform else audio_gen), {}
+
+    headers: dict[str, str] = {}
+    if prime:
+        try:
+            audio_gen = await _primed(audio_gen)
+        except Exception:
+            observe_request(timings, engine, voice, "error")
+            raise
+        headers["Server-Timing"] = timings.server_timing()
+    body = _transformed(transform, audio_gen) if transform else audio_gen
+    return _observed(body, timings, engine, voice), headers
+
+
+async def _primed(gen: AsyncIterator) -> AsyncIterator:
+    """预取首个元素，返回仍从首个元素开始的迭代器。"""
+    try:
+        first = await gen.__anext__()
+    except StopAsyncIteration:
+        return _empty()
+    return _prepend(first, gen)
+
+
+async def _prepend(first, gen: AsyncIterator) -> AsyncGenerator:
+    try:
+        yield first
+        async for item in gen:
+            yield item
+    finally:
+        await _aclose(gen)
+
+
+async def _transformed(
+    transform: Callable[[AsyncIterator], AsyncIterator],
+    source: AsyncIterator,
+) -> AsyncGenerator:
+    """关闭时连同 source 一起关闭（包装生成器被关闭时不会自行关闭其输入）。"""
+    body = transform(source)
+    try:
+        async for item in body:
+            yield item
+    finally:
+        await _aclose(body)
+        await _aclose(source)
+
+
+async def _aclose(it) -> None:
+    aclose = getattr(it, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+async def _empty() -> AsyncGenerator:
+    return
+    yield
+
+
+async def _observed(
+    body: AsyncIterator,
+    timings: PipelineTimings,
+    engine: str,
+    voice: str,
+) -> AsyncGenerator:
+    status = "error"
+    try:
+        async for item in body:
+            if timings.client_first_byte is None:
+                timings.client_first_byte = timings.elapsed()
+            yield item
+        status = "ok"
+    except Exception:
+        raise
+    except BaseException:
+        # 客户端断开（GeneratorExit / CancelledError）
+        status = "cancelled"
+        raise
+    finally:
+        await _aclose(body)
+        timings.total = timings.elapsed()
+        observe_request(timings, engine, voice, status)
@@ -0,0 +1,44 @@
+from app.core import metrics
+from app.core.config import settings
+from app.services.router import EngineRouter
+
+# 进程内共享的 engine 路由（健康度与熔断状态跨请求累积）
+engine_router = EngineRouter(
+    fallbacks=settings.TTS_ROUTER_FALLBACKS,
+    fallback_voices=settings.TTS_ROUTER_FALLBACK_VOICES,
+    latency_slo=settings.TTS_ROUTER_LATENCY_SLO,
+    failure_threshold=settings.TTS_ROUTER_FAILURE_THRESHOLD,
+    cooldown=settings.TTS_ROUTER_COOLDOWN,
+    window=settings.TTS_ROUTER_WINDOW,
+    probe_every=settings.TTS_ROUTER_PROBE_EVERY,
+)
+
+_BREAKER_STATES = ("closed", "open", "half_open")
+
+
+def _router_metrics():
+    """抓取时导出路由决策计数与各 engine 的熔断状态、滚动延迟、错误率。"""
+    decisions = metrics.Gauge(
+        "tts_router_decisions_total", "Routing decisions by requested engine, chosen engine and reason",
+        ("requested", "engine", "reason"), kind="counter",
+    )
+    for labels, count in engine_router.decisions.items():
+        decisions.set(count, *labels)
+    yield from decisions.render()
+    stats = engine_router.stats()
+    breaker = metrics.Gauge("tts_router_breaker_state", "Circuit breaker state per engine", ("engine", "state"))
+    for engine, st in stats.items():
+        for state in _BREAKER_STATES:
+            breaker.set(st["state"] == state, engine, state)
+    yield from breaker.render()
+    yield from metrics.stats_series("engine", stats, [
+        ("tts_router_latency_seconds", "gauge", "latency", "Rolling median engine time to first byte"),
+        ("tts_router_latency_slo_seconds", "gauge", "latency_slo", "Configured time to first byte SLO"),
+        ("tts_router_error_rate", "gauge", "error_rate", "Rolling error rate"),
+        ("tts_router_requests_total", "counter", "requests", "Requests routed to the engine"),
+        ("tts_router_errors_total", "counter", "errors", "Upstream failures counted against the engine"),
+        ("tts_router_breaker_opens_total", "counter", "breaker_opens", "Times the circuit breaker opened"),
+    ])
+
+
+metrics.registry.add_collector(_router_metrics)
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import logging
+import sys
+from functools import partial
+
+import anyio
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+
+if sys.version_info < (3, 11):
+    from exceptiongroup import BaseExceptionGroup  # anyio 在 3.10 上的依赖
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineStreamingResponse(StreamingResponse):
+    """pipeline 音频流响应：客户端断开时立即取消整棵合成任务树。
+
+    Starlette 不会关闭 body_iterator；ASGI spec >= 2.4 时也不再监听断连，
+    uvicorn 在断连后静默丢弃 send，pipeline 会把剩余 chunk 全部合成完。
+    这里始终并发监听 http.disconnect，断连即取消发送，并在退出时显式 aclose()
+    body_iterator：pipeline 的 finally 随即取消在途的前瞻 chunk task，
+    engine 的 httpx 流 / websocket 随 task 取消而关闭。
+    """
+
+    # 请求体已读完的端点才能监听断连（监听会消费 receive() 消息）
+    watch_disconnect = True
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self._stream(receive, send)
+        except OSError:
+            # 与 Starlette 一致：写响应时连接已断开
+            raise ClientDisconnect() from None
+        finally:
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                with anyio.CancelScope(shield=True):
+                    await aclose()
+
+        if self.background is not None:
+            await self.background()
+
+    async def _stream(self, receive, send) -> None:
+        if not self.watch_disconnect:
+            await self.stream_response(send)
+            return
+        try:
+            async with anyio.create_task_group() as task_group:
+
+                async def wrap(func) -> None:
+                    await func()
+                    task_group.cancel_scope.cancel()
+
+                task_group.start_soon(wrap, partial(self.stream_response, send))
+                await wrap(partial(self._wait_disconnect, receive))
+        except BaseExceptionGroup as group:
+            # task group 把 pipeline 的异常包成 ExceptionGroup：只有一个时原样抛出，上层按原类型处理
+            exc = group
+            while isinstance(exc, BaseExceptionGroup) and len(exc.exceptions) == 1:
+                exc = exc.exceptions[0]
+            raise exc
+
+    async def _wait_disconnect(self, receive) -> None:
+        await self.listen_for_disconnect(receive)
+        logger.info("PipelineStreamingResponse: client disconnected, cancelling synthesis")
@@ -8,9 +8,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger("app")
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from app.core import metrics
+from app.core.components import components
 from app.core.config import settings
+from app.core.security import verify_token
 from app.api.v1.endpoints import tts, text, openai_tts
 
 app = FastAPI(
@@ -52,7 +56,25 @@ async def startup_event():
     print(f"INFO:  Generated Admin Token (Never Expires):")
     print(f"{token}")
     print("="*60 + "\n")
+    # 续跑上次未完成的批量合成
+    await openai_tts.speech_batches.resume()
+    await tts.render_jobs.resume()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # 停止批量 worker / 渲染任务（未完成部分下次启动续跑），关闭共享 engine / LLM 转写器的连接池
+    await openai_tts.speech_batches.aclose()
+    await tts.render_jobs.aclose()
+    await components.aclose()
 
 @app.get("/")
 def root():
     return {"message": "Welcome to TTS Bundles API"}
+
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(verify_token)])
+def prometheus_metrics():
+    """Prometheus 抓取端点（文本格式 0.0.4）。与其它接口一样需要 Bearer token（抓取配置里设 authorization）。"""
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="metrics disabled")
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
@@ -25,6 +25,11 @@ class TTSRequest(BaseModel):
     language: str = "zh"
     temperature: Optional[float] = None
     instruct: Optional[str] = None
+    session_id: Optional[str] = None  # 会话 id：同一会话复用同一参考音频
+
+
+class RenderJobTextUpdate(BaseModel):
+    text: str  # 修改后的完整原文；内容未变的 chunk 复用已合成音频
 
 
 class VoiceInfo(BaseModel):
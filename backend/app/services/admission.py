@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionTimeout(RuntimeError):
+    """排队超过 max_wait 仍未获得上游配额。"""
+
+
+class AdmissionController:
+    """上游配额的客户端准入：令牌桶限 QPS，信号量限并发 session。
+
+    调用方在 slot() 中排队（FIFO）直到拿到并发名额与令牌，超过 max_wait 抛出 AdmissionTimeout；
+    名额在 slot() 退出（整个流式请求结束）时归还。稳定跑在配额之下，
+    比撞上配额错误后再重试的吞吐更高。qps / max_concurrency 为 0 表示该项不限制。
+    """
+
+    def __init__(
+        self,
+        name: str = "",
+        qps: float = 0.0,
+        burst: float | None = None,
+        max_concurrency: int = 0,
+        max_wait: float = 30.0,
+        on_wait: Callable[[float], None] | None = None,
+    ) -> None:
+        self.name = name
+        self.qps = qps
+        self.burst = burst if burst is not None else max(1.0, qps)
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.on_wait = on_wait
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._token_lock = asyncio.Lock()
+        self._sessions = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        self.waiting = 0
+        self.active = 0
+        self.admitted = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """排队获取一个上游请求名额，退出时归还并发名额。"""
+        t0 = time.monotonic()
+        self.waiting += 1
+        acquired = False
+        try:
+            await asyncio.wait_for(self._acquire(), timeout=self.max_wait)
+            acquired = True
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise AdmissionTimeout(
+                f"{self.name or 'upstream'}: no quota within {self.max_wait:g}s "
+                f"(qps={self.qps:g}, concurrency={self.max_concurrency})"
+            ) from None
+        finally:
+            self.waiting -= 1
+            waited = time.monotonic() - t0
+            self.wait_seconds += waited
+            if self.on_wait is not None:
+                self.on_wait(waited)
+        self.admitted += 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            if acquired and self._sessions is not None:
+                self._sessions.release()
+
+    async def _acquire(self) -> None:
+        if self._sessions is not None:
+            await self._sessions.acquire()
+        try:
+            if self.qps > 0:
+                await self._take_token()
+        except BaseException:
+            # 超时/取消时已拿到的并发名额要还回去
+            if self._sessions is not None:
+                self._sessions.release()
+            raise
+
+    async def _take_token(self) -> None:
+        # 锁保证先到先得：排在前面的请求等到令牌后，后面的才开始计算等待
+        async with self._token_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.qps)
+                self._refilled_at = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.qps)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "qps": self.qps,
+            "max_concurrency": self.max_concurrency,
+            "waiting": self.waiting,
+            "active": self.active,
+            "admitted": self.admitted,
+            "timeouts": self.timeouts,
+            "wait_seconds": self.wait_seconds,
+        }
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkAudioCache:
+    """chunk 级音频缓存：内存 LRU + 磁盘二级存储，按内容寻址。
+
+    key = sha256(engine, voice, speed, engine_kwargs, sha256(预处理后 chunk 文本), ref_audio 摘要)。
+    内存层按字节数限制容量；磁盘层按字节数限制，按最近访问时间淘汰。
+    非确定性 engine 的 engine_kwargs 中出现 bypass_kwargs（如 Qwen temperature）时不缓存。
+    """
+
+    def __init__(
+        self,
+        memory_max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: str | None = None,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+        bypass_kwargs: Iterable[str] = ("temperature",),
+    ) -> None:
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self.bypass_kwargs = frozenset(bypass_kwargs)
+
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        # 磁盘索引：key → 文件大小，按最近访问排序（启动时按 mtime 扫描重建）
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_bytes = 0
+        self._disk_loaded = False
+        self._disk_lock = asyncio.Lock()
+
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "puts": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "bytes_served": 0,
+            "bytes_stored": 0,
+        }
+
+    @staticmethod
+    def make_key(
+        engine: str,
+        voice: str,
+        speed: float,
+        text: str,
+        engine_kwargs: dict[str, Any] | None = None,
+        ref_audio: bytes | None = None,
+    ) -> str:
+        """生成内容寻址 key。"""
+        material = json.dumps(
+            {
+                "engine": engine,
+                "voice": voice,
+                "speed": round(float(speed), 4),
+                "kwargs": engine_kwargs or {},
+                "text": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+                "ref": hashlib.sha256(ref_audio).hexdigest() if ref_audio else None,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, engine_kwargs: dict[str, Any] | None, deterministic: bool = False) -> bool:
+        """engine_kwargs 含非确定性参数时不缓存；确定性 engine 的输出只取决于 key，总是可缓存。"""
+        if deterministic or not engine_kwargs:
+            return True
+        return not any(
+            engine_kwargs.get(name) is not None for name in self.bypass_kwargs
+        )
+
+    def record_bypass(self) -> None:
+        self._stats["bypassed"] += 1
+
+    async def get(self, key: str) -> bytes | None:
+        """查询缓存：内存 → 磁盘。磁盘命中会回填内存。"""
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            self._stats["bytes_served"] += len(audio)
+            return audio
+
+        if self.disk_dir is not None:
+            await self._ensure_disk_loaded()
+            if key in self._disk:
+                audio = await asyncio.to_thread(self._read_file, key)
+                if audio is not None:
+                    self._disk.move_to_end(key)
+                    self._store_memory(key, audio)
+                    self._stats["disk_hits"] += 1
+                    self._stats["bytes_served"] += len(audio)
+                    return audio
+                self._drop_disk_index(key)
+
+        self._stats["misses"] += 1
+        return None
+
+    async def put(self, key: str, audio: bytes) -> None:
+        """写入缓存（内存 + 磁盘）。空音频不缓存。"""
+        if not audio:
+            return
+        self._stats["puts"] += 1
+        self._stats["bytes_stored"] += len(audio)
+        self._store_memory(key, audio)
+
+        if self.disk_dir is None or len(audio) > self.disk_max_bytes:
+            return
+        await self._ensure_disk_loaded()
+        if self.disk_dir is None:
+            return
+        if key in self._disk:
+            self._disk.move_to_end(key)
+            return
+        try:
+            await asyncio.to_thread(self._write_file, key, audio)
+        except OSError as e:
+            logger.warning(f"ChunkAudioCache: disk write failed: {e}")
+            return
+        self._disk[key] = len(audio)
+        self._disk_bytes += len(audio)
+        await self._evict_disk()
+
+    def stats(self) -> dict[str, Any]:
+        """命中/未命中/字节数等统计。"""
+        lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["misses"]
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        return {
+            **self._stats,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "memory_max_bytes": self.memory_max_bytes,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_bytes,
+            "disk_max_bytes": self.disk_max_bytes if self.disk_dir else 0,
+        }
+
+    # ------------------------------------------------------------------ #
+    # 内存层
+    # ------------------------------------------------------------------ #
+    def _store_memory(self, key: str, audio: bytes) -> None:
+        if len(audio) > self.memory_max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.memory_max_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._stats["memory_evictions"] += 1
+
+    # ------------------------------------------------------------------ #
+    # 磁盘层
+    # ------------------------------------------------------------------ #
+    def _path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.bin"
+
+    def _read_file(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            audio = path.read_bytes()
+            os.utime(path)
+            return audio
+        except OSError:
+            return None
+
+    def _write_file(self, key: str, audio: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{time.monotonic_ns()}.tmp")
+        tmp.write_bytes(audio)
+        os.replace(tmp, path)
+
+    def _scan_disk(self) -> list[tuple[str, int, float]]:
+        entries: list[tuple[str, int, float]] = []
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+        for path in self.disk_dir.glob("*/*.bin"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((path.stem, st.st_size, st.st_mtime))
+        entries.sort(key=lambda e: e[2])
+        return entries
+
+    async def _ensure_disk_loaded(self) -> None:
+        if self._disk_loaded:
+            return
+        async with self._disk_lock:
+            if self._disk_loaded:
+                return
+            try:
+                entries = await asyncio.to_thread(self._scan_disk)
+            except OSError as e:
+                logger.warning(f"ChunkAudioCache: disk cache disabled, scan failed: {e}")
+                self.disk_dir = None
+                entries = []
+            for key, size, _ in entries:
+                self._disk[key] = size
+                self._disk_bytes += size
+            self._disk_loaded = True
+            logger.info(
+                f"ChunkAudioCache: disk index loaded, {len(self._disk)} entries, "
+                f"{self._disk_bytes} bytes"
+            )
+        await self._evict_disk()
+
+    def _drop_disk_index(self, key: str) -> None:
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+
+    async def _evict_disk(self) -> None:
+        victims: list[str] = []
+        while self._disk_bytes > self.disk_max_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            victims.append(key)
+        if not victims:
+            return
+        self._stats["disk_evictions"] += len(victims)
+        await asyncio.to_thread(self._unlink_files, victims)
+
+    def _unlink_files(self, keys: list[str]) -> None:
+        for key in keys:
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+
+
+class RefAudioCache:
+    """参考音频缓存：按 (engine, voice, speed) 或会话 id 保存已截取的 ref_audio。
+
+    命中时新请求无需等待首段合成即可把 ref_audio 传给所有 chunk，全部 chunk 并发开始。
+    同一 key 只保留首次写入的 ref（不覆盖），保证同一声音/会话音色一致。
+    容量按条目数限制（LRU），条目在 ttl_seconds 内未被访问即过期。
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600.0) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple, tuple[bytes, float]] = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "puts": 0, "expired": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(
+        engine: str,
+        voice: str,
+        speed: float,
+        session_id: str | None = None,
+    ) -> tuple:
+        """会话 id 存在时按会话隔离，否则按 (engine, voice, speed) 共享。"""
+        if session_id:
+            return ("session", session_id, engine, voice)
+        return ("voice", engine, voice, round(float(speed), 4))
+
+    def get(self, key: tuple) -> bytes | None:
+        ref = self._live(key)
+        if ref is None:
+            self._stats["misses"] += 1
+            return None
+        self._entries[key] = (ref, time.monotonic())
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return ref
+
+    def put(self, key: tuple, ref: bytes) -> None:
+        """写入 ref；key 已存在且未过期时保持原 ref 不变。"""
+        if not ref or self._live(key) is not None:
+            return
+        self._entries[key] = (ref, time.monotonic())
+        self._stats["puts"] += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _live(self, key: tuple) -> bytes | None:
+        """返回未过期的 ref；过期条目顺便清除。"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        ref, last_used = entry
+        if time.monotonic() - last_used > self.ttl_seconds:
+            del self._entries[key]
+            self._stats["expired"] += 1
+            return None
+        return ref
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import logging
+from functools import lru_cache
+
+from app.services.wav import STREAMING_DATA_SIZE, parse_wav_header, silence_frames, wav_header
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "pcm": "audio/pcm",
+    "mp3": "audio/mpeg",
+}
+
+# MPEG Layer III 码率表 (kbps)：MPEG1 / MPEG2 & 2.5
+_MP3_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_BITRATES[0] = _MP3_BITRATES[2]
+# 采样率表：version bits → (idx0, idx1, idx2)
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def parse_mp3_frame_header(data, pos: int = 0) -> tuple[int, int, int] | None:
+    """解析 MPEG Layer III 帧头。
+
+    Returns:
+        (frame_len, sample_rate, samples_per_frame)；不是合法 Layer III 帧头时返回 None
+    """
+    if pos + 4 > len(data):
+        return None
+    b1, b2 = data[pos + 1], data[pos + 2]
+    if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 0b11
+    layer = (b1 >> 1) & 0b11
+    bitrate_idx = b2 >> 4
+    sr_idx = (b2 >> 2) & 0b11
+    if version == 1 or layer != 0b01 or bitrate_idx in (0, 15) or sr_idx == 3:
+        return None
+    bitrate = _MP3_BITRATES[version][bitrate_idx] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][sr_idx]
+    padding = (b2 >> 1) & 1
+    coeff = 144 if version == 3 else 72
+    samples = 1152 if version == 3 else 576
+    return coeff * bitrate // sample_rate + padding, sample_rate, samples
+
+
+def mp3_silent_frame(header) -> tuple[bytes, int, int]:
+    """按已有帧头构造一帧静音（无 CRC、无填充、side info 全零 → 解码为全零样本）。
+
+    Returns:
+        (frame_bytes, sample_rate, samples_per_frame)
+    """
+    b1 = header[1] | 0x01          # protection bit = 1：无 CRC
+    b2 = header[2] & ~0x02 & 0xFF  # 清除 padding
+    new_header = bytes((0xFF, b1, b2, header[3]))
+    frame_len, sample_rate, samples = parse_mp3_frame_header(new_header)
+    return new_header + bytes(frame_len - 4), sample_rate, samples
+
+
+@lru_cache(maxsize=32)
+def _mp3_silence(frame: bytes, n_frames: int) -> bytes:
+    return frame * n_frames
+
+
+def _id3v2_len(data) -> int | None:
+    """ID3v2 标签总长度；数据不足返回 None，无标签返回 0。"""
+    if len(data) < 3:
+        return None if bytes(data[:len(data)]) == b"ID3"[:len(data)] else 0
+    if bytes(data[0:3]) != b"ID3":
+        return 0
+    if len(data) < 10:
+        return None
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+class AudioOutputStage:
+    """输出整形：把逐 chunk 的 engine 原生音频拼成单一连续音频流。
+
+    - wav: 只输出一个流式 WAV 头，之后每个 chunk 去掉自身 WAV 头只输出 PCM
+    - mp3: 去掉每个 chunk 开头的 ID3v2 标签，MP3 帧直接拼接
+    - pcm: 原样拼接
+    段间静音按已学习到的格式生成（PCM 零样本 / 静音 MP3 帧），不做重编码。
+    切片使用 memoryview，避免在热路径复制 chunk 数据。
+    """
+
+    def __init__(
+        self,
+        codec: str | None,
+        sample_rate: int = 24000,
+        channels: int = 1,
+        sample_width: int = 2,
+    ) -> None:
+        self.codec = codec if codec in MEDIA_TYPES else None
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self._header_sent = False
+        self._format_known = self.codec == "pcm"
+        self._mp3_silent_frame: bytes | None = None
+        self._mp3_frame_seconds = 0.0
+        self._mp3_bytes_per_second = 0.0
+        self._payload_bytes = 0
+        self._pending = bytearray()
+        self._in_header = False
+        self._remaining: int | None = None
+        self._chunk_bytes = 0
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES.get(self.codec or "", "application/octet-stream")
+
+    @property
+    def duration_seconds(self) -> float:
+        """已输出音频（含段间静音）的时长估算；格式未知时为 0。
+
+        wav/pcm 按样本数精确计算；mp3 按首帧码率估算（engine 输出均为 CBR）。
+        """
+        if self.codec in ("wav", "pcm"):
+            return self._payload_bytes / (self.sample_rate * self.channels * self.sample_width)
+        if self.codec == "mp3" and self._mp3_bytes_per_second:
+            return self._payload_bytes / self._mp3_bytes_per_second
+        return 0.0
+
+    def begin_chunk(self) -> None:
+        """标记新 chunk 开始：后续数据开头可能带有容器头/标签。"""
+        self._pending.clear()
+        self._in_header = self.codec in ("wav", "mp3")
+        self._remaining = None
+        self._chunk_bytes = 0
+
+    def feed(self, data: bytes | memoryview) -> list[bytes | memoryview]:
+        """输入一段 engine 输出，返回可直接下发的数据（bytes / memoryview）列表。"""
+        if not data:
+            return []
+        if self.codec is None:
+            return [data]
+
+        view = memoryview(data)
+        out: list[bytes | memoryview] = []
+        if self._in_header:
+            if self._pending:
+                self._pending += view
+                view = memoryview(bytes(self._pending))
+            consumed = self._consume_header(view, out)
+            if consumed is None:
+                if not self._pending:
+                    self._pending += view
+                return out
+            self._pending.clear()
+            self._in_header = False
+            view = view[consumed:]
+
+        if self._remaining is not None:
+            if self._remaining <= 0:
+                return out
+            view = view[:self._remaining]
+            self._remaining -= len(view)
+        if len(view):
+            self._chunk_bytes += len(view)
+            self._payload_bytes += len(view)
+            out.append(view)
+        return out
+
+    def end_chunk(self) -> bytes:
+        """chunk 结束：PCM 按帧对齐补零，保证后续样本不错位。"""
+        if self._in_header and self._pending:
+            # 没有识别出头部，原样输出
+            data = bytes(self._pending)
+            self._pending.clear()
+            self._in_header = False
+            return data
+        if self.codec in ("wav", "pcm"):
+            block_align = self.channels * self.sample_width
+            rem = self._chunk_bytes % block_align
+            if rem:
+                self._payload_bytes += block_align - rem
+                return bytes(block_align - rem)
+        return b""
+
+    def silence(self, seconds: float) -> bytes:
+        """按当前流格式生成静音；格式未知时返回空。"""
+        if seconds <= 0 or not self._format_known:
+            return b""
+        if self.codec in ("wav", "pcm"):
+            data = silence_frames(self.sample_rate, self.sample_width, self.channels, seconds)
+        elif self.codec == "mp3" and self._mp3_silent_frame:
+            n = max(1, round(seconds / self._mp3_frame_seconds))
+            data = _mp3_silence(self._mp3_silent_frame, n)
+        else:
+            return b""
+        self._payload_bytes += len(data)
+        return data
+
+    # ------------------------------------------------------------------ #
+    def _consume_header(self, view: memoryview, out: list[bytes | memoryview]) -> int | None:
+        """解析 chunk 开头的头部，返回需要跳过的字节数；数据不足返回 None。"""
+        if self.codec == "wav":
+            try:
+                parsed = parse_wav_header(view)
+            except ValueError:
+                logger.warning("AudioOutputStage: chunk is not WAV, passing through as PCM")
+                self._ensure_wav_header(out)
+                return 0
+            if parsed is None:
+                return None
+            header_len, channels, sample_width, sample_rate, data_size = parsed
+            if self._format_known and (channels, sample_width, sample_rate) != (
+                self.channels, self.sample_width, self.sample_rate,
+            ):
+                logger.warning(
+                    f"AudioOutputStage: chunk format {sample_rate}Hz/{channels}ch/"
+                    f"{sample_width * 8}bit differs from stream format"
+                )
+            else:
+                self.channels, self.sample_width, self.sample_rate = channels, sample_width, sample_rate
+                self._format_known = True
+            self._ensure_wav_header(out)
+            if 0 < data_size < STREAMING_DATA_SIZE:
+                self._remaining = data_size
+            return header_len
+
+        # mp3
+        tag_len = _id3v2_len(view)
+        if tag_len is None or len(view) < tag_len + 4:
+            return None
+        if self._mp3_silent_frame is None:
+            header = view[tag_len:tag_len + 4]
+            parsed = parse_mp3_frame_header(header)
+            if parsed is not None:
+                frame, sample_rate, samples = mp3_silent_frame(header)
+                self._mp3_silent_frame = frame
+                self._mp3_frame_seconds = samples / sample_rate
+                self._mp3_bytes_per_second = parsed[0] / self._mp3_frame_seconds
+                self.sample_rate = sample_rate
+                self._format_known = True
+        return tag_len
+
+    def _ensure_wav_header(self, out: list) -> None:
+        if not self._header_sent:
+            out.append(wav_header(self.sample_rate, self.channels, self.sample_width))
+            self._header_sent = True
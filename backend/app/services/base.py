@@ -1,6 +1,46 @@
 from __future__ import annotations
 
-from typing import Protocol, AsyncGenerator, runtime_checkable, Any
+from dataclasses import dataclass
+from typing import Protocol, runtime_checkable, Any
+
+
+@dataclass(frozen=True)
+class EngineCapabilities:
+    """engine 能力声明，pipeline / 缓存 / 输出阶段据此选择合成路径。
+
+    - native_format（wav / mp3 / pcm）：原生输出编码；输出阶段据此去掉逐 chunk 的容器头、
+      生成同格式静音，拼成单一连续音频流。None 表示未知（原样透传）
+    - output_formats：能按 audio_format 参数直接输出的编码，请求的编码在其中时不转码
+    - sample_rate / channels / sample_width：输出 PCM 的格式（pcm 无头，静音与时长按此计算）
+    - streaming：提供 generate_chunk_stream（参数同 generate_chunk，逐块 yield），边合成边下发
+    - session_streaming：提供 generate_session_stream，整个请求共用一个上游 session
+    - voice_cloning：接受 ref_audio；pipeline 会把首段音频截取为后续 chunk 的 ref_audio
+      （后续 chunk 需等待首段完成），否则所有 chunk 可直接并发
+    - deterministic：同样的输入总得到相同音频；为 False 时出现采样参数（如 temperature）不缓存
+    - max_chars：单次调用的文本上限，分段时不超过该长度；None 为不限
+    - recommended_concurrency：同时在途 chunk 数的建议值（未单独配置前瞻窗口时使用）
+    """
+
+    native_format: str | None = None
+    output_formats: tuple[str, ...] = ()
+    sample_rate: int = 24000
+    channels: int = 1
+    sample_width: int = 2
+    streaming: bool = False
+    session_streaming: bool = False
+    voice_cloning: bool = False
+    deterministic: bool = True
+    max_chars: int | None = None
+    recommended_concurrency: int = 1
+
+
+# 未声明 capabilities 的 engine：只按 generate_chunk 整段合成、原样透传输出
+DEFAULT_CAPABILITIES = EngineCapabilities()
+
+
+def capabilities_of(engine: Any) -> EngineCapabilities:
+    """engine 的能力声明（类属性或实例属性 capabilities），未声明时为 DEFAULT_CAPABILITIES。"""
+    return getattr(engine, "capabilities", DEFAULT_CAPABILITIES)
 
 
 @runtime_checkable
@@ -9,6 +49,11 @@ class TTSEngine(Protocol):
 
     不做预处理、不 chunk、不管 ref_audio 状态。
     Pipeline 层负责全部编排。
+
+    属性 capabilities（EngineCapabilities）声明原生编码、流式、声音克隆等能力，
+    pipeline 只按声明选择路径（流式 / 会话 / 整段、是否等待 ref_audio、是否转码）。
+    实例由 app 级组件工厂构建并跨请求共享；持有连接池的 engine 可实现 async aclose()，
+    app 关闭时调用。
     """
 
     async def generate_chunk(
@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import shutil
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# 批次状态
+QUEUED = "queued"
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+ACTIVE = (QUEUED, IN_PROGRESS)
+
+
+class BatchInputError(ValueError):
+    """JSONL 输入不合法（带行号）。"""
+
+
+@dataclass
+class BatchItem:
+    index: int
+    custom_id: str | None
+    body: dict[str, Any]
+
+
+@dataclass
+class SpeechBatch:
+    """一个批次的进度。条目本身存于 input.jsonl，结果逐条追加到 results.jsonl。"""
+
+    id: str
+    created_at: float
+    total: int
+    status: str = QUEUED
+    completed: int = 0
+    failed: int = 0
+    started_at: float | None = None
+    finished_at: float | None = None
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "object": "speech.batch",
+            "status": self.status,
+            "created_at": int(self.created_at),
+            "in_progress_at": int(self.started_at) if self.started_at else None,
+            "completed_at": int(self.finished_at) if self.finished_at else None,
+            "request_counts": {
+                "total": self.total,
+                "completed": self.completed,
+                "failed": self.failed,
+            },
+            "metadata": self.metadata,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "SpeechBatch":
+        counts = data.get("request_counts", {})
+        return cls(
+            id=data["id"],
+            created_at=data["created_at"],
+            total=counts.get("total", 0),
+            status=data.get("status", QUEUED),
+            started_at=data.get("in_progress_at"),
+            finished_at=data.get("completed_at"),
+            metadata=data.get("metadata") or {},
+        )
+
+
+def parse_jsonl(data: bytes, max_items: int) -> list[BatchItem]:
+    """解析批量请求 JSONL。
+
+    每行可以是 OpenAI Batch 格式 {"custom_id", "method", "url", "body"}，
+    也可以直接是 /v1/audio/speech 请求体（可带 custom_id）。空行跳过。
+
+    Raises:
+        BatchInputError: JSON 不合法、缺少 input 或条目数超限
+    """
+    items: list[BatchItem] = []
+    for lineno, raw in enumerate(data.decode("utf-8-sig").splitlines(), 1):
+        if not raw.strip():
+            continue
+        try:
+            line = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise BatchInputError(f"line {lineno}: invalid JSON ({e.msg})")
+        if not isinstance(line, dict):
+            raise BatchInputError(f"line {lineno}: expected a JSON object")
+        body = line.get("body", line)
+        if not isinstance(body, dict) or not body.get("input"):
+            raise BatchInputError(f"line {lineno}: input is required")
+        custom_id = line.get("custom_id")
+        items.append(BatchItem(len(items), str(custom_id) if custom_id is not None else None, body))
+        if len(items) > max_items:
+            raise BatchInputError(f"too many requests (max {max_items})")
+    if not items:
+        raise BatchInputError("no requests in input")
+    return items
+
+
+class SpeechBatchManager:
+    """批量合成：按 engine 分队列，由固定数量的常驻 worker 消费。
+
+    - 每个 engine 一个队列，worker 数 = 该 engine 的并发上限，互不阻塞
+    - 全局 worker 上限限制所有 engine 同时在途的条目数
+    - 每条结果完成即写入 outputs/ 并追加到 results.jsonl；重启后未完成的条目自动续跑
+    吞吐只取决于配置的并发，与客户端并发无关。
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        render: Callable[[dict[str, Any]], Awaitable[tuple[bytes, str]]],
+        engine_of: Callable[[dict[str, Any]], str],
+        max_workers: int = 8,
+        engine_concurrency: dict[str, int] | None = None,
+        default_concurrency: int = 1,
+    ) -> None:
+        self.root = Path(root_dir)
+        self.render = render
+        self.engine_of = engine_of
+        self.engine_concurrency = engine_concurrency or {}
+        self.default_concurrency = default_concurrency
+        self._global = asyncio.Semaphore(max(1, max_workers))
+        self._batches: dict[str, SpeechBatch] = {}
+        self._queues: dict[str, asyncio.Queue] = {}
+        self._workers: list[asyncio.Task] = []
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._loaded = False
+
+    # ------------------------------------------------------------------ #
+    # 对外接口
+    # ------------------------------------------------------------------ #
+    async def submit(
+        self,
+        items: list[BatchItem],
+        metadata: dict[str, Any] | None = None,
+    ) -> SpeechBatch:
+        await self.resume()
+        batch = SpeechBatch(
+            id=f"batch_{uuid.uuid4().hex}",
+            created_at=time.time(),
+            total=len(items),
+            metadata=metadata or {},
+        )
+        await asyncio.to_thread(self._write_input, batch, items)
+        self._batches[batch.id] = batch
+        self._enqueue(batch, items)
+        logger.info(f"SpeechBatchManager: batch {batch.id} queued, {batch.total} requests")
+        return batch
+
+    async def get(self, batch_id: str) -> SpeechBatch | None:
+        await self.resume()
+        return self._batches.get(batch_id)
+
+    async def list_batches(self) -> list[SpeechBatch]:
+        await self.resume()
+        return sorted(self._batches.values(), key=lambda b: b.created_at, reverse=True)
+
+    async def cancel(self, batch_id: str) -> SpeechBatch | None:
+        batch = await self.get(batch_id)
+        if batch is not None and batch.status in ACTIVE:
+            # 已在合成中的条目照常完成，排队中的条目被 worker 跳过
+            batch.status = CANCELLED
+            batch.finished_at = time.time()
+            await asyncio.to_thread(self._write_meta, batch)
+        return batch
+
+    async def delete(self, batch_id: str) -> bool:
+        batch = await self.get(batch_id)
+        if batch is None:
+            return False
+        if batch.status in ACTIVE:
+            await self.cancel(batch_id)
+        del self._batches[batch_id]
+        await asyncio.to_thread(shutil.rmtree, self._dir(batch_id), True)
+        return True
+
+    def results_path(self, batch_id: str) -> Path:
+        return self._dir(batch_id) / "results.jsonl"
+
+    async def output_path(self, batch_id: str, index: int) -> Path | None:
+        """条目音频文件路径；未完成或失败时返回 None。"""
+        for result in await asyncio.to_thread(self._read_results, batch_id):
+            if result["index"] == index and result.get("file"):
+                return self._dir(batch_id) / result["file"]
+        return None
+
+    async def resume(self) -> None:
+        """加载磁盘上的批次，未完成的继续执行（首次调用时进行，幂等）。"""
+        if self._loaded:
+            return
+        self._loaded = True
+        for batch, items, done in await asyncio.to_thread(self._scan):
+            self._batches[batch.id] = batch
+            if batch.status in ACTIVE:
+                pending = [item for item in items if item.index not in done]
+                if pending:
+                    logger.info(f"SpeechBatchManager: resuming {batch.id}, {len(pending)} pending")
+                    self._enqueue(batch, pending)
+                else:
+                    await self._finish(batch)
+
+    async def aclose(self) -> None:
+        """停止 worker；正在合成的条目未写结果，下次启动时续跑。"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        self._queues.clear()
+        self._batches.clear()
+        self._loaded = False
+
+    # ------------------------------------------------------------------ #
+    # 调度
+    # ------------------------------------------------------------------ #
+    def _enqueue(self, batch: SpeechBatch, items: list[BatchItem]) -> None:
+        for item in items:
+            engine = self.engine_of(item.body)
+            self._queue(engine).put_nowait((batch, item))
+
+    def _queue(self, engine: str) -> asyncio.Queue:
+        queue = self._queues.get(engine)
+        if queue is None:
+            queue = self._queues[engine] = asyncio.Queue()
+            n = max(1, self.engine_concurrency.get(engine, self.default_concurrency))
+            self._workers.extend(
+                asyncio.create_task(self._worker(queue)) for _ in range(n)
+            )
+        return queue
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            batch, item = await queue.get()
+            try:
+                if batch.status not in ACTIVE:
+                    continue
+                async with self._global:
+                    if batch.status not in ACTIVE:
+                        continue
+                    await self._run_item(batch, item)
+            except Exception as e:
+                logger.error(f"SpeechBatchManager: {batch.id}#{item.index} bookkeeping failed: {e}")
+            finally:
+                queue.task_done()
+
+    async def _run_item(self, batch: SpeechBatch, item: BatchItem) -> None:
+        if batch.status == QUEUED:
+            batch.status = IN_PROGRESS
+            batch.started_at = time.time()
+            await asyncio.to_thread(self._write_meta, batch)
+
+        t0 = time.perf_counter()
+        result: dict[str, Any] = {"index": item.index, "custom_id": item.custom_id}
+        try:
+            audio, ext = await self.render(item.body)
+            name = f"outputs/{item.index:06d}.{ext}"
+            await asyncio.to_thread(self._write_output, batch.id, name, audio)
+            result.update(status="completed", file=name, bytes=len(audio))
+            batch.completed += 1
+        except Exception as e:
+            logger.warning(f"SpeechBatchManager: {batch.id}#{item.index} failed: {e}")
+            result.update(status="failed", error=str(e))
+            batch.failed += 1
+        result["duration"] = round(time.perf_counter() - t0, 3)
+
+        async with self._lock(batch.id):
+            await asyncio.to_thread(self._append_result, batch.id, result)
+        if batch.completed + batch.failed >= batch.total:
+            await self._finish(batch)
+
+    async def _finish(self, batch: SpeechBatch) -> None:
+        if batch.status in ACTIVE:
+            batch.status = COMPLETED
+            batch.finished_at = time.time()
+            await asyncio.to_thread(self._write_meta, batch)
+            logger.info(
+                f"SpeechBatchManager: batch {batch.id} completed, "
+                f"{batch.completed} ok / {batch.failed} failed"
+            )
+
+    def _lock(self, batch_id: str) -> asyncio.Lock:
+        lock = self._locks.get(batch_id)
+        if lock is None:
+            lock = self._locks[batch_id] = asyncio.Lock()
+        return lock
+
+    # ------------------------------------------------------------------ #
+    # 存储（在线程中执行）
+    # ------------------------------------------------------------------ #
+    def _dir(self, batch_id: str) -> Path:
+        return self.root / batch_id
+
+    def _write_input(self, batch: SpeechBatch, items: list[BatchItem]) -> None:
+        path = self._dir(batch.id)
+        (path / "outputs").mkdir(parents=True, exist_ok=True)
+        with open(path / "input.jsonl", "w", encoding="utf-8") as f:
+            for item in items:
+                f.write(json.dumps({"custom_id": item.custom_id, "body": item.body}, ensure_ascii=False) + "\n")
+        self._write_meta(batch)
+
+    def _write_meta(self, batch: SpeechBatch) -> None:
+        path = self._dir(batch.id) / "batch.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(batch.to_dict(), ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+
+    def _write_output(self, batch_id: str, name: str, audio: bytes) -> None:
+        path = self._dir(batch_id) / name
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(audio)
+        tmp.replace(path)
+
+    def _append_result(self, batch_id: str, result: dict[str, Any]) -> None:
+        with open(self.results_path(batch_id), "a", encoding="utf-8") as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    def _read_results(self, batch_id: str) -> list[dict[str, Any]]:
+        path = self.results_path(batch_id)
+        if not path.exists():
+            return []
+        results = []
+        for line in path.read_text(encoding="utf-8").splitlines():
+            try:
+                results.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # 崩溃时写了一半的行
+        return results
+
+    def _scan(self) -> list[tuple[SpeechBatch, list[BatchItem], set[int]]]:
+        found = []
+        if not self.root.exists():
+            return found
+        for meta in self.root.glob("*/batch.json"):
+            try:
+                batch = SpeechBatch.from_dict(json.loads(meta.read_text(encoding="utf-8")))
+                items = []
+                with open(meta.parent / "input.jsonl", encoding="utf-8") as f:
+                    for index, line in enumerate(f):
+                        entry = json.loads(line)
+                        items.append(BatchItem(index, entry.get("custom_id"), entry["body"]))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"SpeechBatchManager: skipping {meta.parent.name}: {e}")
+                continue
+            done: set[int] = set()
+            for result in self._read_results(batch.id):
+                done.add(result["index"])
+                if result.get("status") == "completed":
+                    batch.completed += 1
+                else:
+                    batch.failed += 1
+            found.append((batch, items, done))
+        return found
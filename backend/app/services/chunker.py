@@ -90,3 +90,132 @@ class TextChunker:
     def _chunk_fixed(text: str, max_chars: int) -> list[str]:
         """固定字符数切分。"""
         return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+class StreamingSegmenter:
+    """增量分段器：逐步喂入文本片段（如 LLM token），返回已经完整的段落/句子。
+
+    - 段落（空行分隔）一旦结束立即输出
+    - sentence_mode=True 时每个完整句子都立即输出
+    - first_sentence=True 时首段按句子输出，降低首字延迟
+    - 缓冲超过 max_chars 时在最后一个句子边界处切出，避免长段落卡住
+    - 不在未闭合的 Markdown 代码块内切分，保证预处理能整体移除代码块；
+      代码块本身超过 max_chars 时按行切出，切口两侧补全 ``` 使每段仍是完整代码块
+
+    缓冲只扫描一次：记录扫描位置、围栏奇偶与最后一个句子边界，
+    每次 feed 只处理新增部分（加上末尾可能被后续输入延长的几个字符）。
+    """
+
+    PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+    # 句末标点（含后随的右引号/括号）；英文句点需后随空白，避免误切小数/缩写
+    SENTENCE_END = re.compile(r"(?:[。！？!?；;…]+|\.(?=\s)|\n)[”’」』）)\"']*")
+    FENCE = "```"
+    # 扫描用的合并模式；段落分隔在前，blank 是缓冲末尾还可能变成空行的换行
+    _TOKEN = re.compile(
+        rf"(?P<fence>{FENCE})|(?P<para>{PARAGRAPH_BREAK.pattern})|(?P<blank>\n\s*\Z)"
+        rf"|(?P<sentence>{SENTENCE_END.pattern})"
+    )
+    # 末尾可能是未完整 token 的字符数（"``" / "."）
+    _TAIL = len(FENCE) - 1
+
+    def __init__(
+        self,
+        max_chars: int = 500,
+        sentence_mode: bool = False,
+        first_sentence: bool = False,
+    ) -> None:
+        self.max_chars = max_chars
+        self.sentence_mode = sentence_mode
+        self.first_sentence = first_sentence
+        self._buf = ""
+        self._emitted = False
+        self._reset_scan()
+
+    def feed(self, text: str) -> list[str]:
+        """喂入一段文本，返回本次新完成的片段列表。"""
+        if not text:
+            return []
+        self._buf += text
+        out: list[str] = []
+
+        while True:
+            brk = self._scan()
+            if brk is None:
+                break
+            out.extend(self._cut(*brk))
+
+        if self._in_fence and len(self._buf) >= self.max_chars:
+            out.extend(self._cut_fence())
+        elif self.sentence_mode or len(self._buf) >= self.max_chars or (
+            self.first_sentence and not self._emitted and not out
+        ):
+            end = self._sentence_end
+            if end:
+                out.extend(self._cut(end, end))
+
+        return out
+
+    def flush(self) -> list[str]:
+        """输入结束：输出剩余缓冲。"""
+        return self._cut(len(self._buf), len(self._buf))
+
+    def _reset_scan(self) -> None:
+        self._pos = 0               # 已扫描到的位置
+        self._in_fence = False      # _pos 之前 ``` 是否为奇数个
+        self._fence_start = 0       # 未闭合代码块的起始位置
+        self._sentence_end = 0      # 代码块外最后一个句子边界
+
+    def _scan(self) -> tuple[int, int] | None:
+        """从上次位置继续扫描，返回代码块外的下一个段落分隔 (start, end)。
+
+        紧贴缓冲末尾的 token 可能被后续输入延长（"\\n" → "\\n\\n"、"``" → "```"、
+        "。" → "。”"），不推进扫描位置，下次从它开头重扫。
+        """
+        buf = self._buf
+        size = len(buf)
+        pos = self._pos
+        for m in self._TOKEN.finditer(buf, pos):
+            kind = m.lastgroup
+            if m.end() == size and kind != "para":
+                if not self._in_fence and kind != "fence":
+                    # 句子边界先按当前长度记下，保持首句输出的时延
+                    self._sentence_end = m.end() if kind == "sentence" else m.start() + 1
+                self._pos = m.start()
+                return None
+            pos = m.end()
+            if kind == "fence":
+                self._in_fence = not self._in_fence
+                self._fence_start = m.start()
+            elif self._in_fence:
+                continue
+            elif kind == "para":
+                self._pos = pos
+                return m.start(), m.end()
+            else:
+                self._sentence_end = pos
+        self._pos = max(pos, size - self._TAIL)
+        return None
+
+    def _cut_fence(self) -> list[str]:
+        """代码块超过 max_chars：在最后一个换行处切出，补上闭合与重新打开的 ```。"""
+        body = self._fence_start + len(self.FENCE)
+        # 末尾未扫描的部分可能是半个 ```，不切
+        end = self._pos
+        if end <= body:
+            return []
+        nl = self._buf.rfind("\n", body, end)
+        cut, rest = (nl, nl + 1) if nl > body else (end, end)
+        segment = self._buf[:cut].rstrip() + "\n" + self.FENCE
+        self._buf = self.FENCE + "\n" + self._buf[rest:]
+        self._reset_scan()
+        self._emitted = True
+        return [segment]
+
+    def _cut(self, start: int, end: int) -> list[str]:
+        segment = self._buf[:start].strip()
+        self._buf = self._buf[end:]
+        self._reset_scan()
+        if not segment:
+            return []
+        self._emitted = True
+        return [segment]
@@ -1,22 +1,44 @@
 from __future__ import annotations
 
 import logging
+from contextlib import nullcontext
 from typing import Any, AsyncGenerator
 
 import edge_tts
 
+from app.services.admission import AdmissionController
+from app.services.base import EngineCapabilities
+
 logger = logging.getLogger(__name__)
 
 
 class EdgeTTSEngine:
     """Microsoft Edge TTS engine。
 
-    通过 generate_chunk 实现 TTSEngine Protocol。
+    通过 generate_chunk / generate_chunk_stream 实现 TTSEngine Protocol。
+    Edge 服务端边合成边推送 MP3 帧，流式接口逐帧转发，首字延迟不随 chunk 长度增长。
     ref_audio 参数被忽略（Edge 不支持声音克隆）。
+    传入 admission 时每个合成请求先排队获取配额（Edge 服务端对并发连接与请求频率有限制）。
     """
 
-    def __init__(self) -> None:
-        pass
+    # 输出 audio-24khz-48kbitrate-mono-mp3
+    capabilities = EngineCapabilities(
+        native_format="mp3",
+        output_formats=("mp3",),
+        streaming=True,
+        recommended_concurrency=4,
+    )
+
+    def __init__(self, admission: AdmissionController | None = None) -> None:
+        self.admission = admission
+
+    def _admit(self):
+        """占用一个上游配额名额（未配置准入时不限制）。"""
+        return self.admission.slot() if self.admission is not None else nullcontext()
+
+    @staticmethod
+    def _rate(speed: float) -> str:
+        return f"+{int((speed - 1.0) * 100)}%" if speed >= 1.0 else f"{int((speed - 1.0) * 100)}%"
 
     async def generate_chunk(
         self,
@@ -25,19 +47,24 @@ class EdgeTTSEngine:
         speed: float = 1.0,
         ref_audio: bytes | None = None,
     ) -> bytes:
-        rate_str = f"+{int((speed - 1.0) * 100)}%" if speed >= 1.0 else f"{int((speed - 1.0) * 100)}%"
-        pitch_str = "+0Hz"
-
-        communicate = edge_tts.Communicate(text, voice, rate=rate_str, pitch=pitch_str)
-
-        chunks: list[bytes] = []
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                chunks.append(chunk["data"])
-
+        chunks = [data async for data in self.generate_chunk_stream(text, voice, speed)]
         logger.debug(f"EdgeTTSEngine: {len(text)} chars → {sum(len(c) for c in chunks)} bytes")
         return b"".join(chunks)
 
+    async def generate_chunk_stream(
+        self,
+        text: str,
+        voice: str = "zh-CN-XiaoxiaoNeural",
+        speed: float = 1.0,
+        ref_audio: bytes | None = None,
+    ) -> AsyncGenerator[bytes, None]:
+        """流式合成：websocket 每收到一个音频消息（若干 MP3 帧）就 yield。"""
+        communicate = edge_tts.Communicate(text, voice, rate=self._rate(speed), pitch="+0Hz")
+        async with self._admit():
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    yield chunk["data"]
+
     async def generate_stream(
         self,
         text: str,
@@ -48,13 +75,14 @@ class EdgeTTSEngine:
         """流式生成（兼容旧 API）。"""
         rate = kwargs.get("rate")
         if rate is None:
-            rate = f"+{int((speed - 1.0) * 100)}%" if speed >= 1.0 else f"{int((speed - 1.0) * 100)}%"
+            rate = self._rate(speed)
         pitch = kwargs.get("pitch", "+0Hz")
 
         communicate = edge_tts.Communicate(text, voice, rate=rate, pitch=pitch)
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                yield chunk["data"]
+        async with self._admit():
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    yield chunk["data"]
 
     @staticmethod
     async def get_voices() -> list[dict[str, Any]]:
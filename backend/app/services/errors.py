@@ -0,0 +1,63 @@
+"""engine 错误分类：上游故障（可换 engine 重试、计入熔断）与请求本身的问题。"""
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import websockets
+
+from app.services.admission import AdmissionTimeout
+from app.services.volcengine_protocol import VolcengineProtocolError
+
+try:
+    import aiohttp  # edge-tts 的依赖
+except ImportError:
+    aiohttp = None
+
+try:
+    from edge_tts.exceptions import EdgeTTSException
+except ImportError:
+    EdgeTTSException = None
+
+
+class UpstreamError(RuntimeError):
+    """上游 TTS 服务返回的错误。
+
+    status 为 HTTP 状态码，或把服务端错误码按 4xx（请求问题）/ 5xx（服务端故障）归类后的值；
+    未知时为 None（按上游故障处理）。
+    """
+
+    def __init__(self, message: str, status: int | None = None) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+# 连接 / 传输 / 超时类错误：请求没能在上游正常完成
+_TRANSPORT_ERRORS: tuple[type[BaseException], ...] = (
+    TimeoutError,
+    asyncio.TimeoutError,
+    OSError,
+    httpx.TransportError,
+    websockets.WebSocketException,
+    AdmissionTimeout,
+    VolcengineProtocolError,  # 上游返回了无法解析的帧
+) + ((aiohttp.ClientError,) if aiohttp is not None else ()) + (
+    (EdgeTTSException,) if EdgeTTSException is not None else ()
+)
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """exc 是否为 engine / 上游故障：超时、连接与传输错误、5xx。
+
+    未知 engine / voice、参数错误、4xx（鉴权失败、engine 未配置等）属于请求本身的问题，
+    换 engine 也无济于事，返回 False：不计入熔断，也不切换到 fallback。
+    """
+    if isinstance(exc, UpstreamError):
+        return exc.status is None or exc.status >= 500
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    if isinstance(exc, websockets.InvalidStatus):
+        return exc.response.status_code >= 500
+    if aiohttp is not None and isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status >= 500
+    return isinstance(exc, _TRANSPORT_ERRORS)
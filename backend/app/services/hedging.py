@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class HedgePolicy:
+    """单个 engine 的对冲策略：首包迟迟不到时再发一个相同请求，先出首包者胜。
+
+    - 对冲延迟取最近 window 次首包延迟的 percentile 分位（样本不足时用 initial_delay），
+      限制在 [min_delay, max_delay]
+    - 预算：每个请求存入 budget 个令牌（≤ 1，最多攒 burst 个），每次对冲消耗 1 个，
+      对冲请求数因此不超过原请求的 budget 倍，上游负载最多翻倍
+    """
+
+    def __init__(
+        self,
+        budget: float = 0.1,
+        percentile: float = 0.95,
+        initial_delay: float = 1.0,
+        min_delay: float = 0.05,
+        max_delay: float = 5.0,
+        window: int = 200,
+        min_samples: int = 20,
+        burst: float = 10.0,
+    ) -> None:
+        self.budget = min(max(budget, 0.0), 1.0)
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.burst = burst
+        self._ttfb: deque[float] = deque(maxlen=window)
+        self._tokens = burst
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.denied = 0
+
+    def delay(self) -> float:
+        """当前对冲延迟（秒）。"""
+        if len(self._ttfb) < self.min_samples:
+            value = self.initial_delay
+        else:
+            ordered = sorted(self._ttfb)
+            value = ordered[min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)]
+        return min(max(value, self.min_delay), self.max_delay)
+
+    def admit(self) -> None:
+        """记一个原请求，存入预算。"""
+        self.requests += 1
+        self._tokens = min(self.burst, self._tokens + self.budget)
+
+    def try_hedge(self) -> bool:
+        """预算允许时占用一次对冲。"""
+        if self._tokens < 1.0:
+            self.denied += 1
+            return False
+        self._tokens -= 1.0
+        self.hedges += 1
+        return True
+
+    def record(self, ttfb: float) -> None:
+        self._ttfb.append(ttfb)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "denied": self.denied,
+            "hedge_rate": self.hedges / self.requests if self.requests else 0.0,
+            "win_rate": self.hedge_wins / self.hedges if self.hedges else 0.0,
+            "delay": self.delay(),
+        }
+
+
+async def hedged_stream(
+    start: Callable[[], AsyncIterator[bytes]],
+    policy: HedgePolicy,
+) -> AsyncGenerator[bytes, None]:
+    """对冲执行 start() 返回的数据流：超过 policy.delay() 仍无首包时再调用一次 start()。
+
+    先产出首个数据（或正常结束）的请求胜出，另一个立即取消；一个失败时等另一个，
+    都失败时抛出原请求的错误。首包之后不再对冲。
+    """
+    policy.admit()
+    t0 = time.perf_counter()
+    streams: list[AsyncIterator[bytes] | None] = [start()]
+    tasks = [asyncio.ensure_future(streams[0].__anext__())]
+    errors: list[BaseException | None] = [None]
+    winner = -1
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=policy.delay())
+        if not done and policy.try_hedge():
+            logger.debug(f"hedged_stream: no first byte after {policy.delay():.3f}s, hedging")
+            streams.append(start())
+            tasks.append(asyncio.ensure_future(streams[1].__anext__()))
+            errors.append(None)
+        pending = set(tasks)
+        while pending and winner < 0:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                i = tasks.index(task)
+                error = task.exception()
+                if error is None or isinstance(error, StopAsyncIteration):
+                    winner = i
+                    break
+                errors[i] = error
+        if winner < 0:
+            raise next(e for e in errors if e is not None)
+        # 原请求胜出时记录真实首包延迟；对冲胜出时原请求首包至少为此刻（下界）
+        policy.record(time.perf_counter() - t0)
+        if winner > 0:
+            policy.hedge_wins += 1
+        await _cancel_losers(tasks, streams, winner)
+        if tasks[winner].exception() is not None:
+            return
+        yield tasks[winner].result()
+        async for data in streams[winner]:
+            yield data
+    finally:
+        await _cancel_losers(tasks, streams, winner)
+        if winner >= 0:
+            await _aclose(streams[winner])
+
+
+async def hedged_call(
+    start: Callable[[], Awaitable[bytes]],
+    policy: HedgePolicy,
+) -> bytes:
+    """非流式版本：start() 返回完整音频的 awaitable。"""
+    async def once() -> AsyncGenerator[bytes, None]:
+        yield await start()
+
+    async with aclosing(hedged_stream(once, policy)) as stream:
+        async for data in stream:
+            return data
+    return b""
+
+
+async def _cancel_losers(
+    tasks: list[asyncio.Future],
+    streams: list[AsyncIterator | None],
+    winner: int,
+) -> None:
+    for i, task in enumerate(tasks):
+        if i == winner or streams[i] is None:
+            continue
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await _aclose(streams[i])
+        streams[i] = None
+
+
+async def _aclose(stream) -> None:
+    aclose = getattr(stream, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception as e:
+            logger.debug(f"hedged_stream: closing stream failed: {e}")
@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Iterable, Iterator
+from urllib.parse import urlsplit
+
+import httpcore
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class _DNSCache:
+    """主机名解析缓存：TTL 内复用 getaddrinfo 结果，多个地址轮询使用。"""
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[tuple[str, int], tuple[list[str], float]] = {}
+        self._next: dict[tuple[str, int], int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def resolve(self, host: str, port: int) -> list[str]:
+        """host 的全部地址，从本次轮询到的地址开始排列（其余地址作为建连失败时的备选）。"""
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+        key = (host, port)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            self.hits += 1
+            addrs = entry[0]
+        else:
+            self.misses += 1
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            addrs = list(dict.fromkeys(info[4][0] for info in infos))
+            self._entries[key] = (addrs, time.monotonic() + self.ttl_seconds)
+        i = self._next.get(key, 0)
+        self._next[key] = i + 1
+        i %= len(addrs)
+        return addrs[i:] + addrs[:i]
+
+    def forget(self, host: str, port: int) -> None:
+        self._entries.pop((host, port), None)
+
+
+class _CachingBackend(httpcore.AsyncNetworkBackend):
+    """httpcore 网络后端：建连前查 DNS 缓存，按 IP 连接（TLS SNI 仍用原主机名）。
+
+    依次尝试主机的每个地址（如 AAAA 记录存在但本机没有 IPv6 路由），全部失败才报错。
+    """
+
+    def __init__(self, dns: _DNSCache | None) -> None:
+        self._inner = httpcore.AnyIOBackend()
+        self._dns = dns
+        self.connects = 0
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: float | None = None,
+        local_address: str | None = None,
+        socket_options: Iterable[Any] | None = None,
+    ) -> httpcore.AsyncNetworkStream:
+        self.connects += 1
+        if self._dns is None:
+            return await self._inner.connect_tcp(host, port, timeout, local_address, socket_options)
+        addrs = await self._dns.resolve(host, port)
+        for i, addr in enumerate(addrs):
+            try:
+                return await self._inner.connect_tcp(addr, port, timeout, local_address, socket_options)
+            except Exception as e:
+                if i + 1 < len(addrs):
+                    logger.debug(f"HTTPClientPool: connect {host} via {addr} failed ({e}), trying next address")
+                    continue
+                # 所有地址都失败：缓存可能已失效，下次建连重新解析
+                self._dns.forget(host, port)
+                raise
+        raise httpcore.ConnectError(f"no address for {host}")
+
+    async def connect_unix_socket(self, path: str, timeout: float | None = None,
+                                  socket_options: Iterable[Any] | None = None):
+        return await self._inner.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._inner.sleep(seconds)
+
+
+# httpcore → httpx 异常（与 httpx 自带 transport 的映射一致，子类在前）
+_HTTPCORE_ERRORS: tuple[tuple[type[Exception], type[Exception]], ...] = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.ProxyError, httpx.ProxyError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+@contextmanager
+def _httpx_errors() -> Iterator[None]:
+    try:
+        yield
+    except Exception as e:
+        for core_type, httpx_type in _HTTPCORE_ERRORS:
+            if isinstance(e, core_type):
+                raise httpx_type(str(e)) from e
+        raise
+
+
+class _PoolResponseStream(httpx.AsyncByteStream):
+    def __init__(self, stream: Any) -> None:
+        self._stream = stream
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        with _httpx_errors():
+            async for part in self._stream:
+                yield part
+
+    async def aclose(self) -> None:
+        aclose = getattr(self._stream, "aclose", None)
+        if aclose is not None:
+            with _httpx_errors():
+                await aclose()
+
+
+class _PoolTransport(httpx.AsyncBaseTransport):
+    """直接基于 httpcore 连接池的 httpx transport（httpx 的 AsyncHTTPTransport 不能指定 network_backend）。"""
+
+    def __init__(self, pool: httpcore.AsyncConnectionPool) -> None:
+        self.pool = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _httpx_errors():
+            response = await self.pool.handle_async_request(core_request)
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_PoolResponseStream(response.stream),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self.pool.aclose()
+
+
+def _env_proxy(origin: str) -> str | None:
+    """与 httpx 的 trust_env 一致：按 HTTP(S)_PROXY / ALL_PROXY / NO_PROXY 环境变量为 upstream 选代理。"""
+    parts = urlsplit(origin)
+    proxies = urllib.request.getproxies_environment()
+    proxy = proxies.get(parts.scheme) or proxies.get("all")
+    if not proxy or urllib.request.proxy_bypass_environment(parts.hostname or "", proxies):
+        return None
+    return proxy
+
+
+class _Upstream:
+    """一个 upstream（scheme://host:port）的共享客户端与连接池计数。"""
+
+    def __init__(self, client: httpx.AsyncClient, pool: httpcore.AsyncConnectionPool,
+                 backend: _CachingBackend) -> None:
+        self.client = client
+        self.pool = pool
+        self.backend = backend
+        self.requests = 0
+
+
+class HTTPClientPool:
+    """按 upstream 共享的 httpx 客户端：连接池、keep-alive、可选 HTTP/2、DNS 缓存。
+
+    同一 upstream 的所有请求走同一个连接池，句子级短 chunk 不再为每次请求付出
+    DNS + TCP + TLS 握手。超时由调用方按请求传入（不同 engine 差异很大）。
+    HTTP/2 需要安装 h2（pip install httpx[http2]），未安装时回退 HTTP/1.1。
+    与 httpx 默认行为一样遵循 HTTP(S)_PROXY / ALL_PROXY / NO_PROXY 环境变量（仅 http/https 代理）。
+    关闭后再次取用会重新创建。
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 64,
+        max_keepalive_connections: int = 16,
+        keepalive_expiry: float = 60.0,
+        http2: bool = False,
+        dns_cache_ttl: float = 300.0,
+    ) -> None:
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTPClientPool: HTTP/2 requested but 'h2' is not installed, using HTTP/1.1")
+                http2 = False
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self._dns = _DNSCache(dns_cache_ttl) if dns_cache_ttl > 0 else None
+        self._upstreams: dict[str, _Upstream] = {}
+
+    @staticmethod
+    def origin(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def client(self, url: str) -> httpx.AsyncClient:
+        """url 所属 upstream 的共享客户端。"""
+        origin = self.origin(url)
+        upstream = self._upstreams.get(origin)
+        if upstream is None or upstream.client.is_closed:
+            upstream = self._upstreams[origin] = self._create(origin)
+            logger.info(f"HTTPClientPool: client for {origin} created (http2={self.http2})")
+        return upstream.client
+
+    def _create(self, origin: str) -> _Upstream:
+        backend = _CachingBackend(self._dns)
+        options: dict[str, Any] = {
+            "ssl_context": httpx.create_ssl_context(),
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "keepalive_expiry": self.keepalive_expiry,
+            "http1": True,
+            "http2": self.http2,
+            "network_backend": backend,
+        }
+        proxy = _env_proxy(origin)
+        if proxy is not None and urlsplit(proxy).scheme in ("http", "https"):
+            url = httpx.URL(proxy)
+            auth = (url.username, url.password) if url.username else None
+            pool: httpcore.AsyncConnectionPool = httpcore.AsyncHTTPProxy(
+                proxy_url=str(url.copy_with(username=None, password=None)), proxy_auth=auth, **options,
+            )
+            logger.info(f"HTTPClientPool: {origin} via proxy {url.host}")
+        else:
+            if proxy is not None:
+                logger.warning(f"HTTPClientPool: unsupported proxy scheme for {origin}, connecting directly")
+            pool = httpcore.AsyncConnectionPool(**options)
+
+        async def count_request(request: httpx.Request) -> None:
+            upstream.requests += 1
+
+        client = httpx.AsyncClient(transport=_PoolTransport(pool), event_hooks={"request": [count_request]})
+        upstream = _Upstream(client, pool, backend)  # count_request 在首个请求时才用到
+        return upstream
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """每个 upstream 的请求数、新建连接数与当前连接占用。"""
+        result: dict[str, dict[str, Any]] = {}
+        for origin, upstream in self._upstreams.items():
+            connections = upstream.pool.connections
+            idle = sum(1 for c in connections if c.is_idle())
+            result[origin] = {
+                "requests": upstream.requests,
+                "connects": upstream.backend.connects,
+                "connections": len(connections),
+                "active": len(connections) - idle,
+                "idle": idle,
+                "max_connections": self.max_connections,
+            }
+        return result
+
+    def dns_stats(self) -> dict[str, int]:
+        if self._dns is None:
+            return {}
+        return {"hits": self._dns.hits, "misses": self._dns.misses}
+
+    async def aclose(self) -> None:
+        upstreams, self._upstreams = self._upstreams, {}
+        for upstream in upstreams.values():
+            try:
+                await upstream.client.aclose()
+            except Exception as e:
+                logger.warning(f"HTTPClientPool: closing client failed: {e}")
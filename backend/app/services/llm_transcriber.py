@@ -1,10 +1,15 @@
 from __future__ import annotations
 
+import json
 import logging
-from typing import Any
+from collections import OrderedDict
+from typing import Any, AsyncGenerator
 
 import httpx
 
+from app.services.chunker import StreamingSegmenter
+from app.services.http_clients import HTTPClientPool
+
 logger = logging.getLogger(__name__)
 
 DEFAULT_PROMPT = """你是一个专业的中文播报稿编辑。将输入文本转化为适合语音合成的口语化播报稿。
@@ -23,12 +28,18 @@ DEFAULT_PROMPT = """你是一个专业的中文播报稿编辑。将输入文本
 多音字标注格式：在需要纠正读音的字后面用括号标注拼音，例如：银行(háng)
 如果该字在上下文中读音明确（模型能正确判断），就不需要标注。"""
 
+_SSE_DONE = object()
+# transcribe() 记住的最近转写结果条数
+RECENT_TRANSCRIPTS = 32
+
 
 class LLMTranscriber:
     """LLM 转写器：将原始 Markdown 转为口语化播报稿。
 
     使用 OpenAI-compatible API（支持 OpenAI / DeepSeek / 本地模型）。
     这是 pipeline 的可选前置步骤，独立于 TextPreprocessor（正则清理）。
+    实例跨请求共享，请求走共享的 HTTPClientPool；未传入 http 时使用自有的池，aclose() 时关闭。
+    transcribe() 记住最近的转写结果：路由首包前切换 engine 重新打开 pipeline 时不再重复调用 LLM。
     """
 
     def __init__(
@@ -39,6 +50,7 @@ class LLMTranscriber:
         prompt: str = DEFAULT_PROMPT,
         timeout: float = 60.0,
         max_tokens: int = 8192,
+        http: HTTPClientPool | None = None,
     ) -> None:
         self.api_url = api_url.rstrip("/")
         self.api_key = api_key
@@ -46,11 +58,21 @@ class LLMTranscriber:
         self.prompt = prompt
         self.timeout = timeout
         self.max_tokens = max_tokens
+        self._owns_http = http is None
+        self.http = http or HTTPClientPool()
+        self._recent: OrderedDict[str, str] = OrderedDict()
 
     def is_configured(self) -> bool:
         """是否已配置可用。"""
         return bool(self.api_url and self.api_key)
 
+    def _http(self) -> httpx.AsyncClient:
+        return self.http.client(self.api_url)
+
+    async def aclose(self) -> None:
+        if self._owns_http:
+            await self.http.aclose()
+
     async def transcribe(self, text: str) -> str:
         """调用 LLM 将文本转为口语化播报稿。
 
@@ -64,7 +86,99 @@ class LLMTranscriber:
             logger.warning("LLMTranscriber not configured, returning original text")
             return text
 
-        payload = {
+        recent = self._recent.get(text)
+        if recent is not None:
+            self._recent.move_to_end(text)
+            return recent
+
+        logger.info(f"LLM transcribe: {len(text)} chars → model={self.model}")
+
+        try:
+            resp = await self._http().post(
+                f"{self.api_url}/chat/completions",
+                json=self._payload(text, stream=False),
+                headers=self._headers(),
+                timeout=self.timeout,
+            )
+            resp.raise_for_status()
+            data = resp.json()
+            result = data["choices"][0]["message"]["content"]
+            logger.info(f"LLM transcribe done: {len(result)} chars")
+            self._recent[text] = result
+            if len(self._recent) > RECENT_TRANSCRIPTS:
+                self._recent.popitem(last=False)
+            return result
+        except Exception as e:
+            logger.error(f"LLM transcribe failed: {e}, returning original text")
+            return text
+
+    async def transcribe_stream(
+        self,
+        text: str,
+        max_chars: int = 500,
+        first_sentence: bool = True,
+    ) -> AsyncGenerator[str, None]:
+        """流式转写：消费 SSE token 流，每完成一个段落/句子立即 yield。
+
+        让下游分段和合成与 LLM 生成重叠，首字延迟不再等于整篇生成时间。
+        失败时：尚未输出任何内容则回退原文；已输出部分则输出剩余缓冲后重新抛出异常
+        （已转写的部分无法对应回原文，剩余内容不能静默丢弃）。
+
+        Args:
+            text: 原始 Markdown 文本
+            max_chars: 缓冲超过该长度时在句子边界强制切出
+            first_sentence: 首段按句子输出
+
+        Yields:
+            转写后的口语化文本片段（段落或句子）
+        """
+        if not self.is_configured():
+            logger.warning("LLMTranscriber not configured, returning original text")
+            yield text
+            return
+
+        segmenter = StreamingSegmenter(max_chars=max_chars, first_sentence=first_sentence)
+        emitted = 0
+        total = 0
+
+        logger.info(f"LLM transcribe (stream): {len(text)} chars → model={self.model}")
+
+        try:
+            async with self._http().stream(
+                "POST",
+                f"{self.api_url}/chat/completions",
+                json=self._payload(text, stream=True),
+                headers=self._headers(),
+                timeout=self.timeout,
+            ) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    delta = self._parse_sse_delta(line)
+                    if delta is None:
+                        continue
+                    if delta is _SSE_DONE:
+                        break
+                    total += len(delta)
+                    for segment in segmenter.feed(delta):
+                        emitted += 1
+                        yield segment
+        except Exception as e:
+            if not emitted:
+                logger.error(f"LLM transcribe stream failed: {e}, returning original text")
+                yield text
+                return
+            logger.error(f"LLM transcribe stream failed after {emitted} segments: {e}")
+            for segment in segmenter.flush():
+                yield segment
+            raise
+
+        for segment in segmenter.flush():
+            emitted += 1
+            yield segment
+        logger.info(f"LLM transcribe stream done: {total} chars, {emitted} segments")
+
+    def _payload(self, text: str, stream: bool) -> dict[str, Any]:
+        return {
             "model": self.model,
             "messages": [
                 {"role": "system", "content": self.prompt},
@@ -72,28 +186,29 @@ class LLMTranscriber:
             ],
             "max_tokens": self.max_tokens,
             "temperature": 0.3,
-            "stream": False,
+            "stream": stream,
         }
 
-        headers = {
+    def _headers(self) -> dict[str, str]:
+        return {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}",
         }
 
-        logger.info(f"LLM transcribe: {len(text)} chars → model={self.model}")
-
+    @staticmethod
+    def _parse_sse_delta(line: str) -> Any:
+        """解析一行 SSE：返回增量文本、_SSE_DONE 或 None（无内容行）。"""
+        line = line.strip()
+        if not line.startswith("data:"):
+            return None
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return _SSE_DONE
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                resp = await client.post(
-                    f"{self.api_url}/chat/completions",
-                    json=payload,
-                    headers=headers,
-                )
-                resp.raise_for_status()
-                data = resp.json()
-                result = data["choices"][0]["message"]["content"]
-                logger.info(f"LLM transcribe done: {len(result)} chars")
-                return result
-        except Exception as e:
-            logger.error(f"LLM transcribe failed: {e}, returning original text")
-            return text
+            event = json.loads(data)
+        except json.JSONDecodeError:
+            return None
+        choices = event.get("choices") or []
+        if not choices:
+            return None
+        return (choices[0].get("delta") or {}).get("content") or None
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import random
+import struct
+from functools import lru_cache
+from typing import Any, AsyncGenerator
+
+from app.services.audio_output import mp3_silent_frame
+from app.services.base import EngineCapabilities
+from app.services.errors import UpstreamError
+from app.services.wav import wav_header
+
+logger = logging.getLogger(__name__)
+
+# MPEG-2 Layer III, 24kHz, 48kbps, 单声道, 无 CRC：每帧 144 字节 / 576 样本
+_MP3_HEADER = bytes((0xFF, 0xF3, 0x64, 0xC0))
+# 每次 yield 的音频时长（秒），模拟上游逐帧推送
+STREAM_PIECE_SECONDS = 0.1
+
+
+class MockInjectedError(UpstreamError):
+    """按 failure_rate 注入的合成失败（模拟上游故障，status 为 None）。"""
+
+
+@lru_cache(maxsize=8)
+def _tone_period(sample_rate: int, frequency: float = 440.0, amplitude: int = 2000) -> bytes:
+    """一个周期的 16bit 正弦波；合成时整段重复，避免逐样本计算。"""
+    n = max(1, round(sample_rate / frequency))
+    return struct.pack(f"<{n}h", *(int(amplitude * math.sin(2 * math.pi * i / n)) for i in range(n)))
+
+
+def _tone(sample_rate: int, n_samples: int) -> bytes:
+    period = _tone_period(sample_rate)
+    n_bytes = n_samples * 2
+    return (period * (n_bytes // len(period) + 1))[:n_bytes]
+
+
+class MockTTSEngine:
+    """离线、可复现的模拟 engine：不访问网络和 GPU，用于测量 pipeline / API 层自身的开销。
+
+    通过 generate_chunk / generate_chunk_stream 实现 TTSEngine Protocol。
+    - 时延：首包 ttfb 秒，整段合成耗时 ttfb + seconds_per_char × 字数，
+      每次调用乘以 [1 - jitter, 1 + jitter] 内的随机系数
+    - 输出：每字 audio_seconds_per_char 秒的音频，wav / pcm 为 16bit 单声道正弦波，
+      mp3 为静音 MP3 帧；按 audio_format 直接输出请求的编码
+    - 失败注入：每次调用以 failure_rate 概率在首包前抛出 MockInjectedError
+    随机数来自 seed 固定的实例级生成器，同样的调用序列得到同样的时延与失败。
+    """
+
+    FORMATS = ("wav", "pcm", "mp3")
+
+    def __init__(
+        self,
+        ttfb: float = 0.05,
+        seconds_per_char: float = 0.005,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+        native_format: str = "wav",
+        sample_rate: int = 24000,
+        audio_seconds_per_char: float = 0.2,
+    ) -> None:
+        if native_format not in self.FORMATS:
+            raise ValueError(f"Unknown mock format: {native_format}. Available: {list(self.FORMATS)}")
+        self.ttfb = ttfb
+        self.seconds_per_char = seconds_per_char
+        self.jitter = min(max(jitter, 0.0), 1.0)
+        self.failure_rate = failure_rate
+        self.native_format = native_format
+        self.sample_rate = sample_rate
+        self.audio_seconds_per_char = audio_seconds_per_char
+        self.capabilities = EngineCapabilities(
+            native_format=native_format,
+            output_formats=self.FORMATS,
+            sample_rate=sample_rate,
+            streaming=True,
+            recommended_concurrency=4,
+        )
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    def _plan(self, text: str, speed: float) -> tuple[float, float]:
+        """本次调用的 (首包延迟, 首包后的合成耗时)；按需注入失败。"""
+        self.calls += 1
+        scale = 1.0 + self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 1.0
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            self.failures += 1
+            raise MockInjectedError(f"mock: injected failure (call {self.calls})")
+        return self.ttfb * scale, self.seconds_per_char * len(text) * scale / max(speed, 0.1)
+
+    def _audio_seconds(self, text: str, speed: float) -> float:
+        return len(text) * self.audio_seconds_per_char / max(speed, 0.1)
+
+    def _pieces(self, seconds: float, audio_format: str) -> list[bytes]:
+        """按 STREAM_PIECE_SECONDS 切分的音频；wav 的第一块带流式头。"""
+        if audio_format == "mp3":
+            frame, sample_rate, samples = mp3_silent_frame(_MP3_HEADER)
+            n_frames = max(1, round(seconds * sample_rate / samples))
+            per_piece = max(1, round(STREAM_PIECE_SECONDS * sample_rate / samples))
+            return [frame * min(per_piece, n_frames - i) for i in range(0, n_frames, per_piece)]
+        n_samples = max(1, int(seconds * self.sample_rate))
+        per_piece = max(1, int(STREAM_PIECE_SECONDS * self.sample_rate))
+        pieces = [_tone(self.sample_rate, min(per_piece, n_samples - i)) for i in range(0, n_samples, per_piece)]
+        if audio_format == "wav":
+            pieces[0] = wav_header(self.sample_rate) + pieces[0]
+        return pieces
+
+    async def generate_chunk(
+        self,
+        text: str,
+        voice: str = "mock",
+        speed: float = 1.0,
+        ref_audio: bytes | None = None,
+        audio_format: str | None = None,
+    ) -> bytes:
+        audio_format = audio_format or self.native_format
+        ttfb, synth = self._plan(text, speed)
+        await asyncio.sleep(ttfb + synth)
+        pieces = self._pieces(self._audio_seconds(text, speed), audio_format)
+        if audio_format == "wav":
+            # 非流式输出带准确长度的 WAV 头
+            data = b"".join(pieces)[44:]
+            return wav_header(self.sample_rate, n_frames=len(data) // 2) + data
+        return b"".join(pieces)
+
+    async def generate_chunk_stream(
+        self,
+        text: str,
+        voice: str = "mock",
+        speed: float = 1.0,
+        ref_audio: bytes | None = None,
+        audio_format: str | None = None,
+    ) -> AsyncGenerator[bytes, None]:
+        """首包前等待 ttfb，其余音频块在合成耗时内均匀下发。"""
+        audio_format = audio_format or self.native_format
+        ttfb, synth = self._plan(text, speed)
+        pieces = self._pieces(self._audio_seconds(text, speed), audio_format)
+        await asyncio.sleep(ttfb)
+        interval = synth / len(pieces)
+        for i, piece in enumerate(pieces):
+            if i:
+                await asyncio.sleep(interval)
+            yield piece
+        if synth:
+            await asyncio.sleep(interval)
+
+    async def get_voices(self) -> list[dict[str, Any]]:
+        return [{"id": "mock", "name": "Mock（合成正弦波）", "language": "multilingual"}]
+
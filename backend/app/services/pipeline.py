@@ -1,27 +1,37 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import re
-import struct
-import wave
-import io
-from typing import AsyncGenerator
+import time
+from contextlib import aclosing
+from typing import AsyncGenerator, AsyncIterable, AsyncIterator, Awaitable
 
-from app.services.base import TTSEngine
+from app.services.audio_cache import ChunkAudioCache, RefAudioCache
+from app.services.audio_output import AudioOutputStage
+from app.services.base import TTSEngine, capabilities_of
+from app.services.hedging import HedgePolicy, hedged_call, hedged_stream
 from app.services.text_preprocessor import TextPreprocessor
 from app.services.polyphone import PolyphoneFixer
-from app.services.chunker import TextChunker
+from app.services.chunker import StreamingSegmenter, TextChunker
 from app.services.llm_transcriber import LLMTranscriber
+from app.services.timing import PipelineTimings, timed_iter
+from app.services.wav import trim_wav
 
 logger = logging.getLogger(__name__)
 
+_CHUNK_DONE = object()
+
 
 class TTSPipeline:
     """TTS 编排层：LLM转写 → 预处理 → 多音字 → 分段 → engine 合成。
 
     所有步骤都是可选的（传 None 跳过）。
     Engine 只负责 chunk 文本 → 音频 bytes。
-    Pipeline 负责 ref_audio 状态管理、段间静音、首段最小化。
+    Pipeline 负责 ref_audio 状态管理（含跨请求 ref 缓存）、段间静音、首段最小化、
+    前瞻并发合成、chunk 音频缓存、慢请求对冲（可选）。
+    合成路径（会话 / 流式 / 整段、是否等待 ref_audio、输出编码与 PCM 格式、分段上限）
+    都按 engine.capabilities 的声明选择。
     """
 
     SENTENCE_SPLIT = re.compile(r"[。！？!？\.\n]")
@@ -36,9 +46,18 @@ class TTSPipeline:
         ref_trim_seconds: int = 8,
         silence_between_chunks: float = 0.3,
         first_chunk_minimize: bool = True,
-        sample_rate: int = 24000,
+        sample_rate: int | None = None,
+        lookahead: int = 1,
+        llm_stream: bool = False,
+        chunker_max_chars: int = 500,
+        cache: ChunkAudioCache | None = None,
+        engine_name: str = "",
+        ref_cache: RefAudioCache | None = None,
+        session_stream: bool = False,
+        hedge: HedgePolicy | None = None,
     ) -> None:
         self.engine = engine
+        self.capabilities = caps = capabilities_of(engine)
         self.llm_transcriber = llm_transcriber
         self.preprocessor = preprocessor
         self.polyphone_fixer = polyphone_fixer
@@ -46,7 +65,17 @@ class TTSPipeline:
         self.ref_trim_seconds = ref_trim_seconds
         self.silence_between_chunks = silence_between_chunks
         self.first_chunk_minimize = first_chunk_minimize
-        self.sample_rate = sample_rate
+        # 未指定时用 engine 声明的 PCM 采样率（pcm 输出无头，静音与时长按此计算）
+        self.sample_rate = sample_rate or caps.sample_rate
+        self.lookahead = lookahead
+        self.llm_stream = llm_stream
+        self.chunker_max_chars = min(chunker_max_chars, caps.max_chars or chunker_max_chars)
+        self.cache = cache
+        self.ref_cache = ref_cache
+        self.engine_name = engine_name or type(engine).__name__
+        self.hedge = hedge
+        # 会话级流式：engine 支持会话且不需要 ref_audio 时整个请求共用一个 session
+        self.session_stream = session_stream and caps.session_streaming and not caps.voice_cloning
 
     async def generate_stream(
         self,
@@ -54,85 +83,457 @@ class TTSPipeline:
         voice: str = "default",
         speed: float = 1.0,
         use_preprocess: bool = True,
+        session_id: str | None = None,
+        timings: PipelineTimings | None = None,
+        audio_format: str | None = None,
         **engine_kwargs,
-    ) -> AsyncGenerator[bytes, None]:
+    ) -> AsyncGenerator[bytes | memoryview, None]:
         """完整 pipeline 流式生成。
 
-        Yields: WAV bytes
+        Yields: 单一连续音频流（编码见 negotiate_format，默认 engine 原生编码）；数据块为 bytes 或
+            memoryview 零拷贝切片，需要 bytes 方法（startswith / hash / + 拼接）时先 bytes(data)
+        session_id: 会话 id，同一会话内复用同一 ref_audio，保持音色一致
+        timings: 传入时记录各阶段耗时（见 PipelineTimings），None 时不打点
+        audio_format: 期望的输出编码；engine 能原生输出时直接请求该编码，否则用原生编码
         engine_kwargs: 传递给 engine 的额外参数 (temperature, instruct, etc.)
         """
-        processed = text
-
         # 0. LLM 转写（可选，最耗时的前置步骤）
         if use_preprocess and self.llm_transcriber and self.llm_transcriber.is_configured():
-            processed = await self.llm_transcriber.transcribe(processed)
+            if self.llm_stream:
+                # 流式转写：每完成一段就进入分段/合成，与 LLM 生成重叠
+                segments = self.llm_transcriber.transcribe_stream(
+                    text,
+                    max_chars=self.chunker_max_chars,
+                    first_sentence=self.first_chunk_minimize,
+                )
+                if timings is not None:
+                    segments = timed_iter(segments, timings, "llm")
+            else:
+                t0 = time.perf_counter()
+                transcribed = await self.llm_transcriber.transcribe(text)
+                if timings is not None:
+                    timings.add("llm", time.perf_counter() - t0)
+                segments = _iter_once(transcribed)
+        else:
+            segments = _iter_once(text)
+
+        # 1-3. 预处理 → 多音字 → 分段 → 首段最小化（逐段增量进行）
+        chunks = self._chunk_segments(segments, use_preprocess, timings)
+
+        # 4. 带前瞻窗口的并发生成，按顺序输出
+        async for data in self._synthesize(
+            chunks, voice, speed, engine_kwargs, session_id, timings, audio_format,
+        ):
+            yield data
+
+    async def generate_stream_incremental(
+        self,
+        fragments: AsyncIterable[str],
+        voice: str = "default",
+        speed: float = 1.0,
+        use_preprocess: bool = True,
+        session_id: str | None = None,
+        timings: PipelineTimings | None = None,
+        audio_format: str | None = None,
+        **engine_kwargs,
+    ) -> AsyncGenerator[bytes | memoryview, None]:
+        """增量输入流式生成：输入为文本片段流（如 LLM 逐 token 输出）。
+
+        每凑齐一个完整句子就预处理、分段并送入合成，输入结束时冲刷尾部。
+        输入本身已是 LLM 输出，因此不再做 LLM 转写。
+
+        Yields: 单一连续音频流（编码见 negotiate_format），数据块为 bytes 或 memoryview
+        """
+        chunks = self._chunk_segments(self._sentences(fragments), use_preprocess, timings)
+        async for data in self._synthesize(
+            chunks, voice, speed, engine_kwargs, session_id, timings, audio_format,
+        ):
+            yield data
+
+    async def _sentences(self, fragments: AsyncIterable[str]) -> AsyncGenerator[str, None]:
+        """把任意切分的文本片段流重组为完整句子流。"""
+        segmenter = StreamingSegmenter(max_chars=self.chunker_max_chars, sentence_mode=True)
+        async for fragment in fragments:
+            for sentence in segmenter.feed(fragment):
+                yield sentence
+        for sentence in segmenter.flush():
+            yield sentence
+
+    async def _chunk_segments(
+        self,
+        segments: AsyncIterable[str],
+        use_preprocess: bool,
+        timings: PipelineTimings | None = None,
+    ) -> AsyncGenerator[str, None]:
+        """把文本片段流转为 chunk 流。每个片段独立预处理、分段。"""
+        first = True
+        async for segment in segments:
+            chunks = self._split_segment(segment, use_preprocess, timings)
+
+            # 3. 首段最小化：将第一段拆出第一句话，降低首字延迟
+            if first and self.first_chunk_minimize and chunks and len(chunks[0]) > 100:
+                chunks = self._split_first_sentence(chunks)
+            if timings is not None:
+                timings.chars_total += sum(len(c) for c in chunks if c.strip())
+
+            for chunk_text in chunks:
+                if chunk_text.strip():
+                    first = False
+                    yield chunk_text
+
+    def _split_segment(
+        self,
+        segment: str,
+        use_preprocess: bool,
+        timings: PipelineTimings | None = None,
+    ) -> list[str]:
+        """单个文本片段：预处理 → 多音字 → 分段。"""
+        processed = segment
+        t0 = time.perf_counter()
 
         # 1. 正则预处理
         if use_preprocess:
             if self.preprocessor:
                 processed = self.preprocessor.process(processed)
+                if timings is not None:
+                    t1 = time.perf_counter()
+                    timings.add("preprocess", t1 - t0)
+                    t0 = t1
             if self.polyphone_fixer:
                 processed = self.polyphone_fixer.fix(processed)
+                if timings is not None:
+                    t1 = time.perf_counter()
+                    timings.add("polyphone", t1 - t0)
+                    t0 = t1
 
         # 2. 分段
         if self.chunker:
-            chunks = self.chunker.chunk_text(processed)
+            chunks = self.chunker.chunk_text(processed, max_chars=self.chunker_max_chars)
         else:
             chunks = [processed] if processed else []
+        if timings is not None:
+            timings.add("chunk", time.perf_counter() - t0)
+        return chunks
 
-        if not chunks:
-            return
-
-        # 3. 首段最小化：将第一段拆出第一句话，降低首字延迟
-        if self.first_chunk_minimize and len(chunks) > 0 and len(chunks[0]) > 100:
-            chunks = self._split_first_sentence(chunks)
-
-        # 4. 逐段生成
-        ref_audio: bytes | None = None
-        first_chunk = True
-
-        for i, chunk_text in enumerate(chunks):
-            if not chunk_text.strip():
-                continue
-
-            logger.debug(f"Pipeline chunk {i}/{len(chunks)}: {len(chunk_text)} chars")
-
-            # 对 qwen engine 使用流式接口（server 内部按句子流式）
-            if hasattr(self.engine, 'generate_chunk_stream'):
-                # 流式：直接 yield 每个数据块，首字延迟最低
-                if first_chunk:
-                    # 首段收集完整音频用于提取 ref
-                    audio_parts: list[bytes] = []
-                    async for data in self.engine.generate_chunk_stream(
-                        chunk_text, voice=voice, speed=speed, ref_audio=ref_audio,
-                        **engine_kwargs,
-                    ):
-                        audio_parts.append(data)
+    def _synthesize(
+        self,
+        chunks: AsyncIterable[str],
+        voice: str,
+        speed: float,
+        engine_kwargs: dict,
+        session_id: str | None = None,
+        timings: PipelineTimings | None = None,
+        audio_format: str | None = None,
+    ) -> AsyncGenerator[bytes | memoryview, None]:
+        if self.session_stream:
+            return self._synthesize_session(chunks, voice, speed, engine_kwargs, timings, audio_format)
+        return self._synthesize_ordered(
+            chunks, voice, speed, engine_kwargs, session_id, timings, audio_format,
+        )
+
+    async def _synthesize_session(
+        self,
+        chunks: AsyncIterable[str],
+        voice: str,
+        speed: float,
+        engine_kwargs: dict,
+        timings: PipelineTimings | None = None,
+        audio_format: str | None = None,
+    ) -> AsyncGenerator[bytes | memoryview, None]:
+        """会话级流式：整个请求一个 engine session，每个 chunk 预处理完即发送，音频并发接收。
+
+        - 省去逐 chunk 的 session 建立/结束往返，engine 可跨句流水线合成
+        - 输出为一段连续音频：不插入段间静音，也不经过 chunk 缓存
+        """
+        codec = self.negotiate_format(audio_format)
+        if codec != self.output_format:
+            engine_kwargs = {**engine_kwargs, "audio_format": codec}
+        sent = 0
+
+        async def texts() -> AsyncGenerator[str, None]:
+            nonlocal sent
+            async for chunk_text in chunks:
+                logger.debug(f"Pipeline session chunk {sent}: {len(chunk_text)} chars")
+                sent += 1
+                if timings is not None:
+                    # 按已发送文本计（偏保守：取消时的节省估计不会偏大）
+                    timings.chars_done += len(chunk_text)
+                yield chunk_text
+
+        output = self.output_stage(codec)
+        output.begin_chunk()
+        t0 = time.perf_counter()
+        try:
+            async with aclosing(self.engine.generate_session_stream(
+                texts(), voice=voice, speed=speed, **engine_kwargs,
+            )) as stream:
+                async for item in stream:
+                    if timings is not None and 0 not in timings.chunk_ttfb:
+                        timings.chunk_ttfb[0] = time.perf_counter() - t0
+                    for data in output.feed(item):
+                        if timings is not None:
+                            timings.mark_first_audio()
                         yield data
-                    first_chunk_audio = b"".join(audio_parts)
-                    if len(chunks) > 1:
-                        ref_audio = self._extract_ref(first_chunk_audio, self.ref_trim_seconds)
+            tail = output.end_chunk()
+            if tail:
+                yield tail
+            if timings is not None:
+                timings.chunk_duration[0] = time.perf_counter() - t0
+        finally:
+            if timings is not None:
+                timings.audio_seconds = output.duration_seconds
+            logger.debug(f"Pipeline session finished after {sent} chunks")
+
+    async def _synthesize_ordered(
+        self,
+        chunks: AsyncIterable[str],
+        voice: str,
+        speed: float,
+        engine_kwargs: dict,
+        session_id: str | None = None,
+        timings: PipelineTimings | None = None,
+        audio_format: str | None = None,
+    ) -> AsyncGenerator[bytes | memoryview, None]:
+        """前瞻窗口内最多 lookahead 个 chunk 同时合成，按原顺序 yield。
+
+        - 每个 chunk 一个 task，音频写入各自的 queue；消费端按序读取
+        - 窗口槽位在消费端读完一个 chunk 后释放，保证内存有界
+        - 只有需要 ref_audio 的 chunk（engine 支持声音克隆时的非首段）等待首段完成
+        - ref_cache 中已有该声音/会话的 ref 时直接使用，所有 chunk（含首段）立即并发
+        - chunks 可以是增量到达的流（如 LLM 流式转写），边到达边调度
+        """
+        codec = self.negotiate_format(audio_format)
+        if codec != self.output_format:
+            # 请求 engine 直接输出协商后的编码（同时进入缓存 key，不同编码分开缓存）
+            engine_kwargs = {**engine_kwargs, "audio_format": codec}
+        needs_ref = self.capabilities.voice_cloning
+        streaming = self.capabilities.streaming
+        loop = asyncio.get_running_loop()
+        ref_future: asyncio.Future[bytes | None] = loop.create_future()
+        ref_key = None
+        if needs_ref and self.ref_cache is not None:
+            ref_key = self.ref_cache.make_key(self.engine_name, voice, speed, session_id)
+            warm_ref = self.ref_cache.get(ref_key)
+            if warm_ref is not None:
+                ref_future.set_result(warm_ref)
+        warm = ref_future.done()
+        # 按 chunk 顺序排列的 (chunk 文本, 输出 queue)；结束/出错时放入 _CHUNK_DONE/异常
+        order: asyncio.Queue = asyncio.Queue()
+        window = asyncio.Semaphore(max(1, self.lookahead))
+
+        async def run_chunk(i: int, chunk_text: str, queue: asyncio.Queue) -> None:
+            try:
+                ref_audio = await ref_future if needs_ref and (i > 0 or warm) else None
+                logger.debug(f"Pipeline chunk {i}: {len(chunk_text)} chars")
+                cache_key = self._cache_key(chunk_text, voice, speed, engine_kwargs, ref_audio)
+                cached = await self.cache.get(cache_key) if cache_key else None
+                extract = i == 0 and needs_ref and not warm
+                keep = extract or cache_key is not None
+                parts: list[bytes] = []
+                t0 = time.perf_counter()
+                if cached is not None:
+                    # 缓存命中：跳过 engine 往返
+                    parts.append(cached)
+                    queue.put_nowait(cached)
+                elif streaming:
+                    # 流式：直接转发每个数据块，首字延迟最低
+                    async with aclosing(self._engine_stream(
+                        chunk_text, voice, speed, ref_audio, engine_kwargs,
+                    )) as stream:
+                        async for data in stream:
+                            if timings is not None and i not in timings.chunk_ttfb:
+                                timings.chunk_ttfb[i] = time.perf_counter() - t0
+                            if keep:
+                                parts.append(data)
+                            queue.put_nowait(data)
                 else:
-                    if self.silence_between_chunks > 0:
-                        yield self._make_silence_from_engine(ref_audio, self.silence_between_chunks)
-                    async for data in self.engine.generate_chunk_stream(
-                        chunk_text, voice=voice, speed=speed, ref_audio=ref_audio,
-                        **engine_kwargs,
-                    ):
+                    # 非流式 engine：等完整音频
+                    audio = await self._engine_call(chunk_text, voice, speed, ref_audio, engine_kwargs)
+                    if timings is not None:
+                        timings.chunk_ttfb[i] = time.perf_counter() - t0
+                    parts.append(audio)
+                    queue.put_nowait(audio)
+                if timings is not None and cached is None:
+                    timings.chunk_duration[i] = time.perf_counter() - t0
+                if cache_key and cached is None:
+                    await self.cache.put(cache_key, b"".join(parts))
+                if extract:
+                    ref_audio = self._extract_ref(b"".join(parts), self.ref_trim_seconds)
+                    ref_future.set_result(ref_audio)
+                    if ref_key is not None:
+                        self.ref_cache.put(ref_key, ref_audio)
+                queue.put_nowait(_CHUNK_DONE)
+            except Exception as e:
+                queue.put_nowait(e)
+            finally:
+                if i == 0 and not ref_future.done():
+                    # 首段失败时不让后续 chunk 永远等待；错误由消费端按序抛出
+                    ref_future.set_result(None)
+
+        async def schedule() -> None:
+            try:
+                i = 0
+                async for chunk_text in chunks:
+                    await window.acquire()
+                    queue: asyncio.Queue = asyncio.Queue()
+                    tasks.append(asyncio.create_task(run_chunk(i, chunk_text, queue)))
+                    order.put_nowait((chunk_text, queue))
+                    i += 1
+                order.put_nowait(_CHUNK_DONE)
+            except Exception as e:
+                order.put_nowait(e)
+
+        tasks: list[asyncio.Task] = []
+        scheduler = asyncio.create_task(schedule())
+        output = self.output_stage(codec)
+        i = 0
+        try:
+            while True:
+                entry = await order.get()
+                if entry is _CHUNK_DONE:
+                    break
+                if isinstance(entry, Exception):
+                    raise entry
+                chunk_text, queue = entry
+                if i > 0 and self.silence_between_chunks > 0:
+                    silence = output.silence(self.silence_between_chunks)
+                    if silence:
+                        yield silence
+                output.begin_chunk()
+                while True:
+                    item = await queue.get()
+                    if item is _CHUNK_DONE:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    for data in output.feed(item):
+                        if timings is not None:
+                            timings.mark_first_audio()
                         yield data
-            else:
-                # 非流式 engine（edge/volcengine）：等完整音频
-                audio = await self.engine.generate_chunk(
-                    chunk_text, voice=voice, speed=speed, ref_audio=ref_audio,
-                )
-                if first_chunk and len(chunks) > 1:
-                    ref_audio = self._extract_ref(audio, self.ref_trim_seconds)
-                if not first_chunk and self.silence_between_chunks > 0:
-                    yield self._make_silence(audio, self.silence_between_chunks)
-                else:
-                    yield audio
+                tail = output.end_chunk()
+                if tail:
+                    yield tail
+                window.release()
+                if timings is not None:
+                    timings.chars_done += len(chunk_text)
+                i += 1
+        finally:
+            if timings is not None:
+                timings.audio_seconds = output.duration_seconds
+            in_flight = sum(not task.done() for task in tasks)
+            if in_flight:
+                # 消费端提前退出（客户端断开 / 出错）：取消在途 chunk，engine 连接随之关闭
+                logger.info(f"Pipeline stopped after {i} chunks, cancelling {in_flight} in-flight")
+            scheduler.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(scheduler, *tasks, return_exceptions=True)
+
+    def _engine_stream(
+        self,
+        chunk_text: str,
+        voice: str,
+        speed: float,
+        ref_audio: bytes | None,
+        engine_kwargs: dict,
+    ) -> AsyncIterator[bytes | memoryview]:
+        """engine 流式合成一个 chunk；配置了对冲策略时首包过慢会再发一个相同请求。"""
+        def start() -> AsyncIterator[bytes | memoryview]:
+            return self.engine.generate_chunk_stream(
+                chunk_text, voice=voice, speed=speed, ref_audio=ref_audio, **engine_kwargs,
+            )
+
+        return hedged_stream(start, self.hedge) if self.hedge is not None else start()
+
+    async def _engine_call(
+        self,
+        chunk_text: str,
+        voice: str,
+        speed: float,
+        ref_audio: bytes | None,
+        engine_kwargs: dict,
+    ) -> bytes:
+        def start() -> Awaitable[bytes]:
+            return self.engine.generate_chunk(
+                chunk_text, voice=voice, speed=speed, ref_audio=ref_audio, **engine_kwargs,
+            )
 
-            first_chunk = False
+        return await (hedged_call(start, self.hedge) if self.hedge is not None else start())
+
+    @property
+    def output_format(self) -> str | None:
+        """engine 原生输出编码（wav / mp3 / pcm），未声明时为 None（原样透传）。"""
+        return self.capabilities.native_format
+
+    @property
+    def media_type(self) -> str:
+        """generate_stream 输出流（原生编码）的 Content-Type。"""
+        return self.output_stage().media_type
+
+    def negotiate_format(self, requested: str | None) -> str | None:
+        """输出编码协商：engine 声明可原生输出（output_formats）时用请求的编码，否则用原生编码。"""
+        if requested and requested in self.capabilities.output_formats:
+            return requested
+        return self.output_format
+
+    def output_stage(self, codec: str | None = None) -> AudioOutputStage:
+        caps = self.capabilities
+        return AudioOutputStage(
+            codec or self.output_format,
+            sample_rate=self.sample_rate,
+            channels=caps.channels,
+            sample_width=caps.sample_width,
+        )
+
+    # ------------------------------------------------------------------ #
+    # 逐 chunk 接口：供自行调度 chunk 的离线任务使用（落盘、断点续跑）
+    # ------------------------------------------------------------------ #
+    def split_text(self, text: str, use_preprocess: bool = True) -> list[str]:
+        """预处理并分段，返回非空 chunk 文本（不做 LLM 转写和首段最小化）。"""
+        return [c for c in self._split_segment(text, use_preprocess) if c.strip()]
+
+    async def render_chunk(
+        self,
+        chunk_text: str,
+        voice: str = "default",
+        speed: float = 1.0,
+        ref_audio: bytes | None = None,
+        **engine_kwargs,
+    ) -> bytes:
+        """合成单个 chunk 的完整音频（engine 原生格式，经过 chunk 缓存）。"""
+        cache_key = self._cache_key(chunk_text, voice, speed, engine_kwargs, ref_audio)
+        if cache_key:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        audio = await self.engine.generate_chunk(
+            chunk_text, voice=voice, speed=speed, ref_audio=ref_audio, **engine_kwargs,
+        )
+        if cache_key:
+            await self.cache.put(cache_key, audio)
+        return audio
+
+    def extract_ref(self, audio: bytes) -> bytes:
+        """从 chunk 音频截取参考音频（长度 ref_trim_seconds）。"""
+        return self._extract_ref(audio, self.ref_trim_seconds)
+
+    def _cache_key(
+        self,
+        chunk_text: str,
+        voice: str,
+        speed: float,
+        engine_kwargs: dict,
+        ref_audio: bytes | None,
+    ) -> str | None:
+        """返回 chunk 缓存 key；未启用缓存或参数非确定性时返回 None。"""
+        if self.cache is None:
+            return None
+        if not self.cache.is_cacheable(engine_kwargs, self.capabilities.deterministic):
+            self.cache.record_bypass()
+            return None
+        return self.cache.make_key(
+            self.engine_name, voice, speed, chunk_text, engine_kwargs, ref_audio,
+        )
 
     def _split_first_sentence(self, chunks: list[str]) -> list[str]:
         """将第一段拆为 [第一句, 剩余部分, ...其他段]，降低首字延迟。"""
@@ -145,52 +546,11 @@ class TTSPipeline:
     def _extract_ref(self, wav_bytes: bytes, seconds: int) -> bytes:
         """从 WAV bytes 中截取前 N 秒作为参考音频。"""
         try:
-            buf = io.BytesIO(wav_bytes)
-            with wave.open(buf, "rb") as wav:
-                n_channels = wav.getnchannels()
-                sample_width = wav.getsampwidth()
-                framerate = wav.getframerate()
-                total_frames = wav.getnframes()
-                trim_frames = min(int(seconds * framerate), total_frames)
-                frames = wav.readframes(trim_frames)
-
-            out_buf = io.BytesIO()
-            with wave.open(out_buf, "wb") as out_wav:
-                out_wav.setnchannels(n_channels)
-                out_wav.setsampwidth(sample_width)
-                out_wav.setframerate(framerate)
-                out_wav.writeframes(frames)
-            return out_buf.getvalue()
+            return trim_wav(wav_bytes, seconds)
         except Exception as e:
             logger.warning(f"Failed to extract ref audio: {e}")
             return wav_bytes
 
-    def _make_silence(self, ref_wav: bytes, seconds: float) -> bytes:
-        """构造一段静音 WAV。"""
-        try:
-            buf = io.BytesIO(ref_wav)
-            with wave.open(buf, "rb") as wav:
-                n_channels = wav.getnchannels()
-                sample_width = wav.getsampwidth()
-                framerate = wav.getframerate()
-
-            n_frames = int(seconds * framerate)
-            silence_frames = b"\x00" * (n_frames * n_channels * sample_width)
-
-            out_buf = io.BytesIO()
-            with wave.open(out_buf, "wb") as out_wav:
-                out_wav.setnchannels(n_channels)
-                out_wav.setsampwidth(sample_width)
-                out_wav.setframerate(framerate)
-                out_wav.writeframes(silence_frames)
-            return out_buf.getvalue()
-        except Exception:
-            return b""
-
-    def _make_silence_from_engine(self, ref_wav: bytes | None, seconds: float) -> bytes:
-        """从引擎格式信息生成静音 PCM（用于流式模式）。"""
-        if ref_wav:
-            return self._make_silence(ref_wav, seconds)
-        # 默认格式：16-bit PCM mono 24kHz
-        n_samples = int(seconds * self.sample_rate)
-        return b"\x00" * (n_samples * 2)  # int16 = 2 bytes/sample
+
+async def _iter_once(text: str) -> AsyncGenerator[str, None]:
+    yield text
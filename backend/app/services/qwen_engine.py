@@ -1,18 +1,56 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
-from typing import Any, AsyncGenerator
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator
 
 import httpx
 
+from app.services.base import EngineCapabilities
+from app.services.http_clients import HTTPClientPool
+
 logger = logging.getLogger(__name__)
 
+# 请求未送达 server 的错误：可安全地换副本重试
+_CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class _Replica:
+    """一个 qwen3-tts server 副本：在途请求数与健康状态。"""
+
+    def __init__(self, url: str) -> None:
+        self.url = url.rstrip("/")
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.healthy = True
+        self.checked_at = 0.0
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "healthy": self.healthy,
+        }
+
 
 class Qwen3TTSEngine:
     """qwen3-tts-pytorch server 的 HTTP 客户端。
 
     通过 faster-qwen3-tts + CUDA Graph 实现推理加速。
     支持声音选择、语速、温度、自然语言指令。
+    ref_audio 以内容 hash 引用：server 缓存每个参考音频的 voice_clone_prompt，
+    音频只在 server 未缓存（409）时上传一次。
+    实例长期存活、跨请求共享：HTTP 请求走共享的 HTTPClientPool（按 upstream 复用连接）；
+    未传入 http 时使用自有的池，aclose() 时关闭。
+
+    多副本（server_urls）：server 内部串行生成，每个 chunk 发往在途请求最少的健康副本；
+    后台每 health_interval 秒检查 /api/health，不健康（或连接失败）的副本不再分配请求，
+    恢复后重新加入。全部不健康时仍按在途数分配（不拒绝请求）。
     """
 
     def __init__(
@@ -21,11 +59,109 @@ class Qwen3TTSEngine:
         language: str = "zh",
         max_tokens: int = 8192,
         timeout: float = 600.0,
+        http: HTTPClientPool | None = None,
+        server_urls: list[str] | None = None,
+        health_interval: float = 10.0,
     ) -> None:
-        self.server_url = server_url.rstrip("/")
+        self.replicas = [_Replica(url) for url in (server_urls or [server_url])]
+        # server 内部串行生成：每个副本同时只有一个 chunk 在算，建议并发 = 副本数；
+        # 默认 temperature 采样，输出不确定
+        self.capabilities = EngineCapabilities(
+            native_format="wav",
+            output_formats=("wav",),
+            streaming=True,
+            voice_cloning=True,
+            deterministic=False,
+            recommended_concurrency=len(self.replicas),
+        )
+        self.server_url = self.replicas[0].url
+        self.health_interval = health_interval
+        self._next = 0
+        self._health_task: asyncio.Task | None = None
         self.language = language
         self.max_tokens = max_tokens
         self.timeout = timeout
+        self._owns_http = http is None
+        self.http = http or HTTPClientPool()
+        self._uploads: dict[tuple[str, str], asyncio.Task] = {}  # (副本, ref_hash) → 上传中的 task
+
+    def _http(self, url: str | None = None) -> httpx.AsyncClient:
+        return self.http.client(url or self.server_url)
+
+    async def aclose(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        if self._owns_http:
+            await self.http.aclose()
+
+    # ------------------------------------------------------------------ #
+    # 副本选择与健康检查
+    # ------------------------------------------------------------------ #
+    def _pick(self, exclude: set[str] = frozenset()) -> _Replica:
+        """在途请求最少的健康副本；并列时轮转，避免总落在第一个。"""
+        untried = [r for r in self.replicas if r.url not in exclude] or self.replicas
+        candidates = [r for r in untried if r.healthy] or untried
+        n = len(candidates)
+        start = self._next % n
+        self._next += 1
+        order = candidates[start:] + candidates[:start]
+        return min(order, key=lambda r: r.in_flight)
+
+    @asynccontextmanager
+    async def _replica(self, tried: set[str]) -> AsyncIterator[_Replica]:
+        """占用一个副本直到请求（含流式响应）结束；选中的副本记入 tried。"""
+        self._ensure_health_task()
+        replica = self._pick(tried)
+        tried.add(replica.url)
+        replica.in_flight += 1
+        replica.requests += 1
+        try:
+            yield replica
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            replica.failures += 1
+            if isinstance(e, httpx.TransportError) or e.response.status_code >= 500:
+                # 连不上 / server 出错：先摘除，由健康检查恢复
+                self._mark(replica, False, str(e) or type(e).__name__)
+            raise
+        finally:
+            replica.in_flight -= 1
+
+    def _ensure_health_task(self) -> None:
+        if len(self.replicas) > 1 and self.health_interval > 0 and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def _health_loop(self) -> None:
+        while True:
+            await self.check_replicas()
+            await asyncio.sleep(self.health_interval)
+
+    async def check_replicas(self) -> None:
+        """并发检查所有副本的 /api/health（模型未就绪也视为不健康）。"""
+        async def check(replica: _Replica) -> None:
+            try:
+                resp = await self._http(replica.url).get(f"{replica.url}/api/health", timeout=5.0)
+                ok = resp.status_code == 200 and resp.json().get("ok", True) is not False
+                reason = f"HTTP {resp.status_code}" if resp.status_code != 200 else "not ready"
+            except Exception as e:
+                ok, reason = False, str(e) or type(e).__name__
+            replica.checked_at = time.monotonic()
+            self._mark(replica, ok, reason)
+
+        await asyncio.gather(*(check(r) for r in self.replicas))
+
+    @staticmethod
+    def _mark(replica: _Replica, healthy: bool, reason: str = "") -> None:
+        if replica.healthy and not healthy:
+            logger.warning(f"Qwen3TTSEngine: replica {replica.url} unhealthy ({reason}), draining")
+        elif healthy and not replica.healthy:
+            logger.info(f"Qwen3TTSEngine: replica {replica.url} healthy again")
+        replica.healthy = healthy
+
+    def replica_stats(self) -> dict[str, dict[str, Any]]:
+        """每个副本的在途请求数（队列深度）、累计请求/失败数与健康状态。"""
+        return {r.url: r.snapshot() for r in self.replicas}
 
     async def generate_chunk(
         self,
@@ -39,26 +175,29 @@ class Qwen3TTSEngine:
         volume: float = 1.0,
     ) -> bytes:
         """调用 TTS server 生成一段音频，返回完整 WAV bytes。"""
-        payload: dict[str, Any] = {
-            "text": text,
-            "language": self.language,
-            "voice": voice,
-            "speed": speed,
-            "pitch": pitch,
-            "volume": volume,
-        }
-        if temperature is not None:
-            payload["temperature"] = temperature
-        if instruct:
-            payload["instruct"] = instruct
-
+        payload = self._payload(text, voice, speed, ref_audio, temperature, instruct, pitch, volume)
         logger.debug(f"Qwen3TTSEngine: POST synthesize, {len(text)} chars, voice={voice}")
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            resp = await client.post(
-                f"{self.server_url}/api/synthesize",
+        tried: set[str] = set()
+        while True:
+            try:
+                async with self._replica(tried) as replica:
+                    return await self._synthesize(replica, payload, ref_audio)
+            except _CONNECT_ERRORS:
+                # 请求未送达：换一个副本重试
+                if len(tried) >= len(self.replicas):
+                    raise
+
+    async def _synthesize(self, replica: _Replica, payload: dict[str, Any], ref_audio: bytes | None) -> bytes:
+        for attempt in range(2):
+            resp = await self._http(replica.url).post(
+                f"{replica.url}/api/synthesize",
                 json=payload,
+                timeout=self.timeout,
             )
+            if resp.status_code == 409 and ref_audio and not attempt:
+                await self._upload_ref(replica.url, payload["ref_hash"], ref_audio)
+                continue
             resp.raise_for_status()
             return resp.content
 
@@ -74,6 +213,46 @@ class Qwen3TTSEngine:
         volume: float = 1.0,
     ) -> AsyncGenerator[bytes, None]:
         """流式合成：server 按句子切分，边生成边返回 PCM。"""
+        payload = self._payload(text, voice, speed, ref_audio, temperature, instruct, pitch, volume)
+
+        tried: set[str] = set()
+        while True:
+            started = False
+            try:
+                async with self._replica(tried) as replica:
+                    for attempt in range(2):
+                        async with self._http(replica.url).stream(
+                            "POST",
+                            f"{replica.url}/api/synthesize_stream",
+                            json=payload,
+                            timeout=self.timeout,
+                        ) as resp:
+                            if resp.status_code == 409 and ref_audio and not attempt:
+                                await resp.aread()
+                            else:
+                                resp.raise_for_status()
+                                async for chunk in resp.aiter_bytes(chunk_size=8192):
+                                    if chunk:
+                                        started = True
+                                        yield chunk
+                                return
+                        await self._upload_ref(replica.url, payload["ref_hash"], ref_audio)
+            except _CONNECT_ERRORS:
+                # 尚未输出任何音频：换一个副本重试
+                if started or len(tried) >= len(self.replicas):
+                    raise
+
+    def _payload(
+        self,
+        text: str,
+        voice: str,
+        speed: float,
+        ref_audio: bytes | None,
+        temperature: float | None,
+        instruct: str | None,
+        pitch: float,
+        volume: float,
+    ) -> dict[str, Any]:
         payload: dict[str, Any] = {
             "text": text,
             "language": self.language,
@@ -82,37 +261,46 @@ class Qwen3TTSEngine:
             "pitch": pitch,
             "volume": volume,
         }
+        if ref_audio:
+            # 只发内容 hash：server 命中 prompt 缓存时直接用，未命中回 409 再上传
+            payload["ref_hash"] = hashlib.sha256(ref_audio).hexdigest()
         if temperature is not None:
             payload["temperature"] = temperature
         if instruct:
             payload["instruct"] = instruct
+        return payload
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            async with client.stream(
-                "POST",
-                f"{self.server_url}/api/synthesize_stream",
-                json=payload,
-            ) as resp:
-                resp.raise_for_status()
-                async for chunk in resp.aiter_bytes(chunk_size=8192):
-                    if chunk:
-                        yield chunk
+    async def _upload_ref(self, url: str, ref_hash: str, ref_audio: bytes) -> None:
+        """上传参考音频，副本计算 voice_clone_prompt 并按 hash 缓存；同一副本同一 hash 并发时只传一次。"""
+        key = (url, ref_hash)
+        task = self._uploads.get(key)
+        if task is None:
+            task = self._uploads[key] = asyncio.create_task(self._put_ref(url, ref_hash, ref_audio))
+            task.add_done_callback(lambda _: self._uploads.pop(key, None))
+        await asyncio.shield(task)
+
+    async def _put_ref(self, url: str, ref_hash: str, ref_audio: bytes) -> None:
+        logger.info(f"Qwen3TTSEngine: uploading ref audio {ref_hash[:12]} to {url} ({len(ref_audio)} bytes)")
+        resp = await self._http(url).put(
+            f"{url}/api/ref_prompt/{ref_hash}",
+            content=ref_audio,
+            headers={"Content-Type": "application/octet-stream"},
+            timeout=self.timeout,
+        )
+        resp.raise_for_status()
 
     async def get_voices(self) -> list[dict[str, Any]]:
+        url = self._pick().url
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                resp = await client.get(f"{self.server_url}/api/voices")
-                if resp.status_code == 200:
-                    data = resp.json()
-                    return data.get("voices", [])
+            resp = await self._http(url).get(f"{url}/api/voices", timeout=10.0)
+            if resp.status_code == 200:
+                data = resp.json()
+                return data.get("voices", [])
         except Exception:
             pass
         return [{"id": "default", "name": "Qwen3-TTS 默认", "language": "multilingual"}]
 
     async def health_check(self) -> bool:
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                resp = await client.get(f"{self.server_url}/api/health")
-                return resp.status_code == 200
-        except Exception:
-            return False
+        """任一副本健康即可用。"""
+        await self.check_replicas()
+        return any(r.healthy for r in self.replicas)
@@ -44,10 +44,12 @@ class EngineRegistry:
 def register_builtin_engines() -> None:
     """注册所有内置 engine。在 app 启动时调用。"""
     from app.services.edge_engine import EdgeTTSEngine
+    from app.services.mock_engine import MockTTSEngine
     from app.services.volcengine_engine import VolcengineTTSEngine
 
     EngineRegistry.register("edge")(EdgeTTSEngine)
     EngineRegistry.register("volcengine")(VolcengineTTSEngine)
+    EngineRegistry.register("mock")(MockTTSEngine)
 
     try:
         from app.services.qwen_engine import Qwen3TTSEngine
@@ -0,0 +1,477 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncGenerator, Callable
+
+from app.services.audio_cache import ChunkAudioCache
+from app.services.pipeline import TTSPipeline
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def source_segments(text: str) -> list[tuple[int, int]]:
+    """按空行把原文切成段落，返回 [(start, end)] 偏移；代码块内的空行不切。"""
+    spans: list[tuple[int, int]] = []
+    start = 0
+    fences = 0
+    scanned = 0
+    for m in _PARAGRAPH_BREAK.finditer(text):
+        fences += text.count("```", scanned, m.start())
+        scanned = m.start()
+        if fences % 2:
+            continue
+        if text[start:m.start()].strip():
+            spans.append((start, m.start()))
+        start = m.end()
+    if text[start:].strip():
+        spans.append((start, len(text)))
+    return spans
+
+
+@dataclass
+class ChunkEntry:
+    """manifest 中的一个 chunk。key 按内容寻址，同一任务内相同内容只合成一次。"""
+
+    index: int
+    key: str
+    text: str
+    source_start: int
+    source_end: int
+
+
+@dataclass
+class RenderJob:
+    id: str
+    engine: str
+    voice: str
+    speed: float
+    preprocess: bool
+    created_at: float
+    status: str = QUEUED
+    revision: int = 1
+    ext: str = "bin"
+    error: str | None = None
+    finished_at: float | None = None
+    chunks: list[ChunkEntry] = field(default_factory=list, repr=False)
+    done: set[str] = field(default_factory=set, repr=False)
+
+    def meta(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "engine": self.engine,
+            "voice": self.voice,
+            "speed": self.speed,
+            "preprocess": self.preprocess,
+            "created_at": self.created_at,
+            "status": self.status,
+            "revision": self.revision,
+            "ext": self.ext,
+            "error": self.error,
+            "finished_at": self.finished_at,
+        }
+
+    @property
+    def completed_chunks(self) -> int:
+        return sum(1 for c in self.chunks if c.key in self.done)
+
+    @property
+    def ready_chunks(self) -> int:
+        """从头开始连续完成的 chunk 数（可直接播放/下载的部分）。"""
+        n = 0
+        for c in self.chunks:
+            if c.key not in self.done:
+                break
+            n += 1
+        return n
+
+    def to_dict(self) -> dict[str, Any]:
+        total = len(self.chunks)
+        completed = self.completed_chunks
+        return {
+            **self.meta(),
+            "total_chunks": total,
+            "completed_chunks": completed,
+            "ready_chunks": self.ready_chunks,
+            "progress": round(completed / total, 4) if total else 1.0,
+        }
+
+
+class RenderJobManager:
+    """长文档异步渲染任务：逐 chunk 合成并落盘，崩溃/重启后从未完成的 chunk 继续。
+
+    - 原文按段落切分，每段独立预处理、分段；manifest 记录每个 chunk 的原文偏移
+    - chunk 音频按内容 key 存为 chunks/<key>.<ext>，文件存在即视为完成（写入是原子的）
+    - 修改原文时重新生成 manifest，内容未变的 chunk 直接复用，只合成变化的部分
+    - 声音克隆 engine：首个 chunk 的参考音频保存为 ref.bin，任务内（含修改后）固定使用
+    - 已完成的前缀可随时下载；follow 模式边渲染边输出
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        pipeline_for: Callable[[str, bool], TTSPipeline],
+        max_running: int = 2,
+        chunk_retries: int = 2,
+    ) -> None:
+        self.root = Path(root_dir)
+        self.pipeline_for = pipeline_for
+        self.chunk_retries = chunk_retries
+        self._running = asyncio.Semaphore(max(1, max_running))
+        self._jobs: dict[str, RenderJob] = {}
+        self._runners: dict[str, asyncio.Task] = {}
+        self._changed: dict[str, asyncio.Condition] = {}
+        self._loaded = False
+
+    # ------------------------------------------------------------------ #
+    # 对外接口
+    # ------------------------------------------------------------------ #
+    async def create(
+        self,
+        text: str,
+        engine: str,
+        voice: str,
+        speed: float = 1.0,
+        preprocess: bool = True,
+    ) -> RenderJob:
+        """创建任务并开始渲染。
+
+        Raises:
+            ValueError: 未知 engine 或文本没有可合成内容
+        """
+        await self.resume()
+        pipeline = self.pipeline_for(engine, preprocess)
+        job = RenderJob(
+            id=f"job_{uuid.uuid4().hex}",
+            engine=engine,
+            voice=voice,
+            speed=speed,
+            preprocess=preprocess,
+            created_at=time.time(),
+            ext=pipeline.output_format or "bin",
+        )
+        job.chunks = self._plan(pipeline, job, text)
+        if not job.chunks:
+            raise ValueError("text has nothing to synthesize")
+        await asyncio.to_thread(self._write_job, job, text)
+        self._jobs[job.id] = job
+        self._start(job)
+        logger.info(f"RenderJobManager: job {job.id} created, {len(job.chunks)} chunks")
+        return job
+
+    async def update_text(self, job_id: str, text: str) -> tuple[RenderJob, int, int] | None:
+        """修改原文：重新分段，复用内容未变的 chunk。
+
+        Returns:
+            (job, 复用的 chunk 数, 需要重新合成的 chunk 数)；任务不存在时返回 None
+        Raises:
+            ValueError: 文本没有可合成内容
+        """
+        job = await self.get(job_id)
+        if job is None:
+            return None
+        chunks = self._plan(self.pipeline_for(job.engine, job.preprocess), job, text)
+        if not chunks:
+            raise ValueError("text has nothing to synthesize")
+        await self._stop(job)
+        job.chunks = chunks
+        job.revision += 1
+        job.error = None
+        job.finished_at = None
+        job.status = QUEUED
+        live = {c.key for c in chunks}
+        orphans = job.done - live
+        job.done &= live
+        await asyncio.to_thread(self._write_job, job, text, orphans)
+        self._start(job)
+        reused = job.completed_chunks
+        return job, reused, len(chunks) - reused
+
+    async def get(self, job_id: str) -> RenderJob | None:
+        await self.resume()
+        return self._jobs.get(job_id)
+
+    async def list_jobs(self) -> list[RenderJob]:
+        await self.resume()
+        return sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+    async def manifest(self, job_id: str) -> list[dict[str, Any]] | None:
+        job = await self.get(job_id)
+        if job is None:
+            return None
+        return [{**asdict(c), "done": c.key in job.done} for c in job.chunks]
+
+    async def cancel(self, job_id: str) -> RenderJob | None:
+        job = await self.get(job_id)
+        if job is not None and job.status in ACTIVE:
+            await self._stop(job)
+            await self._set_status(job, CANCELLED)
+        return job
+
+    async def restart(self, job_id: str) -> RenderJob | None:
+        """失败/取消的任务从未完成的 chunk 继续。"""
+        job = await self.get(job_id)
+        if job is not None and job.status in (FAILED, CANCELLED):
+            job.error = None
+            job.finished_at = None
+            await self._set_status(job, QUEUED)
+            self._start(job)
+        return job
+
+    async def delete(self, job_id: str) -> bool:
+        job = await self.get(job_id)
+        if job is None:
+            return False
+        await self._stop(job)
+        del self._jobs[job_id]
+        self._changed.pop(job_id, None)
+        await asyncio.to_thread(shutil.rmtree, self._dir(job_id), True)
+        return True
+
+    def chunk_path(self, job: RenderJob, index: int) -> Path | None:
+        """已完成 chunk 的音频文件；未完成或越界时返回 None。"""
+        if not 0 <= index < len(job.chunks) or job.chunks[index].key not in job.done:
+            return None
+        return self._chunk_file(job, job.chunks[index].key)
+
+    async def audio(self, job: RenderJob, follow: bool = False) -> AsyncGenerator[bytes | memoryview, None]:
+        """按顺序输出已完成 chunk 拼成的单一连续音频流。
+
+        follow=False 只输出当前已完成的前缀；follow=True 时等待后续 chunk，直到任务结束。
+        数据块为 bytes 或 memoryview（输出阶段的零拷贝切片）。
+        """
+        pipeline = self.pipeline_for(job.engine, job.preprocess)
+        output = pipeline.output_stage()
+        cond = self._condition(job.id)
+        chunks = list(job.chunks)
+        for i, chunk in enumerate(chunks):
+            while chunk.key not in job.done:
+                if not follow or job.status not in ACTIVE:
+                    return
+                async with cond:
+                    await cond.wait()
+            data = await asyncio.to_thread(self._chunk_file(job, chunk.key).read_bytes)
+            if i > 0 and pipeline.silence_between_chunks > 0:
+                silence = output.silence(pipeline.silence_between_chunks)
+                if silence:
+                    yield silence
+            output.begin_chunk()
+            for piece in output.feed(data):
+                yield piece
+            tail = output.end_chunk()
+            if tail:
+                yield tail
+
+    async def resume(self) -> None:
+        """加载磁盘上的任务，未结束的继续渲染（首次调用时进行，幂等）。"""
+        if self._loaded:
+            return
+        self._loaded = True
+        for job in await asyncio.to_thread(self._scan):
+            self._jobs[job.id] = job
+            if job.status in ACTIVE:
+                logger.info(
+                    f"RenderJobManager: resuming {job.id}, "
+                    f"{job.completed_chunks}/{len(job.chunks)} chunks done"
+                )
+                self._start(job)
+
+    async def aclose(self) -> None:
+        """停止所有渲染；已落盘的 chunk 保留，下次启动时继续。"""
+        runners = list(self._runners.values())
+        for task in runners:
+            task.cancel()
+        await asyncio.gather(*runners, return_exceptions=True)
+        self._runners.clear()
+        self._jobs.clear()
+        self._loaded = False
+
+    # ------------------------------------------------------------------ #
+    # 渲染
+    # ------------------------------------------------------------------ #
+    def _plan(self, pipeline: TTSPipeline, job: RenderJob, text: str) -> list[ChunkEntry]:
+        chunks: list[ChunkEntry] = []
+        for start, end in source_segments(text):
+            for chunk_text in pipeline.split_text(text[start:end], job.preprocess):
+                key = ChunkAudioCache.make_key(job.engine, job.voice, job.speed, chunk_text)
+                chunks.append(ChunkEntry(len(chunks), key, chunk_text, start, end))
+        return chunks
+
+    def _start(self, job: RenderJob) -> None:
+        task = asyncio.create_task(self._run(job))
+        self._runners[job.id] = task
+        task.add_done_callback(partial(self._forget, job.id))
+
+    def _forget(self, job_id: str, task: asyncio.Task) -> None:
+        if self._runners.get(job_id) is task:
+            del self._runners[job_id]
+
+    async def _stop(self, job: RenderJob) -> None:
+        task = self._runners.pop(job.id, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self, job: RenderJob) -> None:
+        async with self._running:
+            await self._set_status(job, RUNNING)
+            pipeline = self.pipeline_for(job.engine, job.preprocess)
+            try:
+                ref_audio = await self._ensure_ref(job, pipeline)
+                # 相同内容的 chunk 共用一个 key：每个 key 只派给一个 worker，其余位置随之完成
+                todo: dict[str, ChunkEntry] = {}
+                for chunk in job.chunks:
+                    if chunk.key not in job.done:
+                        todo.setdefault(chunk.key, chunk)
+                pending = iter(todo.values())
+
+                async def worker() -> None:
+                    for chunk in pending:
+                        await self._render(job, pipeline, chunk, ref_audio)
+
+                # 并发上限取 engine 的前瞻窗口；iterator 共享，按顺序领取
+                workers = [asyncio.create_task(worker()) for _ in range(max(1, pipeline.lookahead))]
+                try:
+                    await asyncio.gather(*workers)
+                finally:
+                    for task in workers:
+                        task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"RenderJobManager: job {job.id} failed: {e}")
+                job.error = str(e)
+                await self._set_status(job, FAILED)
+                return
+            await self._set_status(job, COMPLETED)
+            logger.info(f"RenderJobManager: job {job.id} completed, {len(job.chunks)} chunks")
+
+    async def _ensure_ref(self, job: RenderJob, pipeline: TTSPipeline) -> bytes | None:
+        """声音克隆 engine：首个 chunk 无 ref 合成，截取其音频作为整个任务的 ref。"""
+        if not pipeline.capabilities.voice_cloning:
+            return None
+        ref_path = self._dir(job.id) / "ref.bin"
+        if ref_path.exists():
+            return await asyncio.to_thread(ref_path.read_bytes)
+        first = job.chunks[0]
+        if first.key not in job.done:
+            await self._render(job, pipeline, first, None)
+        audio = await asyncio.to_thread(self._chunk_file(job, first.key).read_bytes)
+        ref_audio = pipeline.extract_ref(audio)
+        await asyncio.to_thread(_write_atomic, ref_path, ref_audio)
+        return ref_audio
+
+    async def _render(
+        self,
+        job: RenderJob,
+        pipeline: TTSPipeline,
+        chunk: ChunkEntry,
+        ref_audio: bytes | None,
+    ) -> None:
+        for attempt in range(self.chunk_retries + 1):
+            try:
+                audio = await pipeline.render_chunk(
+                    chunk.text, voice=job.voice, speed=job.speed, ref_audio=ref_audio,
+                )
+                break
+            except Exception as e:
+                if attempt >= self.chunk_retries:
+                    raise RuntimeError(f"chunk {chunk.index} failed: {e}") from e
+                logger.warning(f"RenderJobManager: {job.id} chunk {chunk.index} attempt {attempt + 1} failed: {e}")
+                await asyncio.sleep(attempt + 1)
+        await asyncio.to_thread(_write_atomic, self._chunk_file(job, chunk.key), audio)
+        job.done.add(chunk.key)
+        await self._notify(job)
+
+    async def _set_status(self, job: RenderJob, status: str) -> None:
+        job.status = status
+        if status in (COMPLETED, FAILED, CANCELLED):
+            job.finished_at = time.time()
+        await asyncio.to_thread(self._write_meta, job)
+        await self._notify(job)
+
+    def _condition(self, job_id: str) -> asyncio.Condition:
+        cond = self._changed.get(job_id)
+        if cond is None:
+            cond = self._changed[job_id] = asyncio.Condition()
+        return cond
+
+    async def _notify(self, job: RenderJob) -> None:
+        cond = self._condition(job.id)
+        async with cond:
+            cond.notify_all()
+
+    # ------------------------------------------------------------------ #
+    # 存储（在线程中执行）
+    # job.json 元信息 / source.md 原文 / manifest.json chunk 列表 / chunks/ 音频 / ref.bin
+    # ------------------------------------------------------------------ #
+    def _dir(self, job_id: str) -> Path:
+        return self.root / job_id
+
+    def _chunk_file(self, job: RenderJob, key: str) -> Path:
+        return self._dir(job.id) / "chunks" / f"{key}.{job.ext}"
+
+    def _write_job(self, job: RenderJob, text: str, orphans: set[str] = frozenset()) -> None:
+        path = self._dir(job.id)
+        (path / "chunks").mkdir(parents=True, exist_ok=True)
+        _write_atomic(path / "source.md", text.encode("utf-8"))
+        manifest = json.dumps([asdict(c) for c in job.chunks], ensure_ascii=False)
+        _write_atomic(path / "manifest.json", manifest.encode("utf-8"))
+        self._write_meta(job)
+        for key in orphans:
+            self._chunk_file(job, key).unlink(missing_ok=True)
+
+    def _write_meta(self, job: RenderJob) -> None:
+        _write_atomic(self._dir(job.id) / "job.json", json.dumps(job.meta(), ensure_ascii=False).encode("utf-8"))
+
+    def _scan(self) -> list[RenderJob]:
+        jobs: list[RenderJob] = []
+        if not self.root.exists():
+            return jobs
+        for meta_path in self.root.glob("*/job.json"):
+            path = meta_path.parent
+            try:
+                job = RenderJob(**json.loads(meta_path.read_text(encoding="utf-8")))
+                manifest = json.loads((path / "manifest.json").read_text(encoding="utf-8"))
+                job.chunks = [ChunkEntry(**entry) for entry in manifest]
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning(f"RenderJobManager: skipping {path.name}: {e}")
+                continue
+            job.done = {p.stem for p in (path / "chunks").glob(f"*.{job.ext}")}
+            jobs.append(job)
+        return jobs
+
+
+# 临时文件名序号：同一文件的并发写入各用各的临时文件
+_tmp_seq = itertools.count()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{next(_tmp_seq)}.tmp")
+    try:
+        tmp.write_bytes(data)
+        tmp.replace(path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+import logging
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, AsyncIterator, Callable
+
+from app.services.errors import is_upstream_failure
+
+logger = logging.getLogger(__name__)
+
+OpenStream = Callable[[str, str], AsyncIterator[Any]]
+
+
+class CircuitBreaker:
+    """连续失败熔断：failure_threshold 次连续失败后打开，cooldown 秒后半开放行一个探测请求。
+
+    探测成功则关闭，失败则重新打开并再等 cooldown。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self._clock = clock
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.failures = 0
+        self.opens = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.cooldown:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def available(self) -> bool:
+        """当前是否放行请求；半开状态只放行一个探测请求（无副作用，实际发出时调用 acquire）。"""
+        state = self.state
+        return state == self.CLOSED or (state == self.HALF_OPEN and not self._probing)
+
+    def acquire(self) -> None:
+        """请求即将发往该 engine：半开状态下占用探测名额。"""
+        if self.state == self.HALF_OPEN:
+            self._probing = True
+
+    def record_success(self) -> None:
+        if self._state != self.CLOSED:
+            logger.info("CircuitBreaker: closed")
+        self._state = self.CLOSED
+        self._probing = False
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self._state == self.HALF_OPEN or (
+            self._state == self.CLOSED and self.failures >= self.failure_threshold
+        ):
+            self._state = self.OPEN
+            self._opened_at = self._clock()
+            self.opens += 1
+
+    def release(self) -> None:
+        """探测请求未产生结果就结束（如客户端断开）：允许下一个请求探测。"""
+        self._probing = False
+
+
+class EngineHealth:
+    """单个 engine 最近 window 次请求的首包延迟与成败，以及熔断器。"""
+
+    def __init__(self, window: int, breaker: CircuitBreaker) -> None:
+        self.breaker = breaker
+        self.ttfb: deque[float] = deque(maxlen=window)
+        self.outcomes: deque[bool] = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def latency(self) -> float | None:
+        """最近成功请求首包延迟的中位数（一次性的慢请求不会拖偏）。"""
+        return statistics.median(self.ttfb) if self.ttfb else None
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def add_success(self, ttfb: float | None) -> None:
+        self.requests += 1
+        if ttfb is not None:
+            self.ttfb.append(ttfb)
+        self.outcomes.append(True)
+        self.breaker.record_success()
+
+    def add_failure(self) -> None:
+        self.requests += 1
+        self.errors += 1
+        self.outcomes.append(False)
+        self.breaker.record_failure()
+
+
+@dataclass(frozen=True)
+class Route:
+    """一次路由决策：实际使用的 engine / voice，reason 说明为何选它。
+
+    reason: primary（请求的 engine）/ probe（超 SLO 时的探测请求）/
+    circuit_open / over_slo（主 engine 不健康，改走 fallback）/ failover（上一候选首包前失败）/
+    last_resort（全部候选不健康时仍尝试不健康的 engine）
+    """
+
+    engine: str
+    voice: str
+    requested: str
+    reason: str
+
+
+class EngineRouter:
+    """engine 路由：按滚动首包延迟与错误率判断健康度，不健康时切到 fallback engine。
+
+    - 每个 engine 一个熔断器，连续失败打开；打开期间请求走 fallbacks[engine]（可链式）
+    - 配置了延迟 SLO 的 engine，最近中位首包延迟超过 SLO 时同样走 fallback，
+      每 probe_every 个请求放行一个到主 engine 探测是否恢复
+    - 首包前失败的请求自动换下一个候选重试（open()）；已开始输出后失败只记录，不切换
+    - 只有 is_failure(exc) 为真的错误（超时、连接错误、上游 5xx）计入健康度并触发切换；
+      请求本身的问题（未知 voice、参数错误、engine 未配置）原样抛给调用方
+    - fallback 的 voice 由 fallback_voices[目标 engine] 映射（"*" 为默认），
+      没有可用映射的 fallback 会被跳过
+    """
+
+    def __init__(
+        self,
+        fallbacks: dict[str, str] | None = None,
+        fallback_voices: dict[str, dict[str, str]] | None = None,
+        latency_slo: dict[str, float] | None = None,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        window: int = 20,
+        min_samples: int = 5,
+        probe_every: int = 10,
+        clock: Callable[[], float] = time.monotonic,
+        is_failure: Callable[[BaseException], bool] = is_upstream_failure,
+    ) -> None:
+        self.fallbacks = dict(fallbacks or {})
+        self.fallback_voices = {k: dict(v) for k, v in (fallback_voices or {}).items()}
+        self.latency_slo = dict(latency_slo or {})
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.window = window
+        self.min_samples = min_samples
+        self.probe_every = max(1, probe_every)
+        self._clock = clock
+        self.is_failure = is_failure
+        self._health: dict[str, EngineHealth] = {}
+        self._slow_requests: dict[str, int] = {}
+        # (请求的 engine, 实际 engine, reason) → 次数
+        self.decisions: dict[tuple[str, str, str], int] = {}
+
+    def health(self, engine: str) -> EngineHealth:
+        health = self._health.get(engine)
+        if health is None:
+            breaker = CircuitBreaker(self.failure_threshold, self.cooldown, self._clock)
+            health = self._health[engine] = EngineHealth(self.window, breaker)
+        return health
+
+    def over_slo(self, engine: str) -> bool:
+        slo = self.latency_slo.get(engine)
+        health = self._health.get(engine)
+        if not slo or health is None or len(health.ttfb) < self.min_samples:
+            return False
+        return health.latency > slo
+
+    def plan(self, engine: str, voice: str) -> list[Route]:
+        """按优先级排列的候选路由：健康的在前，不健康的放最后作兜底。"""
+        healthy: list[Route] = []
+        unhealthy: list[Route] = []
+        target, target_voice, seen = engine, voice, set()
+        while target is not None and target not in seen:
+            seen.add(target)
+            fallback = target != engine
+            reason = self._check(target, fallback)
+            route = Route(target, target_voice, engine, reason)
+            if reason in ("circuit_open", "over_slo"):
+                unhealthy.append(route)
+            else:
+                healthy.append(route)
+            target = self.fallbacks.get(target)
+            if target is not None:
+                target_voice = self._map_voice(target, voice)
+                if target_voice is None:
+                    break
+        if not healthy:
+            return [Route(r.engine, r.voice, engine, "last_resort") for r in unhealthy]
+        # 首个健康候选是 fallback 时，reason 记录主 engine 为何被跳过
+        first = healthy[0]
+        if first.engine != engine and unhealthy and unhealthy[0].engine == engine:
+            healthy[0] = Route(first.engine, first.voice, engine, unhealthy[0].reason)
+        return healthy + [Route(r.engine, r.voice, engine, "last_resort") for r in unhealthy]
+
+    def route(self, engine: str, voice: str) -> Route:
+        """选一条路由并计数（不做首包前失败重试的调用方用，之后用 track() 包装数据流）。"""
+        route = self.plan(engine, voice)[0]
+        self.health(route.engine).breaker.acquire()
+        self._count(route)
+        return route
+
+    async def open(
+        self,
+        engine: str,
+        voice: str,
+        open_stream: OpenStream,
+        fallback: bool = True,
+        engine_ttfb: Callable[[], float | None] | None = None,
+    ) -> tuple[Route, AsyncIterator[Any]]:
+        """按候选顺序打开流，等到首个数据再返回；首包前失败换下一个候选。
+
+        open_stream(engine, voice) 返回该路由的数据流。全部候选失败时抛出最后一个错误。
+        首包延迟计入健康度；返回的流在首包之后出错时计为失败（不再切换 engine）。
+        fallback=False 时只使用请求的 engine（调用方按 engine 做了并发控制时，不能把请求转给别的 engine）。
+        engine_ttfb：首包后调用，返回本次尝试从调用 engine 起算的首包延迟（None 表示未调用 engine，
+        如命中缓存）。数据流在 engine 之前还有 LLM 转写等前置步骤时必须传入，否则按打开流起计时。
+        """
+        routes = self.plan(engine, voice)
+        if not fallback:
+            routes = [route for route in routes if route.engine == engine]
+        last_error: Exception | None = None
+        for i, route in enumerate(routes):
+            if i > 0:
+                route = Route(route.engine, route.voice, engine, "failover")
+            self.health(route.engine).breaker.acquire()
+            t0 = self._clock()
+            stream: AsyncIterator[Any] | None = None
+            try:
+                stream = open_stream(route.engine, route.voice)
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                self._count(route)
+                self.health(route.engine).add_success(self._latency(t0, engine_ttfb))
+                return route, _empty()
+            except Exception as e:
+                await _aclose(stream)
+                if not self.is_failure(e):
+                    # 请求本身的问题：换 engine 也无济于事，不计入健康度
+                    self.health(route.engine).breaker.release()
+                    raise
+                self.health(route.engine).add_failure()
+                logger.warning(f"EngineRouter: {route.engine} failed before first audio ({e})")
+                last_error = e
+                continue
+            except BaseException:
+                self.health(route.engine).breaker.release()
+                await _aclose(stream)
+                raise
+            self._count(route)
+            self.health(route.engine).add_success(self._latency(t0, engine_ttfb))
+            return route, self._follow(route.engine, first, stream)
+        raise last_error if last_error is not None else RuntimeError(f"no route for engine '{engine}'")
+
+    async def track(
+        self,
+        route: Route,
+        stream: AsyncIterator[Any],
+        engine_ttfb: Callable[[], float | None] | None = None,
+    ) -> AsyncGenerator[Any, None]:
+        """包装已选定路由的流：首个数据时记录成功与首包延迟，出错时记录失败。
+
+        engine_ttfb 同 open()；首包时间取决于调用方输入（如增量文本）时必须传入。
+        """
+        t0 = self._clock()
+        health = self.health(route.engine)
+        first = True
+        try:
+            async for item in stream:
+                if first:
+                    health.add_success(self._latency(t0, engine_ttfb))
+                    first = False
+                yield item
+        except Exception as e:
+            if self.is_failure(e):
+                health.add_failure()
+            elif first:
+                health.breaker.release()
+            raise
+        except BaseException:
+            if first:
+                health.breaker.release()
+            raise
+        finally:
+            await _aclose(stream)
+        if first:
+            health.add_success(self._latency(t0, engine_ttfb))
+
+    async def _follow(self, engine: str, first: Any, stream: AsyncIterator[Any]) -> AsyncGenerator[Any, None]:
+        """首包之后的数据：出错计为失败（不再切换 engine）。"""
+        try:
+            yield first
+            async for item in stream:
+                yield item
+        except Exception as e:
+            if self.is_failure(e):
+                self.health(engine).add_failure()
+            raise
+        finally:
+            await _aclose(stream)
+
+    def _latency(self, t0: float, engine_ttfb: Callable[[], float | None] | None) -> float | None:
+        return engine_ttfb() if engine_ttfb is not None else self._clock() - t0
+
+    def _check(self, engine: str, fallback: bool) -> str:
+        if not self.health(engine).breaker.available():
+            return "circuit_open"
+        if self.over_slo(engine):
+            n = self._slow_requests[engine] = self._slow_requests.get(engine, 0) + 1
+            return "over_slo" if n % self.probe_every else "probe"
+        return "fallback" if fallback else "primary"
+
+    def _map_voice(self, engine: str, voice: str) -> str | None:
+        mapping = self.fallback_voices.get(engine, {})
+        return mapping.get(voice) or mapping.get("*")
+
+    def _count(self, route: Route) -> None:
+        key = (route.requested, route.engine, route.reason)
+        self.decisions[key] = self.decisions.get(key, 0) + 1
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """每个 engine 的熔断状态、滚动延迟/错误率与累计计数。"""
+        return {
+            engine: {
+                "state": health.breaker.state,
+                "latency": health.latency,
+                "latency_slo": self.latency_slo.get(engine),
+                "error_rate": health.error_rate,
+                "samples": len(health.outcomes),
+                "requests": health.requests,
+                "errors": health.errors,
+                "breaker_opens": health.breaker.opens,
+            }
+            for engine, health in self._health.items()
+        }
+
+
+async def _aclose(stream) -> None:
+    aclose = getattr(stream, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+async def _empty() -> AsyncGenerator[Any, None]:
+    return
+    yield
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, AsyncIterable
+
+
+@dataclass
+class PipelineTimings:
+    """单次请求的分阶段耗时（秒，相对 started）。
+
+    由 TTSPipeline 填写，API 层据此生成 Server-Timing 头并写入 /metrics 直方图。
+    这里只做 perf_counter 打点，不依赖指标系统；不传 timings 时 pipeline 不做任何打点。
+    """
+
+    started: float = field(default_factory=time.perf_counter)
+    # 文本阶段累计耗时：llm / preprocess / polyphone / chunk（流式时同一阶段会多次发生）
+    stages: dict[str, float] = field(default_factory=dict)
+    # chunk 序号 → engine 首字节耗时 / 合成总耗时（缓存命中的 chunk 不计）
+    chunk_ttfb: dict[int, float] = field(default_factory=dict)
+    chunk_duration: dict[int, float] = field(default_factory=dict)
+    first_audio: float | None = None        # pipeline 产出首个音频数据
+    client_first_byte: float | None = None  # 首个数据交给客户端连接
+    total: float | None = None
+    audio_seconds: float = 0.0
+    # 已分段的 chunk 文本总字数 / 已完整输出的 chunk 字数（断连时估算节省的合成量）
+    chars_total: int = 0
+    chars_done: int = 0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def engine_ttfb(self) -> float | None:
+        """首个 chunk 从调用 engine 到首字节的耗时（不含 LLM 转写与文本处理）；命中缓存时为 None。"""
+        return self.chunk_ttfb.get(0)
+
+    def mark_first_audio(self) -> None:
+        if self.first_audio is None:
+            self.first_audio = self.elapsed()
+
+    @property
+    def rtf(self) -> float | None:
+        """实时率 = 墙钟总耗时 / 音频时长（< 1 表示快于实时）。"""
+        if self.total is None or self.audio_seconds <= 0:
+            return None
+        return self.total / self.audio_seconds
+
+    def server_timing(self) -> str:
+        """Server-Timing 响应头（毫秒），覆盖到目前为止已发生的阶段。"""
+        parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items()]
+        if 0 in self.chunk_ttfb:
+            parts.append(f"engine_ttfb;dur={self.chunk_ttfb[0] * 1000:.1f}")
+        if self.first_audio is not None:
+            parts.append(f"ttfb;dur={self.first_audio * 1000:.1f}")
+        return ", ".join(parts)
+
+
+async def timed_iter(
+    source: AsyncIterable[str],
+    timings: PipelineTimings,
+    stage: str,
+) -> AsyncGenerator[str, None]:
+    """透传异步迭代器，把等待每个元素的时间累加到 stage。"""
+    iterator = source.__aiter__()
+    while True:
+        t0 = time.perf_counter()
+        try:
+            item = await iterator.__anext__()
+        except StopAsyncIteration:
+            return
+        finally:
+            timings.add(stage, time.perf_counter() - t0)
+        yield item
@@ -2,15 +2,24 @@ from __future__ import annotations
 
 import asyncio
 import base64
-import io
 import json
 import logging
-import struct
+import statistics
+import time
 import uuid
-from enum import IntEnum
-from typing import Any, AsyncGenerator
+from collections import deque
+from contextlib import aclosing, asynccontextmanager, nullcontext
+from typing import Any, AsyncGenerator, AsyncIterable, Callable
 
+import httpx
 import websockets
+from websockets.protocol import State
+
+from app.services.admission import AdmissionController
+from app.services.base import EngineCapabilities
+from app.services.errors import UpstreamError
+from app.services.http_clients import HTTPClientPool
+from app.services.volcengine_protocol import EventType, Frame, MsgType, build_frame, parse_frame
 
 logger = logging.getLogger(__name__)
 
@@ -49,20 +58,287 @@ OPENAI_VOICES = [
     {"id": "sage", "name": "Sage (云舟)", "engine": "volcengine", "locale": "zh-CN"},
 ]
 
+# 冷启动（两条路径的实测样本都不够）时的 HTTP / WS 分界
 WS_TEXT_THRESHOLD = 800
+TRANSPORTS = ("auto", "http", "ws")
+
+
+class _PathStats:
+    """单条传输路径最近 window 次合成的延迟：首包延迟、首包后每字耗时，取中位数。
+
+    用中位数而非均值：新建连接、偶发重传等一次性开销不会拖偏估计。
+    """
+
+    def __init__(self, window: int) -> None:
+        self.ttfb: deque[float] = deque(maxlen=window)
+        self.per_char: deque[float] = deque(maxlen=window)
+
+    @property
+    def samples(self) -> int:
+        return len(self.ttfb)
+
+    def add(self, ttfb: float, per_char: float) -> None:
+        self.ttfb.append(ttfb)
+        self.per_char.append(per_char)
+
+    def estimate(self, n_chars: int) -> float:
+        return statistics.median(self.ttfb) + statistics.median(self.per_char) * n_chars
+
+
+class TransportSelector:
+    """按实测延迟在 HTTP 与 WS 之间选择传输路径。
+
+    每次完整合成后记录 (首包延迟, 总耗时, 字数)，按每条路径最近 window 次的中位数
+    估计总耗时 ttfb + per_char × 字数，选更低的路径。
+    样本不足时沿用固定阈值 WS_TEXT_THRESHOLD，并更频繁地探测样本不足的路径；
+    样本充足后每 explore_every 次走一次另一条路径，保证网络变化后估计能跟上。
+    """
+
+    def __init__(
+        self,
+        threshold: int = WS_TEXT_THRESHOLD,
+        window: int = 9,
+        min_samples: int = 3,
+        explore_every: int = 16,
+        cold_explore_every: int = 4,
+    ) -> None:
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.explore_every = explore_every
+        self.cold_explore_every = cold_explore_every
+        self._paths = {"http": _PathStats(window), "ws": _PathStats(window)}
+        self._calls = 0
+
+    def choose(self, n_chars: int) -> str:
+        self._calls += 1
+        http, ws = self._paths["http"], self._paths["ws"]
+        if min(http.samples, ws.samples) < self.min_samples:
+            best = "ws" if n_chars > self.threshold else "http"
+            explore_every = self.cold_explore_every
+        else:
+            best = "ws" if ws.estimate(n_chars) < http.estimate(n_chars) else "http"
+            explore_every = self.explore_every
+        if self._calls % explore_every == 0:
+            return "http" if best == "ws" else "ws"
+        return best
+
+    def record(self, path: str, n_chars: int, ttfb: float, total: float) -> None:
+        per_char = max(0.0, total - ttfb) / max(1, n_chars)
+        self._paths[path].add(ttfb, per_char)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            path: {
+                "samples": st.samples,
+                "estimate_100_chars": round(st.estimate(100), 4) if st.samples else None,
+            }
+            for path, st in self._paths.items()
+        }
+
+
+class _PooledConnection:
+    """池中一条 WS 长连接：StartConnection 握手一次，之后顺序承载多个 session。"""
+
+    def __init__(self, ws) -> None:
+        self.ws = ws
+        self.last_used = time.monotonic()
+        self.sessions = 0
+        self.reusable = False  # 本次 session 正常结束（SessionFinished）后置 True
+
+    @property
+    def open(self) -> bool:
+        return self.ws.state is State.OPEN
+
+
+class VolcengineWSPool:
+    """Volcengine 双向 WS 连接池。
+
+    - 每条连接一次只跑一个 session，session 结束后放回池中复用，省去每个 chunk 的
+      建连 + StartConnection/ConnectionStarted 往返
+    - 取出空闲超过 ping_interval 的连接前先 ping，失败则丢弃重连
+    - 后台 reaper 关闭空闲超过 idle_timeout 的连接
+    - session 中途出错或被取消（客户端断开）的连接状态未知，直接关闭不复用
+    """
+
+    def __init__(
+        self,
+        url: str,
+        headers: Callable[[], dict[str, str]],
+        max_size: int = 4,
+        idle_timeout: float = 60.0,
+        ping_interval: float = 15.0,
+    ) -> None:
+        self.url = url
+        self.headers = headers
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self._slots = asyncio.Semaphore(self.max_size)
+        self._idle: list[_PooledConnection] = []
+        self._reaper: asyncio.Task | None = None
+        self._stats = {"connects": 0, "reuses": 0, "discarded": 0, "reaped": 0}
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncGenerator[_PooledConnection, None]:
+        """借出一条连接；退出时按 conn.reusable 放回池中或关闭。"""
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap())
+        async with self._slots:
+            conn = await self._checkout()
+            conn.reusable = False
+            try:
+                yield conn
+            finally:
+                conn.last_used = time.monotonic()
+                if conn.reusable and conn.open:
+                    self._idle.append(conn)
+                else:
+                    self._stats["discarded"] += 1
+                    await self._close(conn)
+
+    async def _checkout(self) -> _PooledConnection:
+        while self._idle:
+            conn = self._idle.pop()  # LIFO：最近用过的连接最可能仍然健康
+            idle = time.monotonic() - conn.last_used
+            if not conn.open or idle > self.idle_timeout:
+                self._stats["discarded"] += 1
+                await self._close(conn)
+                continue
+            if idle > self.ping_interval:
+                try:
+                    await asyncio.wait_for(await conn.ws.ping(), timeout=5)
+                except Exception:
+                    self._stats["discarded"] += 1
+                    await self._close(conn)
+                    continue
+            self._stats["reuses"] += 1
+            return conn
+        return await self._connect()
+
+    async def _connect(self) -> _PooledConnection:
+        ws = await websockets.connect(
+            self.url, additional_headers=self.headers(), max_size=10 * 1024 * 1024, close_timeout=2,
+        )
+        try:
+            await ws.send(build_frame(EventType.StartConnection, payload=b"{}"))
+            while True:
+                frame = parse_frame(await ws.recv())
+                if frame.msg_type == MsgType.FullServerResponse and frame.event == EventType.ConnectionStarted:
+                    break
+                if frame.msg_type == MsgType.Error or (
+                    frame.msg_type == MsgType.FullServerResponse and frame.event == EventType.ConnectionFailed
+                ):
+                    raise UpstreamError(
+                        f"volcengine WS connection failed: {_error_text(frame)}", _frame_status(frame)
+                    )
+        except BaseException:
+            await ws.close()
+            raise
+        self._stats["connects"] += 1
+        return _PooledConnection(ws)
+
+    async def _close(self, conn: _PooledConnection) -> None:
+        try:
+            if conn.open and conn.reusable:
+                await conn.ws.send(build_frame(EventType.FinishConnection, payload=b"{}"))
+                await asyncio.wait_for(conn.ws.recv(), timeout=1)  # ConnectionFinished
+        except Exception:
+            pass
+        try:
+            await conn.ws.close()
+        except Exception:
+            pass
+
+    async def _reap(self) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 2))
+            try:
+                # 先同步摘掉全部过期连接再逐个关闭：_close 最多等 1 秒，期间 _checkout 可能取走池中连接
+                now = time.monotonic()
+                stale = [c for c in self._idle if now - c.last_used > self.idle_timeout or not c.open]
+                self._idle = [c for c in self._idle if c not in stale]
+                self._stats["reaped"] += len(stale)
+                for conn in stale:
+                    await self._close(conn)
+            except Exception as e:
+                logger.warning(f"VolcengineWSPool: reaper error ({e})")
+
+    def stats(self) -> dict[str, Any]:
+        return {**self._stats, "idle": len(self._idle), "max_size": self.max_size}
+
+    async def aclose(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await self._close(conn)
 
 
 class VolcengineTTSEngine:
     """Volcengine (ByteDance) Seed-TTS engine。
 
-    通过 generate_chunk 实现 TTSEngine Protocol。
+    通过 generate_chunk / generate_chunk_stream 实现 TTSEngine Protocol。
     ref_audio 参数被忽略。
+    实例跨请求共享：HTTP 接口走共享的 HTTPClientPool（未传入 http 时使用自有的池），
+    WS 接口走长连接池，aclose() 时关闭自有的部分。transport="auto" 时按实测延迟选择 HTTP / WS（见 TransportSelector）。
+    传入 admission 时每次上游请求 / session 先在准入控制器排队，保持在账号的 QPS 与并发配额之内。
     """
 
-    def __init__(self, api_key: str = "", app_id: str = "", access_token: str = ""):
+    capabilities = EngineCapabilities(
+        native_format="mp3",
+        output_formats=("mp3", "pcm"),  # pcm: 24kHz 16bit 单声道
+        sample_rate=SAMPLE_RATE,
+        streaming=True,
+        session_streaming=True,
+        recommended_concurrency=4,
+    )
+
+    def __init__(
+        self,
+        api_key: str = "",
+        app_id: str = "",
+        access_token: str = "",
+        transport: str = "auto",
+        ws_pool_size: int = 4,
+        ws_idle_timeout: float = 60.0,
+        http_url: str = HTTP_ENDPOINT,
+        ws_url: str = WS_ENDPOINT,
+        http: HTTPClientPool | None = None,
+        timeout: float = 300.0,
+        admission: AdmissionController | None = None,
+    ):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown volcengine transport: {transport}. Available: {list(TRANSPORTS)}")
         self.api_key = api_key
         self.app_id = app_id
         self.access_token = access_token
+        self.transport = transport
+        self.http_url = http_url
+        self.timeout = timeout
+        self._owns_http = http is None
+        self.http = http or HTTPClientPool()
+        self._ws_pool = VolcengineWSPool(
+            ws_url, self._ws_headers, max_size=ws_pool_size, idle_timeout=ws_idle_timeout,
+        )
+        self.selector = TransportSelector()
+        self.admission = admission
+
+    def _admit(self):
+        """占用一个上游配额名额（未配置准入时不限制）。"""
+        return self.admission.slot() if self.admission is not None else nullcontext()
+
+    def _http(self) -> httpx.AsyncClient:
+        return self.http.client(self.http_url)
+
+    async def aclose(self) -> None:
+        if self._owns_http:
+            await self.http.aclose()
+        await self._ws_pool.aclose()
+
+    def stats(self) -> dict[str, Any]:
+        """WS 连接池与传输路径延迟估计。"""
+        return {"ws_pool": self._ws_pool.stats(), "transport": self.selector.snapshot()}
 
     @staticmethod
     def resolve_voice(voice: str) -> str:
@@ -80,30 +356,52 @@ class VolcengineTTSEngine:
         ref_audio: bytes | None = None,
         audio_format: str = "mp3",
     ) -> bytes:
-        voice_id = self.resolve_voice(voice)
-        chunks: list[bytes] = []
-        async for chunk in self.generate_stream(text, voice_id, speed, audio_format):
-            chunks.append(chunk)
+        chunks = [
+            data async for data in self.generate_chunk_stream(
+                text, voice, speed, audio_format=audio_format,
+            )
+        ]
         return b"".join(chunks)
 
+    async def generate_chunk_stream(
+        self,
+        text: str,
+        voice: str = "alloy",
+        speed: float = 1.0,
+        ref_audio: bytes | None = None,
+        audio_format: str = "mp3",
+    ) -> AsyncGenerator[bytes | memoryview, None]:
+        """流式合成：HTTP NDJSON 每行 / WS 每条 AudioOnlyServer 消息解码后立即 yield。"""
+        voice_id = self.resolve_voice(voice)
+        async with aclosing(self.generate_stream(text, voice_id, speed, audio_format)) as chunks:
+            async for data in chunks:
+                yield data
+
     async def generate_stream(
         self,
         text: str,
         voice: str,
         speed: float = 1.0,
         audio_format: str = "mp3",
-    ) -> AsyncGenerator[bytes, None]:
-        if len(text) <= WS_TEXT_THRESHOLD:
-            async for chunk in self._http_stream(text, voice, speed, audio_format):
-                yield chunk
-        else:
-            async for chunk in self._ws_stream(text, voice, speed, audio_format):
-                yield chunk
+    ) -> AsyncGenerator[bytes | memoryview, None]:
+        path = self.selector.choose(len(text)) if self.transport == "auto" else self.transport
+        stream = self._ws_stream if path == "ws" else self._http_stream
+        async with self._admit():
+            # 排队时间不计入路径延迟
+            t0 = time.perf_counter()
+            ttfb = None
+            async with aclosing(stream(text, voice, speed, audio_format)) as chunks:
+                async for chunk in chunks:
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - t0
+                    yield chunk
+        # 只记录完整跑完的合成（中途被取消的耗时不代表路径延迟）
+        if ttfb is not None:
+            self.selector.record(path, len(text), ttfb, time.perf_counter() - t0)
 
     async def _http_stream(
         self, text: str, voice: str, speed: float = 1.0, audio_format: str = "mp3",
     ) -> AsyncGenerator[bytes, None]:
-        import aiohttp
         volc_format = FORMAT_MAP.get(audio_format, "mp3")
         speech_rate = max(-50, min(100, int((speed - 1.0) * 100)))
 
@@ -134,33 +432,29 @@ class VolcengineTTSEngine:
             },
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(HTTP_ENDPOINT, headers=headers, json=body) as resp:
-                if resp.status != 200:
-                    err_body = await resp.text()
-                    raise RuntimeError(f"volcengine HTTP {resp.status}: {err_body[:500]}")
-                async for line in resp.content:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        chunk = json.loads(line)
-                    except json.JSONDecodeError:
-                        continue
-                    if chunk.get("data"):
-                        yield base64.b64decode(chunk["data"])
-                    code = chunk.get("code", 0)
-                    if code == 20000000:
-                        break
-                    elif code in (45000000, 55000000, 45000001):
-                        raise RuntimeError(f"volcengine error {code}: {chunk.get('message', '')}")
-
-    async def _ws_stream(
-        self, text: str, voice: str, speed: float = 1.0, audio_format: str = "mp3",
-    ) -> AsyncGenerator[bytes, None]:
-        volc_format = FORMAT_MAP.get(audio_format, "mp3")
-        speech_rate = max(-50, min(100, int((speed - 1.0) * 100)))
-
+        async with self._http().stream(
+            "POST", self.http_url, headers=headers, json=body, timeout=self.timeout,
+        ) as resp:
+            if resp.status_code != 200:
+                err_body = (await resp.aread()).decode("utf-8", "ignore")
+                raise UpstreamError(f"volcengine HTTP {resp.status_code}: {err_body[:500]}", resp.status_code)
+            async for line in resp.aiter_lines():
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if chunk.get("data"):
+                    yield base64.b64decode(chunk["data"])
+                # code 20000000 为结束标记：继续读到响应结束，提前退出会关闭连接而无法放回连接池
+                code = chunk.get("code", 0)
+                if code in (45000000, 55000000, 45000001):
+                    raise UpstreamError(f"volcengine error {code}: {chunk.get('message', '')}", _code_status(code))
+
+    def _ws_headers(self) -> dict[str, str]:
+        """WS 建连请求头（每条连接一个 Connect-Id）。"""
         headers = {
             "X-Api-Resource-Id": RESOURCE_ID,
             "X-Api-Request-Id": str(uuid.uuid4()),
@@ -173,128 +467,186 @@ class VolcengineTTSEngine:
                 "X-Api-Access-Key": self.access_token,
                 "X-Api-Connect-Id": str(uuid.uuid4()),
             })
+        return headers
 
-        ws = await websockets.connect(WS_ENDPOINT, additional_headers=headers, max_size=10 * 1024 * 1024)
-        try:
-            await ws.send(_build_frame(EventType.StartConnection, payload=b"{}"))
-            while True:
-                d = await ws.recv()
-                mt, ev, pl = _parse(d)
-                if mt == MsgType.FullServerResponse and ev == EventType.ConnectionStarted:
-                    break
-                if mt == MsgType.Error or (mt == MsgType.FullServerResponse and ev == EventType.ConnectionFailed):
-                    raise RuntimeError(f"volcengine WS connection failed: {pl.decode('utf-8', 'ignore')}")
-
-            session_id = str(uuid.uuid4())
-            req_params = {
-                "speaker": voice,
-                "audio_params": {"format": volc_format, "sample_rate": SAMPLE_RATE, "speech_rate": speech_rate},
-                "additions": json.dumps({"disable_markdown_filter": True, "latex_parser": "v2"}),
-            }
-            session_req = {
-                "user": {"uid": str(uuid.uuid4())},
-                "namespace": "BidirectionalTTS",
-                "event": EventType.StartSession,
-                "req_params": req_params,
-            }
-            await ws.send(_build_frame(EventType.StartSession, session_id, json.dumps(session_req).encode()))
-            while True:
-                d = await ws.recv()
-                mt, ev, pl = _parse(d)
-                if mt == MsgType.FullServerResponse and ev == EventType.SessionStarted:
-                    break
-                if mt == MsgType.Error or (mt == MsgType.FullServerResponse and ev == EventType.SessionFailed):
-                    raise RuntimeError(f"volcengine WS session failed: {pl.decode('utf-8', 'ignore')}")
-
-            async def send_all():
-                task_req = {
-                    "user": {"uid": str(uuid.uuid4())},
-                    "namespace": "BidirectionalTTS",
-                    "event": EventType.TaskRequest,
-                    "req_params": {**req_params, "text": text},
-                }
-                await ws.send(_build_frame(EventType.TaskRequest, session_id, json.dumps(task_req).encode()))
-                await ws.send(_build_frame(EventType.FinishSession, session_id, b"{}"))
-
-            send_task = asyncio.create_task(send_all())
-            while True:
-                d = await ws.recv()
-                mt, ev, pl = _parse(d)
-                if mt == MsgType.AudioOnlyServer:
-                    if pl:
-                        yield pl
-                elif mt == MsgType.FullServerResponse and ev == EventType.SessionFinished:
-                    break
-                elif mt == MsgType.Error:
-                    raise RuntimeError(f"volcengine WS tts error: {pl.decode('utf-8', 'ignore')}")
-            await send_task
-        finally:
-            await ws.send(_build_frame(EventType.FinishConnection, payload=b"{}"))
+    async def _ws_stream(
+        self, text: str, voice: str, speed: float = 1.0, audio_format: str = "mp3",
+    ) -> AsyncGenerator[bytes | memoryview, None]:
+        # 池中连接可能已被服务端静默关闭：尚未输出音频时换一条新连接重试一次
+        for attempt in range(2):
+            yielded = False
             try:
-                await asyncio.wait_for(ws.recv(), timeout=3)
-            except Exception:
-                pass
-            await ws.close()
+                async with self._ws_pool.connection() as conn:
+                    async with aclosing(self._ws_session(conn, text, voice, speed, audio_format)) as chunks:
+                        async for chunk in chunks:
+                            yielded = True
+                            yield chunk
+                return
+            except (websockets.ConnectionClosed, OSError) as e:
+                if yielded or attempt:
+                    raise
+                logger.warning(f"VolcengineTTSEngine: WS connection lost ({e}), reconnecting")
+
+    async def generate_session_stream(
+        self,
+        texts: AsyncIterable[str],
+        voice: str = "alloy",
+        speed: float = 1.0,
+        audio_format: str = "mp3",
+    ) -> AsyncGenerator[bytes | memoryview, None]:
+        """整个请求共用一个双向 session：texts 每到一段就发一个 TaskRequest，同时接收音频。
+
+        省去逐 chunk 的 StartSession/FinishSession 往返，服务端可在 session 内流水线合成。
+        输出为单一连续音频流（服务端按句衔接，不插入段间静音）。texts 结束后发送
+        FinishSession，收到 SessionFinished 时结束；texts 出错时中止 session 并抛出该错误。
+        """
+        voice_id = self.resolve_voice(voice)
+        # 整个 session 占用一个并发名额
+        async with self._admit():
+            for attempt in range(2):
+                async with self._ws_pool.connection() as conn:
+                    try:
+                        session_id, req_params = await self._start_session(conn, voice_id, speed, audio_format)
+                    except (websockets.ConnectionClosed, OSError) as e:
+                        # 尚未消费 texts：池中连接失效时换新连接重试一次
+                        if attempt:
+                            raise
+                        logger.warning(f"VolcengineTTSEngine: WS connection lost ({e}), reconnecting")
+                        continue
+
+                    async def send_texts() -> None:
+                        try:
+                            async for text in texts:
+                                if text.strip():
+                                    await self._send_task(conn.ws, session_id, req_params, text)
+                            await conn.ws.send(build_frame(EventType.FinishSession, session_id, b"{}"))
+                        except Exception:
+                            # 文本来源出错：关闭连接让接收端退出。被取消时不关闭：
+                            # 接收端已结束，连接是否复用由 conn.reusable 决定
+                            await conn.ws.close()
+                            raise
+
+                    sender = asyncio.create_task(send_texts())
+                    try:
+                        async with aclosing(self._session_audio(conn)) as chunks:
+                            async for data in chunks:
+                                yield data
+                    except websockets.ConnectionClosed:
+                        # 连接可能是发送端出错时主动关闭的：此时抛出发送端的原始错误
+                        await asyncio.wait([sender], timeout=1.0)
+                        if sender.done() and not sender.cancelled() and sender.exception() is not None:
+                            raise sender.exception() from None
+                        raise
+                    finally:
+                        if not sender.done():
+                            sender.cancel()
+                        await asyncio.gather(sender, return_exceptions=True)
+                    # 服务端先结束 session 时发送端已被取消：只在发送端自身出错时抛出
+                    if not sender.cancelled() and sender.exception() is not None:
+                        raise sender.exception()
+                    return
+
+    async def _ws_session(
+        self,
+        conn: _PooledConnection,
+        text: str,
+        voice: str,
+        speed: float = 1.0,
+        audio_format: str = "mp3",
+    ) -> AsyncGenerator[bytes | memoryview, None]:
+        """在已建立的连接上跑一个 StartSession → TaskRequest → FinishSession 周期。"""
+        session_id, req_params = await self._start_session(conn, voice, speed, audio_format)
+        await self._send_task(conn.ws, session_id, req_params, text)
+        await conn.ws.send(build_frame(EventType.FinishSession, session_id, b"{}"))
+        async with aclosing(self._session_audio(conn)) as chunks:
+            async for data in chunks:
+                yield data
+
+    async def _start_session(
+        self,
+        conn: _PooledConnection,
+        voice: str,
+        speed: float,
+        audio_format: str,
+    ) -> tuple[str, dict[str, Any]]:
+        """StartSession 并等待 SessionStarted，返回 (session_id, req_params)。"""
+        ws = conn.ws
+        volc_format = FORMAT_MAP.get(audio_format, "mp3")
+        speech_rate = max(-50, min(100, int((speed - 1.0) * 100)))
+
+        session_id = str(uuid.uuid4())
+        req_params = {
+            "speaker": voice,
+            "audio_params": {"format": volc_format, "sample_rate": SAMPLE_RATE, "speech_rate": speech_rate},
+            "additions": json.dumps({"disable_markdown_filter": True, "latex_parser": "v2"}),
+        }
+        session_req = {
+            "user": {"uid": str(uuid.uuid4())},
+            "namespace": "BidirectionalTTS",
+            "event": EventType.StartSession,
+            "req_params": req_params,
+        }
+        await ws.send(build_frame(EventType.StartSession, session_id, json.dumps(session_req).encode()))
+        while True:
+            frame = parse_frame(await ws.recv())
+            if frame.msg_type == MsgType.FullServerResponse and frame.event == EventType.SessionStarted:
+                return session_id, req_params
+            if frame.msg_type == MsgType.FullServerResponse and frame.event == EventType.SessionFailed:
+                conn.reusable = True  # session 级失败，连接本身仍可用
+                raise UpstreamError(f"volcengine WS session failed: {_error_text(frame)}", _frame_status(frame))
+            if frame.msg_type == MsgType.Error:
+                raise UpstreamError(f"volcengine WS session failed: {_error_text(frame)}", _frame_status(frame))
+
+    @staticmethod
+    async def _send_task(ws, session_id: str, req_params: dict[str, Any], text: str) -> None:
+        task_req = {
+            "user": {"uid": str(uuid.uuid4())},
+            "namespace": "BidirectionalTTS",
+            "event": EventType.TaskRequest,
+            "req_params": {**req_params, "text": text},
+        }
+        await ws.send(build_frame(EventType.TaskRequest, session_id, json.dumps(task_req).encode()))
+
+    @staticmethod
+    async def _session_audio(conn: _PooledConnection) -> AsyncGenerator[bytes | memoryview, None]:
+        """接收音频直到 SessionFinished；正常结束后连接可放回池中。
+
+        音频以 memoryview 形式产出（消息内的切片，不复制）。
+        """
+        while True:
+            frame = parse_frame(await conn.ws.recv())
+            if frame.msg_type == MsgType.AudioOnlyServer:
+                if frame.payload:
+                    yield frame.payload
+            elif frame.msg_type == MsgType.FullServerResponse and frame.event == EventType.SessionFinished:
+                break
+            elif frame.msg_type == MsgType.Error:
+                raise UpstreamError(f"volcengine WS tts error: {_error_text(frame)}", _frame_status(frame))
+        conn.sessions += 1
+        conn.reusable = True
 
     async def get_voices(self) -> list[dict[str, Any]]:
         return OPENAI_VOICES
 
 
-class MsgType(IntEnum):
-    FullClientRequest = 0b1
-    FullServerResponse = 0b1001
-    AudioOnlyServer = 0b1011
-    Error = 0b1111
-
-
-class EventType(IntEnum):
-    StartConnection = 1
-    FinishConnection = 2
-    ConnectionStarted = 50
-    ConnectionFailed = 51
-    ConnectionFinished = 52
-    StartSession = 100
-    FinishSession = 102
-    SessionStarted = 150
-    SessionFinished = 152
-    SessionFailed = 153
-    TaskRequest = 200
-
-
-def _build_frame(event, session_id="", payload=b"{}"):
-    buf = io.BytesIO()
-    buf.write(bytes([(1 << 4) | 1, (MsgType.FullClientRequest << 4) | 0b100, (1 << 4) | 0, 0]))
-    buf.write(struct.pack(">i", event))
-    if event not in (EventType.StartConnection, EventType.FinishConnection):
-        sid = session_id.encode("utf-8")
-        buf.write(struct.pack(">I", len(sid)))
-        if sid:
-            buf.write(sid)
-    buf.write(struct.pack(">I", len(payload)))
-    buf.write(payload)
-    return buf.getvalue()
-
-
-def _parse(data):
-    mt = data[1] >> 4
-    flag = data[1] & 0x0F
-    pos = 4
-    event = struct.unpack(">i", data[pos:pos + 4])[0] if flag & 0b100 else 0
-    pos += 4
-    if flag & 0b100 and event not in (1, 2, 50, 51, 52):
-        slen = struct.unpack(">I", data[pos:pos + 4])[0]
-        pos += 4
-        if slen:
-            pos += slen
-    if flag & 0b100 and event in (50, 51, 52):
-        clen = struct.unpack(">I", data[pos:pos + 4])[0]
-        pos += 4
-        if clen:
-            pos += clen
-    payload = b""
-    if pos + 4 <= len(data):
-        plen = struct.unpack(">I", data[pos:pos + 4])[0]
-        pos += 4
-        if plen:
-            payload = data[pos:pos + plen]
-    return mt, event, payload
+def _error_text(frame: Frame) -> str:
+    text = frame.text()
+    return f"[{frame.error_code}] {text}" if frame.error_code is not None else text
+
+
+def _code_status(code: Any) -> int | None:
+    """火山错误码按首位归类：4xxxxxxx 为请求问题（400），5xxxxxxx 为服务端故障（500）。"""
+    if isinstance(code, int) and code >= 10_000_000:
+        return {4: 400, 5: 500}.get(code // 10 ** (len(str(code)) - 1))
+    return None
+
+
+def _frame_status(frame: Frame) -> int | None:
+    """错误帧的归类状态：优先用帧头错误码，其次是 payload 中的 status_code。"""
+    if frame.error_code is not None:
+        return _code_status(frame.error_code)
+    try:
+        payload = json.loads(frame.payload)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return _code_status(payload.get("status_code")) if isinstance(payload, dict) else None
@@ -0,0 +1,210 @@
+"""火山引擎 TTS V3 双向流式（WebSocket）二进制协议编解码。
+
+帧结构（大端）：
+    header (header_size × 4 字节，通常 4)
+      byte0: protocol version (4b) | header size (4b)
+      byte1: message type (4b)     | flags (4b)
+      byte2: serialization (4b)    | compression (4b)
+      byte3: reserved
+    [error code   u32]   仅 Error 帧
+    [sequence     i32]   flags 为 POSITIVE_SEQUENCE / NEGATIVE_SEQUENCE 时
+    [event        i32]   flags 含 WITH_EVENT 时
+    [connect id   u32 长度 + bytes]   ConnectionStarted / ConnectionFailed / ConnectionFinished
+    [session id   u32 长度 + bytes]   其余 session 级事件（StartConnection / FinishConnection 没有 id）
+    payload       u32 长度 + bytes
+
+编码用预编译的 struct.Struct 一次拼出整帧；解码在 memoryview 上进行，
+id 与 payload 都是原消息的切片，不复制数据（音频帧直接转发给输出阶段）。
+"""
+from __future__ import annotations
+
+import struct
+from enum import IntEnum
+from typing import NamedTuple
+
+PROTOCOL_VERSION = 1
+HEADER_WORDS = 1  # header 长度（单位 4 字节）
+
+
+class MsgType(IntEnum):
+    FullClientRequest = 0b1
+    AudioOnlyClient = 0b10
+    FullServerResponse = 0b1001
+    AudioOnlyServer = 0b1011
+    Error = 0b1111
+
+
+class MsgFlags(IntEnum):
+    NO_SEQUENCE = 0b0000
+    POSITIVE_SEQUENCE = 0b0001
+    LAST_NO_SEQUENCE = 0b0010
+    NEGATIVE_SEQUENCE = 0b0011
+    WITH_EVENT = 0b0100
+
+
+class Serialization(IntEnum):
+    RAW = 0
+    JSON = 1
+
+
+class EventType(IntEnum):
+    StartConnection = 1
+    FinishConnection = 2
+    ConnectionStarted = 50
+    ConnectionFailed = 51
+    ConnectionFinished = 52
+    StartSession = 100
+    CancelSession = 101
+    FinishSession = 102
+    SessionStarted = 150
+    SessionCanceled = 151
+    SessionFinished = 152
+    SessionFailed = 153
+    TaskRequest = 200
+    TTSSentenceStart = 350
+    TTSSentenceEnd = 351
+    TTSResponse = 352
+
+
+# 不带任何 id 的事件 / 带 connect id 的事件；其余事件带 session id
+CONNECTION_EVENTS = frozenset(map(int, (EventType.StartConnection, EventType.FinishConnection)))
+CONNECT_ID_EVENTS = frozenset(map(int, (
+    EventType.ConnectionStarted, EventType.ConnectionFailed, EventType.ConnectionFinished,
+)))
+
+_U32 = struct.Struct(">I")
+_I32 = struct.Struct(">i")
+_HEADER = struct.Struct(">BBBB")
+# 客户端请求帧的固定前缀：header + event（+ session id 长度）
+_CLIENT_HEADER = _HEADER.pack(
+    (PROTOCOL_VERSION << 4) | HEADER_WORDS,
+    (MsgType.FullClientRequest << 4) | MsgFlags.WITH_EVENT,
+    (Serialization.JSON << 4) | 0,
+    0,
+)
+_CONNECTION_PREFIX = struct.Struct(">4si")
+_SESSION_PREFIX = struct.Struct(">4siI")
+# 解码热路径：byte0/byte1、事件号 + id 长度一次解包，枚举值转成 int 常量比较
+_HEADER_PREFIX = struct.Struct(">BB")
+_EVENT_ID = struct.Struct(">iI")
+_ERROR = int(MsgType.Error)
+_WITH_EVENT = int(MsgFlags.WITH_EVENT)
+_SEQUENCE_BIT = 0b0001  # POSITIVE_SEQUENCE / NEGATIVE_SEQUENCE 都带序号
+_EMPTY = memoryview(b"")
+
+
+class VolcengineProtocolError(ValueError):
+    """收到的数据不是完整的协议帧。"""
+
+
+class Frame(NamedTuple):
+    """解码后的一帧。session_id / connect_id / payload 是原消息的 memoryview 切片。"""
+
+    msg_type: int
+    flags: int
+    event: int                # 不带事件号时为 0
+    session_id: memoryview | None
+    connect_id: memoryview | None
+    sequence: int | None
+    error_code: int | None
+    payload: memoryview
+
+    def text(self) -> str:
+        """payload 按 UTF-8 解码（错误信息 / JSON 响应用）。"""
+        return str(self.payload, "utf-8", "ignore")
+
+
+# 跳过 NamedTuple.__new__ 的参数处理，解码每帧省一次 Python 层调用
+_new_frame = tuple.__new__
+
+
+def build_frame(event: int, session_id: str = "", payload: bytes = b"{}") -> bytes:
+    """客户端 FullClientRequest 帧（JSON payload）。连接级事件不带 session id。"""
+    if event in CONNECTION_EVENTS:
+        return b"".join((_CONNECTION_PREFIX.pack(_CLIENT_HEADER, event), _U32.pack(len(payload)), payload))
+    sid = session_id.encode("utf-8")
+    return b"".join((
+        _SESSION_PREFIX.pack(_CLIENT_HEADER, event, len(sid)), sid, _U32.pack(len(payload)), payload,
+    ))
+
+
+def encode_frame(
+    msg_type: int,
+    payload: bytes = b"",
+    event: int | None = None,
+    session_id: bytes = b"",
+    connect_id: bytes = b"",
+    sequence: int | None = None,
+    error_code: int | None = None,
+    serialization: int = Serialization.JSON,
+) -> bytes:
+    """通用编码：任意消息类型（含服务端的音频 / 错误帧），供调试与模拟服务端使用。"""
+    flags = MsgFlags.NO_SEQUENCE
+    if sequence is not None:
+        flags = MsgFlags.NEGATIVE_SEQUENCE if sequence < 0 else MsgFlags.POSITIVE_SEQUENCE
+    if event is not None:
+        flags |= MsgFlags.WITH_EVENT
+    parts = [_HEADER.pack(
+        (PROTOCOL_VERSION << 4) | HEADER_WORDS, (msg_type << 4) | flags, serialization << 4, 0,
+    )]
+    if msg_type == MsgType.Error:
+        parts.append(_U32.pack(error_code or 0))
+    if sequence is not None:
+        parts.append(_I32.pack(sequence))
+    if event is not None:
+        parts.append(_I32.pack(event))
+        if event in CONNECT_ID_EVENTS:
+            parts += (_U32.pack(len(connect_id)), connect_id)
+        elif event not in CONNECTION_EVENTS:
+            parts += (_U32.pack(len(session_id)), session_id)
+    parts += (_U32.pack(len(payload)), payload)
+    return b"".join(parts)
+
+
+def parse_frame(data: bytes | bytearray | memoryview) -> Frame:
+    """解码一帧，不复制数据（id / payload 为 memoryview 切片）。
+
+    Raises:
+        VolcengineProtocolError: 数据不足或长度字段越界
+    """
+    size = len(data)
+    try:
+        # 定长字段直接从原缓冲区解包，只有切片时才用 memoryview
+        b0, b1 = _HEADER_PREFIX.unpack_from(data)
+        pos = (b0 & 0x0F) * 4
+        if pos < 4 or pos > size:
+            raise VolcengineProtocolError(f"bad header size {pos} ({size} bytes)")
+        msg_type = b1 >> 4
+        flags = b1 & 0x0F
+        error_code = sequence = session_id = connect_id = None
+        event = 0
+        view = memoryview(data)
+        if msg_type == _ERROR:
+            error_code = _U32.unpack_from(data, pos)[0]
+            pos += 4
+        if flags & _SEQUENCE_BIT:
+            sequence = _I32.unpack_from(data, pos)[0]
+            pos += 4
+        if flags & _WITH_EVENT:
+            event, n = _EVENT_ID.unpack_from(data, pos) if size >= pos + 8 else (_I32.unpack_from(data, pos)[0], 0)
+            if event in CONNECTION_EVENTS:
+                pos += 4
+            else:
+                pos += 8
+                if pos + n > size:
+                    raise VolcengineProtocolError(f"id length {n} exceeds frame ({size} bytes)")
+                if event in CONNECT_ID_EVENTS:
+                    connect_id = view[pos:pos + n]
+                else:
+                    session_id = view[pos:pos + n]
+                pos += n
+        payload = _EMPTY
+        if pos + 4 <= size:
+            n = _U32.unpack_from(data, pos)[0]
+            pos += 4
+            if pos + n > size:
+                raise VolcengineProtocolError(f"payload length {n} exceeds frame ({size} bytes)")
+            payload = view[pos:pos + n]
+    except struct.error as e:
+        raise VolcengineProtocolError(f"truncated frame ({size} bytes): {e}") from None
+    return _new_frame(Frame, (msg_type, flags, event, session_id, connect_id, sequence, error_code, payload))
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import struct
+from functools import lru_cache
+from typing import NamedTuple
+
+# 流式 WAV 头的 data 长度占位（与 qwen3-tts server 一致）
+STREAMING_DATA_SIZE = 0x7FFFFFFF
+
+_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+_CHUNK = struct.Struct("<4sI")
+_FMT = struct.Struct("<HHIIHH")
+
+
+class WavInfo(NamedTuple):
+    """WAV 头解析结果。data 从 header_len 开始，长度 data_size。"""
+
+    header_len: int
+    channels: int
+    sample_width: int
+    sample_rate: int
+    data_size: int
+
+    @property
+    def block_align(self) -> int:
+        return self.channels * self.sample_width
+
+    @property
+    def is_streaming(self) -> bool:
+        """流式头：data 长度未知（0 或占位最大值）。"""
+        return self.data_size == 0 or self.data_size >= STREAMING_DATA_SIZE
+
+
+def wav_header(
+    sample_rate: int,
+    channels: int = 1,
+    sample_width: int = 2,
+    n_frames: int | None = None,
+) -> bytes:
+    """构造 44 字节 PCM WAV 头；n_frames=None 时为流式（长度未知）头。"""
+    block_align = channels * sample_width
+    data_size = STREAMING_DATA_SIZE if n_frames is None else n_frames * block_align
+    return _HEADER.pack(
+        b"RIFF", (36 + data_size) & 0xFFFFFFFF, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, sample_rate * block_align, block_align,
+        sample_width * 8,
+        b"data", data_size & 0xFFFFFFFF,
+    )
+
+
+def parse_wav_header(data) -> WavInfo | None:
+    """解析 WAV 头直到 data 子块，不复制数据（data 可为 bytes / memoryview）。
+
+    Returns:
+        WavInfo；数据不足时返回 None
+    Raises:
+        ValueError: 不是 RIFF/WAVE 数据
+    """
+    if len(data) < 12:
+        return None
+    if data[0:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("not a RIFF/WAVE stream")
+    pos = 12
+    fmt: tuple[int, int, int] | None = None
+    while pos + 8 <= len(data):
+        chunk_id, size = _CHUNK.unpack_from(data, pos)
+        if chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            return WavInfo(pos + 8, *fmt, size)
+        if chunk_id == b"fmt ":
+            if pos + 8 + _FMT.size > len(data):
+                return None
+            _, channels, sample_rate, _, _, bits = _FMT.unpack_from(data, pos + 8)
+            fmt = (channels, bits // 8, sample_rate)
+        pos += 8 + size + (size & 1)
+    return None
+
+
+def trim_wav(wav_bytes: bytes, seconds: float) -> bytes:
+    """截取 WAV 前 N 秒，返回新的完整 WAV。
+
+    头部只解析一次，PCM 通过 memoryview 切片，只在拼接输出时分配一次。
+    流式头（长度未知）按实际可用数据截取。
+
+    Raises:
+        ValueError: 不是完整的 WAV 头
+    """
+    view = memoryview(wav_bytes)
+    info = parse_wav_header(view)
+    if info is None:
+        raise ValueError("incomplete WAV header")
+    available = len(view) - info.header_len
+    if not info.is_streaming:
+        available = min(available, info.data_size)
+    n_frames = min(int(seconds * info.sample_rate), available // info.block_align)
+    end = info.header_len + n_frames * info.block_align
+    header = wav_header(info.sample_rate, info.channels, info.sample_width, n_frames)
+    return b"".join((header, view[info.header_len:end]))
+
+
+@lru_cache(maxsize=64)
+def silence_frames(sample_rate: int, sample_width: int, channels: int, seconds: float) -> bytes:
+    """静音 PCM（全零样本），按 (rate, width, channels, duration) 缓存，重复调用不再分配。"""
+    n_frames = int(seconds * sample_rate)
+    return bytes(n_frames * channels * sample_width)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""组件工厂基准：每请求重建 engine + 文本组件 + pipeline vs ComponentFactory 查找，
+以及每次调用新建 httpx.AsyncClient 的开销（现在每个进程只建一次）。
+
+用法（在 backend 目录下）:
+  python bench/bench_components.py [--engines edge qwen volcengine] [--repeat 2000]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import httpx  # noqa: E402
+
+from app.core.cache import cache_for_engine, ref_cache  # noqa: E402
+from app.core.components import components, engine_kwargs  # noqa: E402
+from app.services.chunker import TextChunker  # noqa: E402
+from app.services.llm_transcriber import LLMTranscriber  # noqa: E402
+from app.services.pipeline import TTSPipeline  # noqa: E402
+from app.services.polyphone import PolyphoneFixer  # noqa: E402
+from app.services.registry import EngineRegistry, register_builtin_engines  # noqa: E402
+from app.services.text_preprocessor import TextPreprocessor  # noqa: E402
+
+
+def per_request_pipeline(engine_name: str) -> TTSPipeline:
+    """改动前每个请求的做法：engine、文本处理组件与 pipeline 全部重新构建。"""
+    engine = EngineRegistry.create(engine_name, **engine_kwargs(engine_name))
+    return TTSPipeline(
+        engine=engine,
+        llm_transcriber=LLMTranscriber(api_url="http://llm.invalid/v1", api_key="k"),
+        preprocessor=TextPreprocessor(),
+        polyphone_fixer=PolyphoneFixer(),
+        chunker=TextChunker(),
+        cache=cache_for_engine(engine_name),
+        engine_name=engine_name,
+        ref_cache=ref_cache,
+    )
+
+
+def per_call_us(fn, repeat: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+async def client_per_call_us(repeat: int) -> float:
+    async def once() -> None:
+        async with httpx.AsyncClient(timeout=60):
+            pass
+
+    await once()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        await once()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", nargs="+", default=["edge", "qwen", "volcengine"])
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--client-repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    register_builtin_engines()
+    for name in args.engines:
+        old = per_call_us(lambda: per_request_pipeline(name), args.repeat)
+        new = per_call_us(lambda: components.pipeline(name), args.repeat * 100)
+        print(f"{name:10s} per-request build {old:7.1f} us   factory lookup {new:5.2f} us")
+    print(f"PolyphoneFixer() alone {per_call_us(PolyphoneFixer, args.repeat):.1f} us")
+    us = asyncio.run(client_per_call_us(args.client_repeat))
+    print(f"httpx.AsyncClient create + close {us / 1000:.1f} ms per call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Edge TTS 首字延迟基准：整段等待（只用 generate_chunk）vs 逐帧流式（generate_chunk_stream）。
+
+本地起一个 aiohttp WebSocket 服务模拟 Edge 合成端点（替换 edge_tts 的 WSS_URL），
+每个请求先等待 --startup 秒，再每 --interval 秒推送一条含 4 个 MP3 帧（96 ms 音频）的消息，
+约 5 倍实时。不访问外网。
+
+用法（在 backend 目录下）:
+  python bench/bench_edge_stream.py [--sentences 6] [--lookahead 3] [--runs 5]
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import edge_tts.communicate  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+from app.services.base import EngineCapabilities  # noqa: E402
+from app.services.chunker import TextChunker  # noqa: E402
+from app.services.edge_engine import EdgeTTSEngine  # noqa: E402
+from app.services.pipeline import TTSPipeline  # noqa: E402
+
+# MPEG-2 Layer III 24kHz 48kbps 单声道，144 字节 = 24 ms
+FRAME = bytes((0xFF, 0xF3, 0x64, 0xC0)) + bytes(140)
+FRAMES_PER_MESSAGE = 4
+AUDIO_HEADER = b"X-RequestId:bench\r\nContent-Type:audio/mpeg\r\nPath:audio\r\n"
+SENTENCE = "这是一段用于测量首字延迟的中文句子，长度大约四十个字符左右，模拟正常的段落内容"
+
+
+class BufferedEdge:
+    """基线：只实现 generate_chunk（改动前的行为），pipeline 等整段音频到齐才输出。"""
+
+    capabilities = EngineCapabilities(native_format="mp3", output_formats=("mp3",))
+
+    def __init__(self) -> None:
+        self.inner = EdgeTTSEngine()
+
+    async def generate_chunk(self, *args, **kwargs) -> bytes:
+        return await self.inner.generate_chunk(*args, **kwargs)
+
+
+def edge_standin(startup: float, interval: float) -> web.Application:
+    async def handler(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for msg in ws:
+            if "Path:ssml" not in msg.data:
+                continue
+            text = msg.data.split("<prosody", 1)[1].split(">", 1)[1].split("</prosody>")[0]
+            audio_ms = len(text) * 250  # 约每秒 4 字
+            await ws.send_str("X-RequestId:bench\r\nPath:turn.start\r\n\r\n{}")
+            await asyncio.sleep(startup)
+            for _ in range(max(1, audio_ms // (24 * FRAMES_PER_MESSAGE))):
+                message = FRAME * FRAMES_PER_MESSAGE
+                await ws.send_bytes(len(AUDIO_HEADER).to_bytes(2, "big") + AUDIO_HEADER + message)
+                await asyncio.sleep(interval)
+            await ws.send_str("X-RequestId:bench\r\nPath:turn.end\r\n\r\n{}")
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    return app
+
+
+async def run_once(engine, text: str, lookahead: int) -> tuple[float, float]:
+    pipeline = TTSPipeline(engine=engine, chunker=TextChunker(), lookahead=lookahead, engine_name="edge")
+    t0 = time.perf_counter()
+    first = None
+    async for _ in pipeline.generate_stream(text, voice="zh-CN-XiaoxiaoNeural", use_preprocess=False):
+        if first is None:
+            first = time.perf_counter() - t0
+    return first, time.perf_counter() - t0
+
+
+async def main(args: argparse.Namespace) -> None:
+    runner = web.AppRunner(edge_standin(args.startup, args.interval))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", args.port)
+    await site.start()
+    edge_tts.communicate.WSS_URL = f"ws://127.0.0.1:{args.port}/?TrustedClientToken=bench"
+    text = "。".join([SENTENCE] * args.sentences) + "。"
+    try:
+        for name, engine in (("buffered", BufferedEdge()), ("streaming", EdgeTTSEngine())):
+            results = [await run_once(engine, text, args.lookahead) for _ in range(args.runs)]
+            ttfb = statistics.median(r[0] for r in results) * 1000
+            total = statistics.median(r[1] for r in results) * 1000
+            print(f"{name:9s}  TTFB {ttfb:6.0f} ms  total {total:6.0f} ms  (median of {args.runs})")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=6)
+    parser.add_argument("--lookahead", type=int, default=3)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--startup", type=float, default=0.15, help="服务端首包前的延迟（秒）")
+    parser.add_argument("--interval", type=float, default=0.02, help="音频消息间隔（秒）")
+    parser.add_argument("--port", type=int, default=8765)
+    logging.disable(logging.CRITICAL)
+    asyncio.run(main(parser.parse_args()))
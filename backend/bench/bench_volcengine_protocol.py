@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""火山引擎 WS 二进制协议编解码微基准：旧的 BytesIO + struct.pack 构帧 / 切片复制解帧
+vs volcengine_protocol 的预编译 struct 构帧与 memoryview 零拷贝解帧。
+
+旧实现原样取自改动前的 volcengine_engine.py（_build_frame / _parse），作为基线。
+
+用法（在 backend 目录下）:
+  python bench/bench_volcengine_protocol.py [--number 200000] [--repeat 5]
+"""
+import argparse
+import io
+import struct
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.services.volcengine_protocol import (  # noqa: E402
+    EventType,
+    MsgType,
+    Serialization,
+    build_frame,
+    encode_frame,
+    parse_frame,
+)
+
+SESSION_ID = "0b7e2c1a-7f0d-4f7e-9a55-1c0d9b7b2f11"
+TASK_PAYLOAD = b'{"event": 200, "req_params": {"text": "\\u4eca\\u5929\\u5929\\u6c14\\u4e0d\\u9519"}}'
+
+
+def old_build_frame(event, session_id="", payload=b"{}"):
+    buf = io.BytesIO()
+    buf.write(bytes([(1 << 4) | 1, (MsgType.FullClientRequest << 4) | 0b100, (1 << 4) | 0, 0]))
+    buf.write(struct.pack(">i", event))
+    if event not in (EventType.StartConnection, EventType.FinishConnection):
+        sid = session_id.encode("utf-8")
+        buf.write(struct.pack(">I", len(sid)))
+        if sid:
+            buf.write(sid)
+    buf.write(struct.pack(">I", len(payload)))
+    buf.write(payload)
+    return buf.getvalue()
+
+
+def old_parse(data):
+    mt = data[1] >> 4
+    flag = data[1] & 0x0F
+    pos = 4
+    event = struct.unpack(">i", data[pos:pos + 4])[0] if flag & 0b100 else 0
+    pos += 4
+    if flag & 0b100 and event not in (1, 2, 50, 51, 52):
+        slen = struct.unpack(">I", data[pos:pos + 4])[0]
+        pos += 4
+        if slen:
+            pos += slen
+    if flag & 0b100 and event in (50, 51, 52):
+        clen = struct.unpack(">I", data[pos:pos + 4])[0]
+        pos += 4
+        if clen:
+            pos += clen
+    payload = b""
+    if pos + 4 <= len(data):
+        plen = struct.unpack(">I", data[pos:pos + 4])[0]
+        pos += 4
+        if plen:
+            payload = data[pos:pos + plen]
+    return mt, event, payload
+
+
+def ns_per_call(fn, number: int, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=200000, help="每轮调用次数")
+    parser.add_argument("--repeat", type=int, default=5, help="轮数（取最快一轮）")
+    args = parser.parse_args()
+
+    sid = SESSION_ID.encode()
+    cases: list[tuple[str, object, object]] = []
+    # 两种实现必须产出相同的帧 / 解出相同的 payload，否则对比无意义
+    task = (EventType.TaskRequest, SESSION_ID, TASK_PAYLOAD)
+    assert old_build_frame(*task) == build_frame(*task)
+    cases.append(("build TaskRequest frame", lambda: old_build_frame(*task), lambda: build_frame(*task)))
+    for size in (1024, 32768, 131072):
+        audio = encode_frame(
+            MsgType.AudioOnlyServer, bytes(size), EventType.TTSResponse, session_id=sid,
+            serialization=Serialization.RAW,
+        )
+        assert old_parse(audio)[2] == bytes(parse_frame(audio).payload)
+        cases.append((
+            f"parse {size // 1024} KB audio frame",
+            lambda data=audio: old_parse(data), lambda data=audio: parse_frame(data),
+        ))
+    started = encode_frame(
+        MsgType.FullServerResponse, b'{"status_code": 20000000}', EventType.SessionStarted, session_id=sid,
+    )
+    cases.append(("parse SessionStarted", lambda: old_parse(started), lambda: parse_frame(started)))
+
+    print(f"{'case':<26} {'old ns':>8} {'new ns':>8}")
+    for name, old, new in cases:
+        t_old = ns_per_call(old, args.number, args.repeat)
+        t_new = ns_per_call(new, args.number, args.repeat)
+        print(f"{name:<26} {t_old:>8.0f} {t_new:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""WAV 工具层基准：参考音频截取 + 段间静音，旧的 wave/BytesIO 往返 vs services/wav.py。
+
+用法（在 backend 目录下）:
+  python bench/bench_wav.py [--sizes 2 8] [--ref-seconds 8] [--silence 0.3] [--repeat 200]
+
+每个 chunk 大小输出 tracemalloc 峰值内存与单个 chunk 的平均耗时。
+"""
+import argparse
+import io
+import sys
+import time
+import tracemalloc
+import wave
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.services.audio_output import AudioOutputStage  # noqa: E402
+from app.services.wav import silence_frames, trim_wav, wav_header  # noqa: E402
+
+
+def old_extract_ref(wav_bytes: bytes, seconds: float) -> bytes:
+    """改动前的 TTSPipeline._extract_ref：读、写各一次 wave/BytesIO。"""
+    buf = io.BytesIO(wav_bytes)
+    with wave.open(buf, "rb") as wav:
+        n_channels = wav.getnchannels()
+        sample_width = wav.getsampwidth()
+        framerate = wav.getframerate()
+        total_frames = wav.getnframes()
+        trim_frames = min(int(seconds * framerate), total_frames)
+        frames = wav.readframes(trim_frames)
+
+    out_buf = io.BytesIO()
+    with wave.open(out_buf, "wb") as out_wav:
+        out_wav.setnchannels(n_channels)
+        out_wav.setsampwidth(sample_width)
+        out_wav.setframerate(framerate)
+        out_wav.writeframes(frames)
+    return out_buf.getvalue()
+
+
+def old_silence(ref_wav: bytes, seconds: float) -> bytes:
+    """改动前的段间静音：解析头后每次重新分配并封装一个静音 WAV。"""
+    with wave.open(io.BytesIO(ref_wav), "rb") as wav:
+        n_channels = wav.getnchannels()
+        sample_width = wav.getsampwidth()
+        framerate = wav.getframerate()
+    frames = b"\x00" * (int(seconds * framerate) * n_channels * sample_width)
+    out_buf = io.BytesIO()
+    with wave.open(out_buf, "wb") as out_wav:
+        out_wav.setnchannels(n_channels)
+        out_wav.setsampwidth(sample_width)
+        out_wav.setframerate(framerate)
+        out_wav.writeframes(frames)
+    return out_buf.getvalue()
+
+
+def measure(fn, repeat: int) -> tuple[float, float]:
+    """(峰值内存 KiB, 单次耗时 us)"""
+    fn()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return peak / 1024, (time.perf_counter() - t0) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 8], help="chunk 大小（MB）")
+    parser.add_argument("--ref-seconds", type=float, default=8)
+    parser.add_argument("--silence", type=float, default=0.3)
+    parser.add_argument("--sample-rate", type=int, default=24000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    for mb in args.sizes:
+        n_frames = mb * 1024 * 1024 // 2
+        chunk = wav_header(args.sample_rate, n_frames=n_frames) + b"\x01\x00" * n_frames
+
+        def before():
+            old_extract_ref(chunk, args.ref_seconds)
+            old_silence(chunk, args.silence)
+
+        def after():
+            trim_wav(chunk, args.ref_seconds)
+            silence_frames(args.sample_rate, 2, 1, args.silence)
+            stage = AudioOutputStage("wav")
+            stage.begin_chunk()
+            stage.feed(chunk)
+            stage.silence(args.silence)
+
+        for name, fn in (("before", before), ("after", after)):
+            peak, us = measure(fn, args.repeat)
+            print(f"{mb} MB chunk {name:6s}: peak {peak:5.0f} KiB  {us:5.0f} us/chunk")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 测试直接 import app.*，与 uvicorn 在 backend 目录下启动时一致
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import time
+
+from app.services.chunker import StreamingSegmenter
+
+
+def _segment(text: str, step: int = 1, **kwargs) -> list[str]:
+    segmenter = StreamingSegmenter(**kwargs)
+    out: list[str] = []
+    for i in range(0, len(text), step):
+        out.extend(segmenter.feed(text[i:i + step]))
+    return out + segmenter.flush()
+
+
+def test_paragraphs_independent_of_feed_size():
+    text = "第一段。\n\n第二段，\n还是第二段。\n \n第三段"
+    for step in (1, 2, 3, 7, len(text)):
+        assert _segment(text, step) == ["第一段。", "第二段，\n还是第二段。", "第三段"]
+
+
+def test_sentence_mode_keeps_closing_quotes():
+    segmenter = StreamingSegmenter(sentence_mode=True)
+    out: list[str] = []
+    for token in ("他说：“好。”", "然后走了！", "Done.", " 3.14 是", "小数。"):
+        out.extend(segmenter.feed(token))
+    out.extend(segmenter.flush())
+    assert out == ["他说：“好。”", "然后走了！", "Done.", "3.14 是小数。"]
+
+
+def test_first_sentence_only_for_first_segment():
+    text = "首句。后面一句。\n\n第二段。第二段第二句。"
+    assert _segment(text, first_sentence=True) == ["首句。", "后面一句。", "第二段。第二段第二句。"]
+
+
+def test_max_chars_cuts_at_sentence_boundary():
+    text = "一二三四五。" * 5
+    assert _segment(text, max_chars=14) == ["一二三四五。一二三四五。"] * 2 + ["一二三四五。"]
+
+
+def test_fence_split_across_feeds():
+    text = "前。\n\n``" + "`\n\n代码\n\n``" + "`\n\n后。"
+    assert _segment(text, step=3) == ["前。", "```\n\n代码\n\n```", "后。"]
+
+
+def test_unclosed_fence_is_bounded():
+    segmenter = StreamingSegmenter(max_chars=100)
+    out = segmenter.feed("```\n")
+    for i in range(2000):
+        out.extend(segmenter.feed(f"row {i}\n"))
+        assert len(segmenter._buf) < 200
+    out.extend(segmenter.flush())
+    assert all(block.startswith("```") for block in out)
+    assert "".join(out).count("row ") == 2000
+
+
+def test_feed_is_linear():
+    text = ("这是一句话，" * 10 + "。") * 2000 + "```\n" + "x" * 100_000
+
+    def timed(n: int) -> float:
+        t0 = time.perf_counter()
+        _segment(text[:n], step=2)
+        return time.perf_counter() - t0
+
+    # 输入翻倍，耗时不应接近翻四倍
+    assert timed(len(text)) < 3 * timed(len(text) // 2) + 0.05
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services.http_clients import HTTPClientPool
+
+
+async def _http_server(seen: list[bytes]) -> asyncio.Server:
+    """最小 HTTP/1.1 服务：记录请求行，返回固定响应。"""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            seen.append(head.split(b"\r\n", 1)[0])
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+            await writer.drain()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def _port(server: asyncio.Server) -> int:
+    return server.sockets[0].getsockname()[1]
+
+
+@pytest.fixture(autouse=True)
+def _no_env_proxy(monkeypatch):
+    for name in ("HTTP_PROXY", "HTTPS_PROXY", "ALL_PROXY", "http_proxy", "https_proxy", "all_proxy"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_falls_back_to_next_cached_address():
+    async def run():
+        seen: list[bytes] = []
+        server = await _http_server(seen)
+        port = _port(server)
+        pool = HTTPClientPool()
+        # 第一个地址没有监听（连接被拒绝），第二个可用
+        pool._dns._entries[("upstream.test", port)] = (["127.0.0.2", "127.0.0.1"], time.monotonic() + 60)
+        try:
+            resp = await pool.client(f"http://upstream.test:{port}").get(f"http://upstream.test:{port}/a")
+            assert resp.text == "ok"
+            assert pool.stats()[f"http://upstream.test:{port}"]["connections"] == 1
+        finally:
+            await pool.aclose()
+            server.close()
+        return seen
+
+    assert asyncio.run(run()) == [b"GET /a HTTP/1.1"]
+
+
+def test_connect_errors_are_httpx_errors():
+    async def run():
+        pool = HTTPClientPool()
+        try:
+            with pytest.raises(httpx.ConnectError):
+                await pool.client("http://127.0.0.2:9").get("http://127.0.0.2:9/")
+        finally:
+            await pool.aclose()
+
+    asyncio.run(run())
+
+
+def test_env_proxy_is_used(monkeypatch):
+    async def run():
+        seen: list[bytes] = []
+        proxy = await _http_server(seen)
+        monkeypatch.setenv("HTTP_PROXY", f"http://127.0.0.1:{_port(proxy)}")
+        monkeypatch.setenv("NO_PROXY", "direct.test")
+        pool = HTTPClientPool()
+        try:
+            resp = await pool.client("http://upstream.test").get("http://upstream.test/v1/x")
+            assert resp.status_code == 200
+        finally:
+            await pool.aclose()
+            proxy.close()
+        return seen
+
+    assert asyncio.run(run()) == [b"GET http://upstream.test/v1/x HTTP/1.1"]
@@ -0,0 +1,148 @@
+"""LLMTranscriber.transcribe_stream：用 httpx.MockTransport 模拟 OpenAI 兼容的 SSE 接口。"""
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import AsyncIterator
+
+import httpx
+import pytest
+
+from app.services.llm_transcriber import LLMTranscriber
+
+
+def _sse(delta: str) -> bytes:
+    event = {"choices": [{"index": 0, "delta": {"content": delta}}]}
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode()
+
+
+class FakeLLM:
+    """本地假 LLM：按给定的 token 序列输出 SSE（非流式请求返回拼接后的完整结果），可在指定位置抛出传输错误。
+
+    实现 LLMTranscriber 用到的 HTTPClientPool 接口（client / aclose）。
+    """
+
+    def __init__(self, tokens: list[str], fail_after: int | None = None, status: int = 200) -> None:
+        self.tokens = tokens
+        self.fail_after = fail_after
+        self.status = status
+        self.requests: list[dict] = []
+        self._client = httpx.AsyncClient(transport=httpx.MockTransport(self._handle))
+
+    async def _handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(json.loads(request.content))
+        if self.status != 200:
+            return httpx.Response(self.status, json={"error": "upstream"})
+        if not self.requests[-1]["stream"]:
+            return httpx.Response(200, json={"choices": [{"message": {"content": "".join(self.tokens)}}]})
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=self._events())
+
+    async def _events(self) -> AsyncIterator[bytes]:
+        yield b": keep-alive\n\n"
+        for i, token in enumerate(self.tokens):
+            if i == self.fail_after:
+                raise httpx.ReadError("connection reset")
+            yield _sse(token)
+        yield b"data: [DONE]\n\n"
+
+    def client(self, url: str) -> httpx.AsyncClient:
+        return self._client
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+def _transcribe(llm: FakeLLM, text: str = "原文", **kwargs) -> list[str]:
+    async def run() -> list[str]:
+        transcriber = LLMTranscriber(api_url="http://llm.test/v1", api_key="k", http=llm)
+        try:
+            return [segment async for segment in transcriber.transcribe_stream(text, **kwargs)]
+        finally:
+            await llm.aclose()
+
+    return asyncio.run(run())
+
+
+def test_first_sentence_then_paragraphs():
+    llm = FakeLLM(["第一", "句。第二", "句。\n", "\n第二段", "的内容。", "\n\n最后", "一段"])
+    segments = _transcribe(llm)
+    assert segments == ["第一句。", "第二句。", "第二段的内容。", "最后一段"]
+    assert llm.requests[0]["stream"] is True
+    assert llm.requests[0]["messages"][-1]["content"] == "原文"
+
+
+def test_paragraph_mode_without_first_sentence():
+    llm = FakeLLM(["第一句。第二句。", "\n\n", "第二段。"])
+    assert _transcribe(llm, first_sentence=False) == ["第一句。第二句。", "第二段。"]
+
+
+def test_no_cut_inside_code_fence():
+    code = "```python\nx = 1\n\ny = 2。\n```"
+    llm = FakeLLM(["说明。\n\n", *code, "\n\n结尾。"])
+    segments = _transcribe(llm, first_sentence=False)
+    assert segments == ["说明。", code, "结尾。"]
+
+
+def test_long_code_fence_is_split_into_closed_blocks():
+    lines = [f"line {i}\n" for i in range(50)]
+    llm = FakeLLM(["前言。\n\n```\n", *lines, "```\n\n结尾。"])
+    segments = _transcribe(llm, max_chars=80, first_sentence=False)
+    assert segments[0] == "前言。" and segments[-1] == "结尾。"
+    blocks = segments[1:-1]
+    assert len(blocks) > 1
+    for block in blocks:
+        assert block.startswith("```") and block.endswith("```")
+        assert len(block) <= 80 + len("\n```")
+    body = "".join(block[len("```\n"):-len("\n```")] + "\n" for block in blocks)
+    assert body == "".join(lines)
+
+
+def test_error_before_output_falls_back_to_original():
+    llm = FakeLLM(["还没", "有句子"], fail_after=1)
+    assert _transcribe(llm, text="原始文本") == ["原始文本"]
+
+
+def test_http_error_falls_back_to_original():
+    llm = FakeLLM([], status=502)
+    assert _transcribe(llm, text="原始文本") == ["原始文本"]
+
+
+def test_disconnect_mid_stream_flushes_buffer_then_raises():
+    llm = FakeLLM(["第一句。", "第二句", "没说完", "永远不会到"], fail_after=3)
+    segments: list[str] = []
+
+    async def run() -> None:
+        transcriber = LLMTranscriber(api_url="http://llm.test/v1", api_key="k", http=llm)
+        try:
+            async for segment in transcriber.transcribe_stream("原始文本"):
+                segments.append(segment)
+        finally:
+            await llm.aclose()
+
+    with pytest.raises(httpx.ReadError):
+        asyncio.run(run())
+    # 已转写的部分照常输出，但不会被当作完整结果正常结束
+    assert segments == ["第一句。", "第二句没说完"]
+
+
+def test_not_configured_returns_original():
+    async def run() -> list[str]:
+        transcriber = LLMTranscriber(http=FakeLLM([]))
+        return [segment async for segment in transcriber.transcribe_stream("原文")]
+
+    assert asyncio.run(run()) == ["原文"]
+
+
+def test_transcribe_reuses_recent_result():
+    llm = FakeLLM(["转写", "结果"])
+
+    async def run() -> list[str]:
+        transcriber = LLMTranscriber(api_url="http://llm.test/v1", api_key="k", http=llm)
+        try:
+            # 路由首包前切换 engine 时 pipeline 会以同样的文本再转写一次
+            return [await transcriber.transcribe("原文") for _ in range(2)]
+        finally:
+            await llm.aclose()
+
+    assert asyncio.run(run()) == ["转写结果", "转写结果"]
+    assert len(llm.requests) == 1 and llm.requests[0]["stream"] is False
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.main import app
+
+
+def test_metrics_requires_token():
+    client = TestClient(app)
+    assert client.get("/metrics").status_code == 403
+    token = create_access_token(data={"sub": "prometheus"})
+    resp = client.get("/metrics", headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == (200 if metrics.enabled else 404)
+
+
+def test_voice_label_is_bounded(monkeypatch):
+    monkeypatch.setattr(settings, "TTS_METRICS_MAX_VOICES", 2)
+    monkeypatch.setattr(metrics, "_voice_labels", {})
+    labels = [metrics.voice_label("edge", v) for v in ("a", "b", "c", "a", "d")]
+    assert labels == ["a", "b", metrics.OTHER_VOICE, "a", metrics.OTHER_VOICE]
+    assert metrics.voice_label("qwen", "c") == "c"
+
+
+def test_collector_label_values_are_escaped():
+    stats = {'http://h/"a"\\b\nc': {"in_flight": 2, "healthy": True, "latency": None}}
+    lines = list(metrics.stats_series("replica", stats, [
+        ("tts_test_in_flight", "gauge", "in_flight", "In flight"),
+        ("tts_test_healthy", "gauge", "healthy", "Healthy"),
+        ("tts_test_latency_seconds", "gauge", "latency", "No samples yet"),
+    ]))
+    label = 'replica="http://h/\\"a\\"\\\\b\\nc"'
+    assert lines == [
+        "# HELP tts_test_in_flight In flight",
+        "# TYPE tts_test_in_flight gauge",
+        f"tts_test_in_flight{{{label}}} 2.0",
+        "# HELP tts_test_healthy Healthy",
+        "# TYPE tts_test_healthy gauge",
+        f"tts_test_healthy{{{label}}} 1.0",
+    ]
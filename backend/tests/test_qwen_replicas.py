@@ -0,0 +1,203 @@
+"""Qwen3TTSEngine 多副本：对本地多个 qwen3-tts server 模拟服务跑副本选择、摘除/恢复与 ref 上传。"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+
+import httpx
+import pytest
+from aiohttp import web
+
+from app.services.qwen_engine import Qwen3TTSEngine
+
+WAV = b"RIFF" + b"\x00" * 40
+
+
+class StubServer:
+    """模拟 qwen3-tts server：记录请求，可控制健康状态、合成状态码与阻塞。
+
+    只认识已通过 PUT /api/ref_prompt/{hash} 上传过的 ref_hash，其余回 409。
+    """
+
+    def __init__(self) -> None:
+        self.requests: list[tuple[str, str]] = []
+        self.healthy = True
+        self.status = 200
+        self.gate: asyncio.Event | None = None  # 设置后合成请求等到 gate 打开才返回
+        self.refs: set[str] = set()
+        self.url = ""
+        self._runner: web.AppRunner | None = None
+
+    async def start(self) -> StubServer:
+        app = web.Application()
+        app.router.add_get("/api/health", self._health)
+        app.router.add_post("/api/synthesize", self._synthesize)
+        app.router.add_post("/api/synthesize_stream", self._synthesize_stream)
+        app.router.add_put("/api/ref_prompt/{ref_hash}", self._put_ref)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{self._runner.addresses[0][1]}"
+        return self
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
+
+    def count(self, path: str) -> int:
+        return sum(1 for _, p in self.requests if p == path)
+
+    async def _health(self, request: web.Request) -> web.Response:
+        self.requests.append(("GET", request.path))
+        return web.json_response({"ok": True}, status=200 if self.healthy else 503)
+
+    async def _check(self, request: web.Request) -> web.Response | None:
+        self.requests.append(("POST", request.path))
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.status != 200:
+            return web.json_response({"error": "server"}, status=self.status)
+        ref_hash = (await request.json()).get("ref_hash")
+        if ref_hash and ref_hash not in self.refs:
+            return web.json_response({"error": "unknown ref"}, status=409)
+        return None
+
+    async def _synthesize(self, request: web.Request) -> web.Response:
+        return await self._check(request) or web.Response(body=WAV)
+
+    async def _synthesize_stream(self, request: web.Request) -> web.StreamResponse:
+        error = await self._check(request)
+        if error is not None:
+            return error
+        resp = web.StreamResponse()
+        await resp.prepare(request)
+        await resp.write(WAV)
+        await resp.write_eof()
+        return resp
+
+    async def _put_ref(self, request: web.Request) -> web.Response:
+        self.requests.append(("PUT", request.path))
+        await request.read()
+        await asyncio.sleep(0.05)  # 让并发的 409 都等到同一次上传
+        self.refs.add(request.match_info["ref_hash"])
+        return web.json_response({"ok": True})
+
+
+@pytest.fixture(autouse=True)
+def _no_env_proxy(monkeypatch):
+    for name in ("HTTP_PROXY", "HTTPS_PROXY", "ALL_PROXY", "http_proxy", "https_proxy", "all_proxy"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def _run(n: int, scenario, **kwargs):
+    """起 n 个模拟服务，构造多副本 engine 后运行 scenario(engine, servers)。"""
+
+    async def run():
+        servers = [await StubServer().start() for _ in range(n)]
+        engine = Qwen3TTSEngine(server_urls=[s.url for s in servers], **kwargs)
+        try:
+            return await scenario(engine, servers)
+        finally:
+            await engine.aclose()
+            for server in servers:
+                await server.stop()
+
+    return asyncio.run(run())
+
+
+def test_ties_rotate_across_replicas():
+    async def scenario(engine, servers):
+        for _ in range(6):
+            assert await engine.generate_chunk("你好") == WAV
+        return [s.count("/api/synthesize") for s in servers]
+
+    assert _run(3, scenario, health_interval=0) == [2, 2, 2]
+
+
+def test_least_outstanding_replica_is_picked():
+    async def scenario(engine, servers):
+        gate = asyncio.Event()
+        servers[0].gate = servers[1].gate = gate
+        # 两个请求阻塞在前两个副本上，之后的请求都应落到空闲的第三个副本
+        blocked = [asyncio.create_task(engine.generate_chunk("慢")) for _ in range(2)]
+        await asyncio.sleep(0.1)
+        for _ in range(3):
+            await engine.generate_chunk("快")
+        in_flight = {url: stats["in_flight"] for url, stats in engine.replica_stats().items()}
+        gate.set()
+        await asyncio.gather(*blocked)
+        return [s.count("/api/synthesize") for s in servers], [in_flight[s.url] for s in servers]
+
+    counts, in_flight = _run(3, scenario, health_interval=0)
+    assert counts == [1, 1, 3]
+    assert in_flight == [1, 1, 0]
+
+
+def test_unhealthy_replica_is_drained():
+    async def scenario(engine, servers):
+        servers[1].healthy = False
+        await engine.check_replicas()
+        for _ in range(4):
+            await engine.generate_chunk("你好")
+        chunks = [chunk async for chunk in engine.generate_chunk_stream("你好")]
+        return [s.count("/api/synthesize") + s.count("/api/synthesize_stream") for s in servers], chunks
+
+    counts, chunks = _run(3, scenario, health_interval=0)
+    assert counts[1] == 0 and sum(counts) == 5
+    assert b"".join(chunks) == WAV
+
+
+def test_server_error_drains_until_health_loop_recovers():
+    async def scenario(engine, servers):
+        servers[0].status = 500
+        servers[0].healthy = False
+        with pytest.raises(httpx.HTTPStatusError):
+            # 首个请求落在副本 0：5xx 不重试，副本被摘除
+            await engine.generate_chunk("你好")
+        assert not engine.replica_stats()[servers[0].url]["healthy"]
+        for _ in range(2):
+            await engine.generate_chunk("你好")
+        assert servers[0].count("/api/synthesize") == 1
+        # 恢复后由后台健康检查重新加入
+        servers[0].status = 200
+        servers[0].healthy = True
+        await asyncio.sleep(0.2)
+        assert engine.replica_stats()[servers[0].url]["healthy"]
+        for _ in range(2):
+            await engine.generate_chunk("你好")
+        return servers[0].count("/api/synthesize")
+
+    assert _run(2, scenario, health_interval=0.05) == 2
+
+
+def test_connect_error_retries_on_another_replica():
+    async def scenario(engine, servers):
+        await servers[0].stop()  # 端口关闭：连接被拒
+        results = [await engine.generate_chunk("你好") for _ in range(3)]
+        return results, engine.replica_stats()[servers[0].url]
+
+    results, dead = _run(2, scenario, health_interval=0)
+    assert results == [WAV] * 3
+    assert dead["healthy"] is False and dead["failures"] == 1
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_unknown_ref_is_uploaded_once_then_retried(stream):
+    ref_audio = b"ref-audio"
+    ref_hash = hashlib.sha256(ref_audio).hexdigest()
+
+    async def scenario(engine, servers):
+        async def one() -> bytes:
+            if stream:
+                return b"".join([c async for c in engine.generate_chunk_stream("你好", ref_audio=ref_audio)])
+            return await engine.generate_chunk("你好", ref_audio=ref_audio)
+
+        results = await asyncio.gather(one(), one())
+        return results, servers[0].requests
+
+    path = "/api/synthesize_stream" if stream else "/api/synthesize"
+    results, requests = _run(1, scenario, health_interval=0)
+    assert results == [WAV, WAV]
+    # 两个请求都收到 409，但同一副本同一 hash 只上传一次，之后各自重试成功
+    assert requests.count(("PUT", f"/api/ref_prompt/{ref_hash}")) == 1
+    assert requests.count(("POST", path)) == 4
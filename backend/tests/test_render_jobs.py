@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+
+from app.services.chunker import TextChunker
+from app.services.mock_engine import MockTTSEngine
+from app.services.pipeline import TTSPipeline
+from app.services.render_jobs import COMPLETED, RenderJobManager
+
+
+class CountingEngine(MockTTSEngine):
+    def __init__(self) -> None:
+        super().__init__(ttfb=0.02, seconds_per_char=0.0)
+        self.texts: Counter[str] = Counter()
+
+    async def generate_chunk(self, text: str, **kwargs) -> bytes:
+        self.texts[text] += 1
+        return await super().generate_chunk(text, **kwargs)
+
+
+def test_duplicate_chunks_render_once(tmp_path):
+    engine = CountingEngine()
+    pipeline = TTSPipeline(engine=engine, chunker=TextChunker(), lookahead=4)
+    text = "\n\n".join(["重复的段落。", "另一段。", "重复的段落。", "重复的段落。", "另一段。", "最后一段。"])
+
+    async def run():
+        manager = RenderJobManager(str(tmp_path), lambda engine, preprocess: pipeline)
+        job = await manager.create(text, engine="mock", voice="mock", preprocess=False)
+        await manager._runners[job.id]
+        audio = b"".join([piece async for piece in manager.audio(job)])
+        await manager.aclose()
+        return job, audio
+
+    job, audio = asyncio.run(run())
+    assert job.status == COMPLETED, job.error
+    assert job.ready_chunks == len(job.chunks) == 6
+    assert engine.texts == {"重复的段落。": 1, "另一段。": 1, "最后一段。": 1}
+    assert audio
+    assert not list(tmp_path.rglob("*.tmp"))
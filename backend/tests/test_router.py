@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.services.errors import UpstreamError
+from app.services.router import EngineRouter
+
+
+def _router() -> EngineRouter:
+    return EngineRouter(
+        fallbacks={"qwen": "edge"},
+        fallback_voices={"edge": {"*": "zh-CN-XiaoxiaoNeural"}},
+        failure_threshold=2,
+    )
+
+
+def _open(router: EngineRouter, fail: set[str], error=None, **kwargs):
+    opened: list[tuple[str, str]] = []
+
+    def open_stream(engine: str, voice: str):
+        opened.append((engine, voice))
+
+        async def gen():
+            if engine in fail:
+                raise error or ConnectionError(f"{engine} unreachable")
+            yield engine.encode()
+
+        return gen()
+
+    async def run():
+        route, stream = await router.open("qwen", "vivian", open_stream, **kwargs)
+        return route, [item async for item in stream]
+
+    return asyncio.run(run()), opened
+
+
+def test_failover_before_first_byte():
+    (route, data), opened = _open(_router(), fail={"qwen"})
+    assert (route.engine, route.voice, route.reason) == ("edge", "zh-CN-XiaoxiaoNeural", "failover")
+    assert data == [b"edge"]
+    assert opened == [("qwen", "vivian"), ("edge", "zh-CN-XiaoxiaoNeural")]
+
+
+def test_no_fallback_stays_on_requested_engine():
+    router = _router()
+    with pytest.raises(ConnectionError):
+        _open(router, fail={"qwen"}, fallback=False)
+    # 熔断打开后仍只尝试请求的 engine
+    with pytest.raises(ConnectionError):
+        _open(router, fail={"qwen"}, fallback=False)
+    assert router.health("qwen").breaker.state == "open"
+    (route, data), opened = _open(router, fail=set(), fallback=False)
+    assert route.engine == "qwen" and route.reason == "last_resort"
+    assert opened == [("qwen", "vivian")]
+
+
+@pytest.mark.parametrize("error", [ValueError("unknown voice"), UpstreamError("bad param", 400)])
+def test_client_error_is_not_failed_over_or_counted(error):
+    router = _router()
+    for _ in range(3):
+        with pytest.raises(type(error)):
+            _open(router, fail={"qwen"}, error=error)
+    assert router.health("qwen").breaker.state == "closed"
+    (route, _), opened = _open(router, fail=set())
+    assert route.engine == "qwen"
+    assert opened == [("qwen", "vivian")]
+
+
+@pytest.mark.parametrize("error", [UpstreamError("overloaded", 503), UpstreamError("unknown"), TimeoutError()])
+def test_upstream_error_fails_over(error):
+    (route, data), _ = _open(_router(), fail={"qwen"}, error=error)
+    assert route.engine == "edge" and data == [b"edge"]
+
+
+def test_fallback_is_opt_in():
+    router = EngineRouter()
+    with pytest.raises(ConnectionError):
+        _open(router, fail={"qwen"})
+
+
+@pytest.mark.parametrize("engine_ttfb, expected", [(None, [5.0]), (lambda: 0.05, [0.05]), (lambda: None, [])])
+def test_latency_is_measured_from_the_engine_call(engine_ttfb, expected):
+    now = [0.0]
+    router = EngineRouter(clock=lambda: now[0])
+
+    def open_stream(engine: str, voice: str):
+        async def gen():
+            now[0] += 5.0  # engine 之前的 LLM 转写等前置步骤
+            yield b"audio"
+
+        return gen()
+
+    async def run():
+        _, stream = await router.open("qwen", "vivian", open_stream, engine_ttfb=engine_ttfb)
+        return [item async for item in stream]
+
+    assert asyncio.run(run()) == [b"audio"]
+    health = router.health("qwen")
+    assert list(health.ttfb) == expected and health.requests == 1
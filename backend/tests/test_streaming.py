@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from starlette.requests import ClientDisconnect
+
+from app.core.streaming import PipelineStreamingResponse
+
+
+class PipelineError(RuntimeError):
+    pass
+
+
+def _call(response: PipelineStreamingResponse, send) -> None:
+    async def receive():
+        await asyncio.Event().wait()  # 客户端一直在线
+
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    asyncio.run(response(scope, receive, send))
+
+
+def test_pipeline_error_is_not_wrapped_in_exception_group():
+    closed = []
+
+    async def body():
+        try:
+            yield b"audio"
+            raise PipelineError("engine failed")
+        finally:
+            closed.append(True)
+
+    async def send(message):
+        pass
+
+    with pytest.raises(PipelineError, match="engine failed"):
+        _call(PipelineStreamingResponse(body()), send)
+    assert closed == [True]
+
+
+def test_broken_connection_becomes_client_disconnect():
+    async def body():
+        while True:
+            yield b"audio"
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            raise OSError("broken pipe")
+
+    with pytest.raises(ClientDisconnect):
+        _call(PipelineStreamingResponse(body()), send)
+
+
+def test_disconnect_cancels_and_closes_body():
+    closed = []
+
+    async def body():
+        try:
+            while True:
+                yield b"audio"
+                await asyncio.sleep(0.01)
+        finally:
+            closed.append(True)
+
+    messages = [{"type": "http.request", "body": b"", "more_body": False}, {"type": "http.disconnect"}]
+
+    async def receive():
+        await asyncio.sleep(0.05)
+        return messages.pop(0)
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    asyncio.run(PipelineStreamingResponse(body())(scope, receive, send))
+    assert closed == [True]
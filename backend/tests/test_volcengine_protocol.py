@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from app.services.volcengine_protocol import (
+    CONNECT_ID_EVENTS,
+    CONNECTION_EVENTS,
+    EventType,
+    MsgFlags,
+    MsgType,
+    Serialization,
+    VolcengineProtocolError,
+    build_frame,
+    encode_frame,
+    parse_frame,
+)
+
+SESSION_ID = "会话-0b7e2c1a"
+
+
+@pytest.mark.parametrize("msg_type", list(MsgType))
+@pytest.mark.parametrize("event", [None, *EventType])
+@pytest.mark.parametrize("sequence", [None, 7, -7])
+def test_encode_parse_round_trip(msg_type, event, sequence):
+    error_code = 45000001 if msg_type == MsgType.Error else None
+    data = encode_frame(
+        msg_type, b"payload", event,
+        session_id=b"sid", connect_id=b"cid", sequence=sequence, error_code=error_code,
+    )
+    frame = parse_frame(data)
+    flags = MsgFlags.NO_SEQUENCE
+    if sequence is not None:
+        flags = MsgFlags.NEGATIVE_SEQUENCE if sequence < 0 else MsgFlags.POSITIVE_SEQUENCE
+    if event is not None:
+        flags |= MsgFlags.WITH_EVENT
+    assert (frame.msg_type, frame.flags, frame.event) == (msg_type, flags, event or 0)
+    assert (frame.sequence, frame.error_code) == (sequence, error_code)
+    assert bytes(frame.payload) == b"payload"
+    assert frame.payload.obj is data  # 不复制 payload
+    if event in CONNECT_ID_EVENTS:
+        assert bytes(frame.connect_id) == b"cid" and frame.session_id is None
+    elif event is None or event in CONNECTION_EVENTS:
+        assert frame.session_id is None and frame.connect_id is None
+    else:
+        assert bytes(frame.session_id) == b"sid" and frame.connect_id is None
+
+
+@pytest.mark.parametrize("event", list(EventType))
+@pytest.mark.parametrize("payload", [b"", b"{}", '{"text": "你好"}'.encode()])
+def test_build_frame(event, payload):
+    data = build_frame(event, SESSION_ID, payload)
+    assert data == encode_frame(
+        MsgType.FullClientRequest, payload, event,
+        session_id=SESSION_ID.encode(), connect_id=SESSION_ID.encode(),
+    )
+    frame = parse_frame(data)
+    assert (frame.msg_type, frame.event, bytes(frame.payload)) == (MsgType.FullClientRequest, event, payload)
+    if event in CONNECTION_EVENTS:
+        assert frame.session_id is None and frame.connect_id is None
+    elif event in CONNECT_ID_EVENTS:
+        assert str(frame.connect_id, "utf-8") == SESSION_ID
+    else:
+        assert str(frame.session_id, "utf-8") == SESSION_ID
+
+
+def test_error_frame():
+    frame = parse_frame(encode_frame(MsgType.Error, "配额超限".encode(), error_code=45000000))
+    assert frame.msg_type == MsgType.Error and frame.error_code == 45000000
+    assert frame.event == 0 and frame.text() == "配额超限"
+
+
+def test_connection_failed_carries_connect_id():
+    data = encode_frame(
+        MsgType.FullServerResponse, b'{"error": "auth"}', EventType.ConnectionFailed, connect_id=b"conn-1",
+    )
+    frame = parse_frame(data)
+    assert frame.event == EventType.ConnectionFailed
+    assert bytes(frame.connect_id) == b"conn-1" and frame.session_id is None
+    assert frame.text() == '{"error": "auth"}'
+
+
+def test_audio_frame_without_payload_length():
+    # 服务端帧可以省略 payload：解码为空 payload 而不是报错
+    data = encode_frame(
+        MsgType.AudioOnlyServer, b"", EventType.TTSResponse, session_id=b"sid", serialization=Serialization.RAW,
+    )[:-4]
+    frame = parse_frame(data)
+    assert bytes(frame.session_id) == b"sid" and bytes(frame.payload) == b""
+
+
+@pytest.mark.parametrize("data", [b"", b"\x11", b"\x10\x90\x10\x00", b"\x1f\x90\x10\x00"])
+def test_bad_header(data):
+    with pytest.raises(VolcengineProtocolError):
+        parse_frame(data)
+
+
+def _check(data: bytes) -> None:
+    try:
+        parse_frame(data)
+    except VolcengineProtocolError:
+        pass
+
+
+def test_fuzz_raises_only_protocol_error():
+    rng = random.Random(0)
+    for _ in range(2000):
+        msg_type = rng.choice(list(MsgType))
+        data = encode_frame(
+            msg_type,
+            rng.randbytes(rng.randrange(300)),
+            rng.choice([None, *EventType]),
+            session_id=rng.randbytes(rng.randrange(50)),
+            connect_id=rng.randbytes(rng.randrange(50)),
+            sequence=rng.choice([None, rng.randrange(1, 2**31), -rng.randrange(1, 2**31)]),
+            error_code=rng.randrange(2**32) if msg_type == MsgType.Error else None,
+        )
+        for cut in range(len(data)):
+            _check(data[:cut])
+        for _ in range(10):
+            mutated = bytearray(data)
+            mutated[rng.randrange(len(mutated))] = rng.randrange(256)
+            _check(bytes(mutated))
+    for _ in range(20000):
+        _check(rng.randbytes(rng.randrange(40)))
@@ -0,0 +1,101 @@
+"""VolcengineTTSEngine.generate_session_stream：对本地 WebSocket 模拟服务端跑完整 session。"""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+import websockets
+
+from app.services.volcengine_engine import VolcengineTTSEngine, VolcengineWSPool
+from app.services.volcengine_protocol import EventType, MsgType, encode_frame, parse_frame
+
+AUDIO = b"\xff\xf3" + b"a" * 100
+
+
+async def _serve(finish_early: bool):
+    """模拟服务端。finish_early=True 时收到首个 TaskRequest 就结束 session（不等 FinishSession）。"""
+
+    async def handler(ws) -> None:
+        async for data in ws:
+            frame = parse_frame(data)
+            sid = bytes(frame.session_id or b"")
+            if frame.event == EventType.StartConnection:
+                await ws.send(encode_frame(MsgType.FullServerResponse, event=EventType.ConnectionStarted, connect_id=b"c"))
+            elif frame.event == EventType.StartSession:
+                await ws.send(encode_frame(MsgType.FullServerResponse, event=EventType.SessionStarted, session_id=sid))
+            elif frame.event == EventType.TaskRequest:
+                await ws.send(encode_frame(MsgType.AudioOnlyServer, AUDIO, event=EventType.TTSResponse, session_id=sid))
+                if finish_early:
+                    await ws.send(encode_frame(MsgType.FullServerResponse, event=EventType.SessionFinished, session_id=sid))
+            elif frame.event == EventType.FinishSession:
+                await ws.send(encode_frame(MsgType.FullServerResponse, event=EventType.SessionFinished, session_id=sid))
+
+    return await websockets.serve(handler, "127.0.0.1", 0)
+
+
+async def _texts(items: list[str], delay: float = 0.05, error: Exception | None = None):
+    for item in items:
+        yield item
+        await asyncio.sleep(delay)
+    if error is not None:
+        raise error
+
+
+def _run(finish_early: bool, texts_error: Exception | None = None) -> tuple[list[bytes], dict]:
+    async def run():
+        server = await _serve(finish_early)
+        port = server.sockets[0].getsockname()[1]
+        engine = VolcengineTTSEngine(
+            app_id="app", access_token="token", transport="ws", ws_url=f"ws://127.0.0.1:{port}",
+        )
+        try:
+            gen = engine.generate_session_stream(_texts(["第一句。", "第二句。", "第三句。"], error=texts_error))
+            audio = [bytes(data) async for data in gen]
+            return audio, engine._ws_pool.stats()
+        finally:
+            await engine.aclose()
+            server.close()
+
+    return asyncio.run(run())
+
+
+def test_session_finished_by_server_before_texts_are_exhausted():
+    audio, stats = _run(finish_early=True)
+    assert audio == [AUDIO]
+    # 正常结束的连接放回池中，没有被发送端关闭
+    assert stats["idle"] == 1
+
+
+def test_all_texts_synthesized():
+    audio, stats = _run(finish_early=False)
+    assert audio == [AUDIO] * 3
+    assert stats["idle"] == 1
+
+
+def test_texts_error_is_raised():
+    with pytest.raises(ValueError, match="bad text source"):
+        _run(finish_early=False, texts_error=ValueError("bad text source"))
+
+
+def test_reaper_survives_checkout_while_closing():
+    async def run():
+        server = await _serve(finish_early=False)  # 不回 ConnectionFinished：每次关闭连接都要等满 1 秒
+        port = server.sockets[0].getsockname()[1]
+        pool = VolcengineWSPool(f"ws://127.0.0.1:{port}", dict, idle_timeout=0.5)
+        try:
+            async with pool.connection() as a, pool.connection() as b:
+                a.reusable = b.reusable = True
+            # reaper 约 1 秒后醒来，关闭第一条过期连接时取走另一条
+            await asyncio.sleep(1.3)
+            async with pool.connection() as c:
+                c.reusable = True
+            await asyncio.sleep(3.0)
+            return pool._reaper.done(), pool.stats()
+        finally:
+            await pool.aclose()
+            server.close()
+
+    reaper_done, stats = asyncio.run(run())
+    assert not reaper_done
+    # 第二轮照常回收新放回的连接
+    assert stats["idle"] == 0 and stats["reaped"] == 3
@@ -8,6 +8,7 @@
   - /api/synthesize_stream 流式，段落并行 pipeline
   - /api/voices            列出可用声音（参考音频）
   - POST /api/ref_audio    上传自定义参考音频（声音克隆）
+  - PUT  /api/ref_prompt   按内容 hash 缓存参考音频的 voice_clone_prompt（LRU，可落盘）
 
 Endpoints:
   GET  /api/health
@@ -15,20 +16,29 @@ Endpoints:
   POST /api/synthesize         (non-streaming, returns full WAV)
   POST /api/synthesize_stream  (streaming, chunked WAV via pipeline)
   POST /api/ref_audio          (upload reference audio for voice cloning)
+  GET  /api/ref_prompt/{hash}  (is the clone prompt for this sha256 cached?)
+  PUT  /api/ref_prompt/{hash}  (upload raw reference audio, cached by sha256)
+
+Synthesis requests may carry ``ref_hash`` (sha256 of the reference WAV) instead of
+a voice: a cached prompt is used directly, an unknown hash answers 409 and the
+client uploads the bytes once via PUT /api/ref_prompt/{hash}.
 """
 
 from __future__ import annotations
 
+import hashlib
 import logging
 import os
 import re
 import struct
+import tempfile
 import threading
 import time
+from collections import OrderedDict
 from contextlib import asynccontextmanager, closing
 from pathlib import Path
 from queue import Queue, Full, Empty
-from typing import Generator, List, Optional, Tuple
+from typing import Any, Generator, List, Optional, Tuple
 
 import asyncio
 import numpy as np
@@ -55,6 +65,8 @@ MAX_NEW_TOKENS = int(os.environ.get("TTS_MAX_NEW_TOKENS", "2048"))
 XVEC_ONLY = os.environ.get("TTS_XVEC_ONLY", "1") == "1"
 QUEUE_SIZE = int(os.environ.get("TTS_QUEUE_SIZE", "32"))
 REF_AUDIO_DIR = Path(os.environ.get("TTS_REF_AUDIO_DIR", "/app/ref_audios"))
+PROMPT_CACHE_SIZE = int(os.environ.get("TTS_PROMPT_CACHE_SIZE", "64"))
+PROMPT_CACHE_DIR = os.environ.get("TTS_PROMPT_CACHE_DIR", "")  # empty = memory only
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s %(levelname)s [%(threadName)s] %(message)s"
@@ -165,6 +177,89 @@ def post_process(pcm: np.ndarray, sr: int, speed: float = 1.0,
     return pcm
 
 
+# --------------------------------------------------------------------------- #
+# Voice-clone prompt cache (keyed by sha256 of the reference audio)
+# --------------------------------------------------------------------------- #
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class PromptCache:
+    """Bounded LRU of computed voice_clone_prompt objects, optionally persisted.
+
+    Prompt extraction runs the speaker encoder (and the codec in ICL mode), so the
+    same reference audio must not pay it per request. Entries evicted from memory
+    stay on disk (PROMPT_CACHE_DIR) and are loaded back on the next hit.
+    """
+
+    def __init__(self, max_entries: int, disk_dir: str = "") -> None:
+        self.max_entries = max(1, max_entries)
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Optional[Path]:
+        return self.disk_dir / f"{key}.pt" if self.disk_dir is not None else None
+
+    def get(self, key: str) -> Any:
+        if not _HASH_RE.match(key):
+            return None
+        with self._lock:
+            prompt = self._entries.get(key)
+            if prompt is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return prompt
+        path = self._path(key)
+        if path is not None and path.exists():
+            try:
+                prompt = torch.load(path, map_location=DEVICE, weights_only=False)
+            except Exception as e:
+                log.warning("prompt cache: failed to load %s: %s", path, e)
+                path.unlink(missing_ok=True)
+            else:
+                self._remember(key, prompt)
+                with self._lock:
+                    self.hits += 1
+                return prompt
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, prompt: Any) -> None:
+        self._remember(key, prompt)
+        path = self._path(key)
+        if path is not None:
+            # Unique per writer: concurrent PUTs of the same key must not share a temp file.
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                torch.save(prompt, tmp)
+                tmp.replace(path)
+            except Exception as e:
+                log.warning("prompt cache: failed to persist %s: %s", key, e)
+                tmp.unlink(missing_ok=True)
+
+    def _remember(self, key: str, prompt: Any) -> None:
+        with self._lock:
+            self._entries[key] = prompt
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "persisted": self.disk_dir is not None,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
 # --------------------------------------------------------------------------- #
 # Model wrapper (singleton)
 # --------------------------------------------------------------------------- #
@@ -177,6 +272,7 @@ class TTSModel:
         self.ready = False
         self.lang_set = set()
         self.ref_audios: dict[str, dict] = {}  # voice_id → {path, prompt, name}
+        self.prompts = PromptCache(PROMPT_CACHE_SIZE, PROMPT_CACHE_DIR)
 
     def load(self) -> None:
         from faster_qwen3_tts import FasterQwen3TTS
@@ -254,6 +350,24 @@ class TTSModel:
         log.info("registered voice: %s", voice_id)
         return True
 
+    def prompt_for_audio(self, content: bytes, key: str, ref_text: str = ""):
+        """Compute (or reuse) the clone prompt of raw reference audio, cached under key."""
+        prompt = self.prompts.get(key)
+        if prompt is not None:
+            return prompt
+        with tempfile.NamedTemporaryFile(suffix=".wav") as f:
+            f.write(content)
+            f.flush()
+            t0 = time.perf_counter()
+            with self.lock:
+                prompt = self._compute_prompt(f.name, ref_text)
+        if prompt is None:
+            return None
+        self.prompts.put(key, prompt)
+        log.info("prompt cache: stored %s (%d bytes, %.2fs)", key[:12], len(content),
+                 time.perf_counter() - t0)
+        return prompt
+
     def _compute_prompt(self, ref_audio: str, ref_text: str):
         try:
             if XVEC_ONLY:
@@ -288,7 +402,7 @@ class TTSModel:
 
     def _build_kwargs(self, text: str, language: str, streaming: bool,
                       voice: str = "default", temperature: float = 0.9,
-                      instruct: Optional[str] = None) -> dict:
+                      instruct: Optional[str] = None, prompt: Any = None) -> dict:
         kw = dict(
             text=text, language=language, xvec_only=XVEC_ONLY,
             max_new_tokens=MAX_NEW_TOKENS,
@@ -299,6 +413,11 @@ class TTSModel:
         if streaming:
             kw["chunk_size"] = CHUNK_SIZE
 
+        if prompt is not None:
+            # per-request reference audio (ref_hash) overrides the named voice
+            kw["voice_clone_prompt"] = prompt
+            kw["ref_audio"] = None
+            return kw
         voice_data = self.ref_audios.get(voice) or self.ref_audios.get("default")
         if voice_data and voice_data.get("prompt") is not None:
             kw["voice_clone_prompt"] = voice_data["prompt"]
@@ -308,23 +427,24 @@ class TTSModel:
         return kw
 
     def gen_stream(self, text: str, language: str, voice: str = "default",
-                   temperature: float = 0.9, instruct: Optional[str] = None
+                   temperature: float = 0.9, instruct: Optional[str] = None,
+                   prompt: Any = None
                    ) -> Generator[Tuple[np.ndarray, int], None, None]:
         with self.lock:
             for chunk, sr, _t in self.model.generate_voice_clone_streaming(
-                **self._build_kwargs(text, language, streaming=True,
-                                     voice=voice, temperature=temperature, instruct=instruct)
+                **self._build_kwargs(text, language, streaming=True, voice=voice,
+                                     temperature=temperature, instruct=instruct, prompt=prompt)
             ):
                 yield np.asarray(chunk, dtype=np.float32).reshape(-1), int(sr)
 
     def gen_full(self, text: str, language: str, voice: str = "default",
                  temperature: float = 0.9, instruct: Optional[str] = None,
-                 speed: float = 1.0, pitch: float = 0.0, volume: float = 1.0
-                 ) -> Tuple[np.ndarray, int]:
+                 speed: float = 1.0, pitch: float = 0.0, volume: float = 1.0,
+                 prompt: Any = None) -> Tuple[np.ndarray, int]:
         with self.lock:
             arrays, sr = self.model.generate_voice_clone(
-                **self._build_kwargs(text, language, streaming=False,
-                                     voice=voice, temperature=temperature, instruct=instruct)
+                **self._build_kwargs(text, language, streaming=False, voice=voice,
+                                     temperature=temperature, instruct=instruct, prompt=prompt)
             )
             pcm = np.concatenate(
                 [np.asarray(a, dtype=np.float32).reshape(-1) for a in arrays]
@@ -349,6 +469,7 @@ class SynthReq(BaseModel):
     volume: Optional[float] = 1.0         # 1.0=原音量, 1.5=+50%, 0.5=减半
     instruct: Optional[str] = None        # 仅 1.7B CustomVoice 有效
     max_new_tokens: Optional[int] = None
+    ref_hash: Optional[str] = None        # 参考音频 sha256，需先 PUT /api/ref_prompt/{hash}
 
 
 @asynccontextmanager
@@ -373,9 +494,23 @@ def health():
         "chunk_size": CHUNK_SIZE,
         "languages": sorted(M.lang_set),
         "voices": [{"id": vid, "name": v["name"]} for vid, v in M.ref_audios.items()],
+        "prompt_cache": M.prompts.stats(),
     }
 
 
+def _ref_prompt(req: SynthReq):
+    """Resolve req.ref_hash → (prompt, None) or (None, error response)."""
+    if not req.ref_hash:
+        return None, None
+    prompt = M.prompts.get(req.ref_hash)
+    if prompt is None:
+        return None, JSONResponse(
+            {"error": "ref_hash not cached", "code": "ref_unknown", "ref_hash": req.ref_hash},
+            status_code=409,
+        )
+    return prompt, None
+
+
 @app.get("/api/voices")
 def get_voices():
     return {
@@ -399,6 +534,29 @@ async def upload_ref_audio(voice_id: str, name: str = "", file: UploadFile = Fil
     return JSONResponse({"error": "Failed to process reference audio"}, status_code=400)
 
 
+@app.get("/api/ref_prompt/{ref_hash}")
+def get_ref_prompt(ref_hash: str):
+    if M.prompts.get(ref_hash) is None:
+        return JSONResponse({"cached": False, "ref_hash": ref_hash}, status_code=404)
+    return {"cached": True, "ref_hash": ref_hash}
+
+
+@app.put("/api/ref_prompt/{ref_hash}")
+async def put_ref_prompt(ref_hash: str, request: Request, ref_text: str = ""):
+    """Upload raw reference audio (request body); its clone prompt is cached under ref_hash."""
+    if not M.ready:
+        return JSONResponse({"error": "model not ready"}, status_code=503)
+    if not _HASH_RE.match(ref_hash):
+        return JSONResponse({"error": "ref_hash must be a lowercase sha256 hex digest"}, status_code=400)
+    content = await request.body()
+    if hashlib.sha256(content).hexdigest() != ref_hash:
+        return JSONResponse({"error": "ref_hash does not match uploaded audio"}, status_code=400)
+    prompt = await asyncio.to_thread(M.prompt_for_audio, content, ref_hash, ref_text)
+    if prompt is None:
+        return JSONResponse({"error": "Failed to process reference audio"}, status_code=400)
+    return {"cached": True, "ref_hash": ref_hash}
+
+
 @app.post("/api/synthesize")
 def synthesize(req: SynthReq):
     if not M.ready:
@@ -413,10 +571,14 @@ def synthesize(req: SynthReq):
     pitch = req.pitch if req.pitch is not None else 0.0
     volume = req.volume if req.volume is not None else 1.0
     instruct = req.instruct
+    prompt, err = _ref_prompt(req)
+    if err is not None:
+        return err
 
     t0 = time.perf_counter()
     pcm, sr = M.gen_full(text, lang, voice=voice, temperature=temperature,
-                         instruct=instruct, speed=speed, pitch=pitch, volume=volume)
+                         instruct=instruct, speed=speed, pitch=pitch, volume=volume,
+                         prompt=prompt)
     dt = time.perf_counter() - t0
     dur = len(pcm) / sr if sr else 0.0
     wav = write_full_wav(pcm, sr)
@@ -449,6 +611,9 @@ async def synthesize_stream(req: SynthReq, request: Request):
     pitch = req.pitch if req.pitch is not None else 0.0
     volume = req.volume if req.volume is not None else 1.0
     instruct = req.instruct
+    prompt, err = _ref_prompt(req)
+    if err is not None:
+        return err
     sentences = split_sentences(text) or [text]
     log.info("/synthesize_stream voice=%s lang=%s temp=%.1f speed=%.1f pitch=%.1f vol=%.1f sents=%d chars=%d%s",
              voice, lang, temperature, speed, pitch, volume, len(sentences), len(text),
@@ -482,8 +647,8 @@ async def synthesize_stream(req: SynthReq, request: Request):
             for i, s in enumerate(sentences):
                 if cancel_event.is_set():
                     break
-                with closing(M.gen_stream(s, lang, voice=voice,
-                                          temperature=temperature, instruct=instruct)) as gen:
+                with closing(M.gen_stream(s, lang, voice=voice, temperature=temperature,
+                                          instruct=instruct, prompt=prompt)) as gen:
                     if needs_post:
                         sent_chunks = []
                         for pcm, sr in gen:
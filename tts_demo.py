@@ -11,19 +11,20 @@
 import argparse
 import asyncio
 import copy
-import io
 import json
 import logging
-import struct
 import sys
 import uuid
 from dataclasses import dataclass
-from enum import IntEnum
 from pathlib import Path
 from typing import Callable
 
 import websockets
 
+# 帧编解码与后端共用 backend/app/services/volcengine_protocol.py
+sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+from app.services.volcengine_protocol import EventType, MsgType, build_frame, parse_frame  # noqa: E402
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
@@ -39,78 +40,6 @@ SAMPLE_RATE = 24000
 MAX_CHARS_PER_SESSION = 800
 
 
-class MsgType(IntEnum):
-    FullClientRequest = 0b1
-    AudioOnlyClient = 0b10
-    FullServerResponse = 0b1001
-    AudioOnlyServer = 0b1011
-    Error = 0b1111
-
-
-class EventType(IntEnum):
-    StartConnection = 1
-    FinishConnection = 2
-    ConnectionStarted = 50
-    ConnectionFailed = 51
-    ConnectionFinished = 52
-    StartSession = 100
-    CancelSession = 101
-    FinishSession = 102
-    SessionStarted = 150
-    SessionCanceled = 151
-    SessionFinished = 152
-    SessionFailed = 153
-    TaskRequest = 200
-    TTSSentenceStart = 350
-    TTSSentenceEnd = 351
-    TTSResponse = 352
-
-
-def _build_frame(event: EventType, session_id: str = "", payload: bytes = b"{}") -> bytes:
-    buf = io.BytesIO()
-    buf.write(bytes([(1 << 4) | 1, (MsgType.FullClientRequest << 4) | 0b100, (1 << 4) | 0, 0]))
-    buf.write(struct.pack(">i", event))
-    if event not in (EventType.StartConnection, EventType.FinishConnection):
-        sid = session_id.encode("utf-8")
-        buf.write(struct.pack(">I", len(sid)))
-        if sid:
-            buf.write(sid)
-    buf.write(struct.pack(">I", len(payload)))
-    buf.write(payload)
-    return buf.getvalue()
-
-
-def _parse_response(data: bytes):
-    msg_type = data[1] >> 4
-    flag = data[1] & 0x0F
-    pos = 4
-    event = struct.unpack(">i", data[pos:pos + 4])[0] if flag & 0b100 else 0
-    pos += 4
-    session_id = ""
-    if flag & 0b100 and event not in (
-        EventType.StartConnection, EventType.FinishConnection,
-        EventType.ConnectionStarted, EventType.ConnectionFailed,
-        EventType.ConnectionFinished,
-    ):
-        sid_len = struct.unpack(">I", data[pos:pos + 4])[0]
-        pos += 4
-        if sid_len:
-            session_id = data[pos:pos + sid_len].decode("utf-8")
-            pos += sid_len
-    if flag & 0b100 and event in (
-        EventType.ConnectionStarted, EventType.ConnectionFailed,
-        EventType.ConnectionFinished,
-    ):
-        pass
-    payload = b""
-    if pos + 4 <= len(data):
-        plen = struct.unpack(">I", data[pos:pos + 4])[0]
-        pos += 4
-        if plen:
-            payload = data[pos:pos + plen]
-    return msg_type, event, session_id, payload
-
-
 def load_env() -> dict:
     env = {}
     for env_path in [Path(__file__).parent / ".env", Path(__file__).parent / "config" / "config.env"]:
@@ -202,14 +131,15 @@ async def synthesize(text: str, headers: dict, output_path: str,
 
     all_audio = bytearray()
     try:
-        await ws.send(_build_frame(EventType.StartConnection, payload=b"{}"))
+        await ws.send(build_frame(EventType.StartConnection, payload=b"{}"))
         while True:
             data = await ws.recv()
-            mt, ev, _, pl = _parse_response(data)
+            frame = parse_frame(data)
+            mt, ev = frame.msg_type, frame.event
             if mt == MsgType.FullServerResponse and ev == EventType.ConnectionStarted:
                 break
             if mt == MsgType.Error or (mt == MsgType.FullServerResponse and ev == EventType.ConnectionFailed):
-                raise RuntimeError(f"connection failed: {pl.decode('utf-8', 'ignore')}")
+                raise RuntimeError(f"connection failed: {frame.text()}")
         logger.info("connection started")
 
         def _build_additions():
@@ -236,14 +166,15 @@ async def synthesize(text: str, headers: dict, output_path: str,
             "event": EventType.StartSession,
             "req_params": {**base_req_params},
         }
-        await ws.send(_build_frame(EventType.StartSession, session_id, json.dumps(session_req).encode()))
+        await ws.send(build_frame(EventType.StartSession, session_id, json.dumps(session_req).encode()))
         while True:
             data = await ws.recv()
-            mt, ev, _, pl = _parse_response(data)
+            frame = parse_frame(data)
+            mt, ev = frame.msg_type, frame.event
             if mt == MsgType.FullServerResponse and ev == EventType.SessionStarted:
                 break
             if mt == MsgType.Error or (mt == MsgType.FullServerResponse and ev == EventType.SessionFailed):
-                raise RuntimeError(f"session start failed: {pl.decode('utf-8', 'ignore')}")
+                raise RuntimeError(f"session start failed: {frame.text()}")
         logger.info("session started, sending text character-by-character")
         logger.info(f"sending {len(text)} chars in single session")
 
@@ -258,30 +189,31 @@ async def synthesize(text: str, headers: dict, output_path: str,
                         "text": ch,
                     },
                 }
-                await ws.send(_build_frame(EventType.TaskRequest, session_id, json.dumps(task_req).encode()))
+                await ws.send(build_frame(EventType.TaskRequest, session_id, json.dumps(task_req).encode()))
                 await asyncio.sleep(0.005)
-            await ws.send(_build_frame(EventType.FinishSession, session_id, b"{}"))
+            await ws.send(build_frame(EventType.FinishSession, session_id, b"{}"))
 
         send_task = asyncio.create_task(send_all_text())
 
         while True:
             data = await ws.recv()
-            mt, ev, _, pl = _parse_response(data)
+            frame = parse_frame(data)
+            mt, ev = frame.msg_type, frame.event
             if mt == MsgType.AudioOnlyServer:
-                all_audio.extend(pl)
+                all_audio += frame.payload
             elif mt == MsgType.FullServerResponse:
                 if ev == EventType.SessionFinished:
                     break
                 elif ev == EventType.SessionFailed:
-                    raise RuntimeError(f"session failed: {pl.decode('utf-8', 'ignore')}")
+                    raise RuntimeError(f"session failed: {frame.text()}")
             elif mt == MsgType.Error:
-                raise RuntimeError(f"error: {pl.decode('utf-8', 'ignore')}")
+                raise RuntimeError(f"error: {frame.text()}")
 
         await send_task
         logger.info(f"session done, total audio={len(all_audio)} bytes")
 
     finally:
-        await ws.send(_build_frame(EventType.FinishConnection, payload=b"{}"))
+        await ws.send(build_frame(EventType.FinishConnection, payload=b"{}"))
         try:
             await asyncio.wait_for(ws.recv(), timeout=5)
         except Exception: